@@ -1,8 +1,7 @@
 # app/api/achievements.py
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session, joinedload
-from app.db.session import SessionLocal
-from app.core.deps import get_current_user
+from app.core.deps import get_current_user, get_db
 from app.db.models.user import User
 from app.db.models.achievement import Achievement, UserAchievement, AchievementRarity, AchievementType
 from app.db.models.grand_prix import GrandPrix
@@ -126,71 +125,67 @@ def seed_achievements(db: Session):
         print(f"❌ Error al sincronizar logros: {e}")
 
 @router.get("/")
-def get_my_achievements(current_user: User = Depends(get_current_user)):
-    db = SessionLocal()
-    try:
-        all_achievements = db.query(Achievement).all()
+def get_my_achievements(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    all_achievements = db.query(Achievement).all()
         
-        # Si la base de datos está vacía (o faltan logros), ejecutamos la semilla
-        if len(all_achievements) < len(ACHIEVEMENT_DEFINITIONS):
-            seed_achievements(db)
-            all_achievements = db.query(Achievement).all()
+    # Si la base de datos está vacía (o faltan logros), ejecutamos la semilla
+    if len(all_achievements) < len(ACHIEVEMENT_DEFINITIONS):
+        seed_achievements(db)
+        all_achievements = db.query(Achievement).all()
         
-        # Logros desbloqueados por el usuario
-        # IMPORTANTE: Cargamos GP y Season para poder dar info de contexto
-        unlocked_rows = db.query(UserAchievement).options(
-            joinedload(UserAchievement.gp).joinedload(GrandPrix.season), # Ruta 1: GP -> Season (para Eventos)
-            joinedload(UserAchievement.season)                           # Ruta 2: Direct Season (para Season Awards)
-        ).filter(UserAchievement.user_id == current_user.id).all()
+    # Logros desbloqueados por el usuario
+    # IMPORTANTE: Cargamos GP y Season para poder dar info de contexto
+    unlocked_rows = db.query(UserAchievement).options(
+        joinedload(UserAchievement.gp).joinedload(GrandPrix.season), # Ruta 1: GP -> Season (para Eventos)
+        joinedload(UserAchievement.season)                           # Ruta 2: Direct Season (para Season Awards)
+    ).filter(UserAchievement.user_id == current_user.id).all()
         
-        # Crear un mapa para acceso rápido
-        unlocked_map = {}
-        for u in unlocked_rows:
+    # Crear un mapa para acceso rápido
+    unlocked_map = {}
+    for u in unlocked_rows:
             
-            # Lógica para determinar el nombre de la Temporada
-            season_name = None
-            if u.season:
-                # Caso A: Logro de Temporada vinculado directamente
-                season_name = u.season.name
-            elif u.gp and u.gp.season:
-                # Caso B: Logro de Evento vinculado a través del GP
-                season_name = u.gp.season.name
+        # Lógica para determinar el nombre de la Temporada
+        season_name = None
+        if u.season:
+            # Caso A: Logro de Temporada vinculado directamente
+            season_name = u.season.name
+        elif u.gp and u.gp.season:
+            # Caso B: Logro de Evento vinculado a través del GP
+            season_name = u.gp.season.name
                 
-            unlocked_map[u.achievement_id] = {
-                "unlocked_at": u.unlocked_at,
-                "gp_name": u.gp.name if u.gp else None,
-                "season_name": season_name
-            }
+        unlocked_map[u.achievement_id] = {
+            "unlocked_at": u.unlocked_at,
+            "gp_name": u.gp.name if u.gp else None,
+            "season_name": season_name
+        }
         
-        result = []
-        for ach in all_achievements:
-            is_unlocked = ach.id in unlocked_map
-            unlocked_data = unlocked_map.get(ach.id)
+    result = []
+    for ach in all_achievements:
+        is_unlocked = ach.id in unlocked_map
+        unlocked_data = unlocked_map.get(ach.id)
             
-            # Lógica de Ocultos: Si es HIDDEN y NO está desbloqueado, censuramos datos
-            is_hidden = ach.rarity == AchievementRarity.HIDDEN and not is_unlocked
+        # Lógica de Ocultos: Si es HIDDEN y NO está desbloqueado, censuramos datos
+        is_hidden = ach.rarity == AchievementRarity.HIDDEN and not is_unlocked
             
-            # Nombre e Icono condicional
-            display_name = "???" if is_hidden else ach.name
-            display_desc = "Logro Secreto: Sigue jugando para descubrirlo." if is_hidden else ach.description
-            display_icon = "Lock" if is_hidden else ach.icon
+        # Nombre e Icono condicional
+        display_name = "???" if is_hidden else ach.name
+        display_desc = "Logro Secreto: Sigue jugando para descubrirlo." if is_hidden else ach.description
+        display_icon = "Lock" if is_hidden else ach.icon
 
-            # Construir objeto respuesta
-            result.append({
-                "id": ach.id,
-                "slug": ach.slug, # Útil para lógica frontend si hace falta
-                "name": display_name,
-                "description": display_desc,
-                "icon": display_icon,
-                "rarity": ach.rarity.value,
-                "type": ach.type.value,
-                "unlocked": is_unlocked,
-                # Datos de contexto (Solo si está desbloqueado)
-                "unlocked_at": unlocked_data["unlocked_at"] if unlocked_data else None,
-                "gp_name": unlocked_data["gp_name"] if unlocked_data else None,
-                "season_name": unlocked_data["season_name"] if unlocked_data else None,
-            })
+        # Construir objeto respuesta
+        result.append({
+            "id": ach.id,
+            "slug": ach.slug, # Útil para lógica frontend si hace falta
+            "name": display_name,
+            "description": display_desc,
+            "icon": display_icon,
+            "rarity": ach.rarity.value,
+            "type": ach.type.value,
+            "unlocked": is_unlocked,
+            # Datos de contexto (Solo si está desbloqueado)
+            "unlocked_at": unlocked_data["unlocked_at"] if unlocked_data else None,
+            "gp_name": unlocked_data["gp_name"] if unlocked_data else None,
+            "season_name": unlocked_data["season_name"] if unlocked_data else None,
+        })
             
-        return result
-    finally:
-        db.close()
\ No newline at end of file
+    return result
\ No newline at end of file
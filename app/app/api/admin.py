@@ -1,9 +1,9 @@
 from app.db.models import _all
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Query, Response
 from fastapi import UploadFile, File # <--- Importante para subir archivos
 import json
 from datetime import datetime
-from app.db.session import SessionLocal
+from sqlalchemy.orm import Session
 from app.db.models.user import User
 from app.db.models.team import Team
 from app.db.models.team_member import TeamMember
@@ -13,9 +13,6 @@ from app.db.models.prediction import Prediction
 from app.db.models.prediction_position import PredictionPosition
 from app.db.models.prediction_event import PredictionEvent
 from app.db.models.race_result import RaceResult
-from app.db.models.race_position import RacePosition
-from app.db.models.race_event import RaceEvent
-from app.db.models.multiplier_config import MultiplierConfig
 from app.db.models.constructor import Constructor
 from app.db.models.driver import Driver
 from app.db.models.bingo import BingoSelection
@@ -23,13 +20,32 @@ from app.db.models.bingo import BingoTile
 from app.db.models.avatar import Avatar
 from app.db.models.achievement import Achievement, UserAchievement
 from app.db.models.user_stats import UserStats
+from app.db.models.ranking_snapshot import RankingSnapshot
+from app.db.models.achievements_rebuild import RebuildJob
+from app.db.models.publication_job import PublicationJob
+from app.db.models.user_radar_metrics import UserRadarMetrics, GLOBAL_ROW_ID
+from app.db.session import engine, async_engine
+from app.db.pool_metrics import pool_metrics
+from app.core.principal_cache import principal_cache
+from app.core.hashing_pool import hashing_pool
+from app.core.bootstrap import startup_profile
+from app.core.response_cache import bump_data_version, response_cache
+from app.core.pagination import parse_fields, parse_cursor, take_page, set_next_cursor
+from app.api.stats import stats_cache
 from app.schemas.season import SeasonCreate
 from typing import Optional
 from pydantic import BaseModel
-from app.services.scoring import calculate_prediction_score
-from app.services.achievements_service import evaluate_race_achievements, rebuild_all_achievements
-from app.services.f1_sync import sync_race_data_manual, sync_qualy_results
-from app.core.deps import require_admin
+from app.services.achievements_rebuild import start_rebuild_job, run_rebuild_job, get_active_job_id, job_to_dict
+from app.services.f1_sync import sync_qualy_results
+from app.services.f1_ingest import gp_sessions, prefetch_missing, read_stored, session_key, SessionNotAvailable
+from app.services.publication import (
+    publish_result, retry_job as retry_publication_job, job_to_dict as publication_to_dict,
+    queue_depth as publication_queue_depth
+)
+from app.services.ranking_snapshot import refresh_season_ranking, refresh_all_rankings
+from app.services.radar_metrics import refresh_radar_metrics
+from app.services.bingo_stats import rebuild_bingo_stats
+from app.core.deps import require_admin, get_db
 from app.core.security import hash_password, create_verification_token
 from app.core.utils import generate_join_code
 from app.services.email import send_verification_email_sync
@@ -40,12 +56,34 @@ router = APIRouter(prefix="/admin", tags=["Admin"])
 # -----------------------
 # Usuarios
 # -----------------------
+# Columnas que se pueden pedir con ?fields= (nunca el hash ni el token de verificación)
+ADMIN_USER_FIELDS = ("id", "email", "username", "acronym", "role", "avatar", "created_at", "is_verified")
+
 @router.get("/users")
-def list_users(current_user = Depends(require_admin)):
-    db = SessionLocal()
-    users = db.query(User).all()
-    db.close()
-    return users
+def list_users(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Usuarios por id. Paginable con ?limit y ?after=<user_id> y proyectable con ?fields=."""
+    wanted = parse_fields(fields, ADMIN_USER_FIELDS) if fields else None
+    query = db.query(User) if wanted is None else db.query(*[getattr(User, f) for f in wanted], User.id.label("_id"))
+    cursor = parse_cursor(after, 1)
+    if cursor:
+        query = query.filter(User.id > cursor[0])
+    query = query.order_by(User.id)
+    if limit:
+        query = query.limit(limit + 1)
+
+    users, has_more = take_page(query.all(), limit)
+    if users:
+        set_next_cursor(response, has_more, users[-1].id if wanted is None else users[-1]._id)
+    if wanted is None:
+        return users
+    return [{f: getattr(u, f) for f in wanted} for u in users]
 
 
 @router.post("/users")
@@ -56,9 +94,9 @@ def create_user(
     role: str, 
     acronym: str, # <--- AÑADIR ESTE ARGUMENTO
     background_tasks: BackgroundTasks,
-    current_user = Depends(require_admin)
+    current_user = Depends(require_admin),
+    db: Session = Depends(get_db)
 ):
-    db = SessionLocal()
     # 1. Validar duplicados
     existing = db.query(User).filter(
         (User.email == email) | 
@@ -66,12 +104,10 @@ def create_user(
         (User.acronym == acronym.upper()) # <--- ESTA LÍNEA ES CLAVE
     ).first()    
     if existing:
-        db.close()
         raise HTTPException(status_code=400, detail="Email, usuario o acrónimo ya están registrados")  
       
     # 2. Validar longitud acrónimo
     if len(acronym) > 3:
-        db.close()
         raise HTTPException(400, "El acrónimo debe ser de máx 3 letras")
 
     # 3. Crear usuario
@@ -79,7 +115,7 @@ def create_user(
     user = User(
         email=email, 
         username=username, 
-        hashed_password=hash_password(password), 
+        hashed_password=hashing_pool.call(hash_password, password), 
         role=role,
         acronym=acronym.upper(), # <--- GUARDARLO (Siempre mayúsculas)
         is_verified=False,
@@ -87,23 +123,26 @@ def create_user(
     )
     db.add(user)
     db.commit()
+    bump_data_version(db, users=True)
     db.refresh(user)
-    db.close()
     
     background_tasks.add_task(send_verification_email_sync, user.email, token, user.username)
     
     return user
 
 @router.delete("/users/{user_id}")
-def delete_user(user_id: int, current_user = Depends(require_admin)):
-    db = SessionLocal()
+def delete_user(user_id: int, current_user = Depends(require_admin), db: Session = Depends(get_db)):
     user = db.query(User).get(user_id)
     if not user:
-        db.close()
         raise HTTPException(404, "Usuario no encontrado")
     db.delete(user)
     db.commit()
-    db.close()
+    refresh_radar_metrics(db)
+    rebuild_bingo_stats(db)
+    # Sale de la clasificación de usuarios y de los puntos de su equipo
+    refresh_all_rankings(db)
+    bump_data_version(db, users=True, stats=True)
+    principal_cache.invalidate(user_id)
     return {"message": "Usuario eliminado"}
 
 class UserUpdate(BaseModel):
@@ -114,13 +153,12 @@ class UserUpdate(BaseModel):
 def update_user(
     user_id: int, 
     user_data: UserUpdate,
-    current_user = Depends(require_admin)
+    current_user = Depends(require_admin),
+    db: Session = Depends(get_db)
 ):
-    db = SessionLocal()
     user = db.query(User).get(user_id)
     
     if not user:
-        db.close()
         raise HTTPException(404, "Usuario no encontrado")
 
     # 1. Actualizar Rol
@@ -128,11 +166,11 @@ def update_user(
 
     # 2. Actualizar Contraseña (solo si viene en el JSON)
     if user_data.password and len(user_data.password.strip()) > 0:
-        user.hashed_password = hash_password(user_data.password)
+        user.hashed_password = hashing_pool.call(hash_password, user_data.password)
 
     db.commit()
     db.refresh(user)
-    db.close()
+    principal_cache.invalidate(user_id)
     
     return user
 
@@ -140,24 +178,21 @@ def update_user(
 # Temporadas
 # -----------------------
 @router.get("/seasons")
-def list_seasons(current_user = Depends(require_admin)):
-    db = SessionLocal()
+def list_seasons(current_user = Depends(require_admin), db: Session = Depends(get_db)):
     seasons = db.query(Season).all()
-    db.close()
     return seasons
 
 
 @router.post("/seasons")
 def create_season(
     season: SeasonCreate,
-    current_user = Depends(require_admin)
+    current_user = Depends(require_admin),
+    db: Session = Depends(get_db)
 ):
-    db = SessionLocal()
 
     # Comprobar si ya existe temporada con ese año (usamos season.year)
     existing = db.query(Season).filter(Season.year == season.year).first()
     if existing:
-        db.close()
         raise HTTPException(400, f"Ya existe una temporada con el año {season.year}")
 
     # Si is_active es True, desactivar otras temporadas (usamos season.is_active)
@@ -173,31 +208,28 @@ def create_season(
     
     db.add(new_season)
     db.commit()
+    bump_data_version(db, season_id=new_season.id)
     db.refresh(new_season)
-    db.close()
 
     return new_season
 
 @router.delete("/seasons/{season_id}")
-def delete_season(season_id: int, current_user = Depends(require_admin)):
-    db = SessionLocal()
+def delete_season(season_id: int, current_user = Depends(require_admin), db: Session = Depends(get_db)):
     season = db.query(Season).get(season_id)
     if not season:
-        db.close()
         raise HTTPException(404, "Temporada no encontrada")
     db.delete(season)
     db.commit()
-    db.close()
+    refresh_radar_metrics(db)
+    bump_data_version(db, season_id=season_id, stats=True)
     return {"message": "Temporada eliminada"}
 
 
 @router.patch("/seasons/{season_id}/toggle")
-def toggle_season_active(season_id: int, current_user = Depends(require_admin)):
-    db = SessionLocal()
+def toggle_season_active(season_id: int, current_user = Depends(require_admin), db: Session = Depends(get_db)):
     season = db.query(Season).get(season_id)
     
     if not season:
-        db.close()
         raise HTTPException(404, "Temporada no encontrada")
 
     # Si la vamos a activar, desactivamos TODAS las demás primero
@@ -209,25 +241,23 @@ def toggle_season_active(season_id: int, current_user = Depends(require_admin)):
         season.is_active = False
     
     db.commit()
+    bump_data_version(db, season_id=season_id)
     db.refresh(season)
-    db.close()
     
     return season
 
 @router.patch("/seasons/{season_id}/toggle-bingo")
-def toggle_bingo_manual_open(season_id: int, current_user = Depends(require_admin)):
-    db = SessionLocal()
+def toggle_bingo_manual_open(season_id: int, current_user = Depends(require_admin), db: Session = Depends(get_db)):
     season = db.query(Season).get(season_id)
     
     if not season:
-        db.close()
         raise HTTPException(404, "Temporada no encontrada")
 
     season.bingo_manual_open = not season.bingo_manual_open
     
     db.commit()
+    bump_data_version(db, season_id=season_id)
     db.refresh(season)
-    db.close()
     
     return season
 
@@ -235,26 +265,23 @@ def toggle_bingo_manual_open(season_id: int, current_user = Depends(require_admi
 # Gran Premio
 # -----------------------
 @router.post("/grand-prix")
-def create_grand_prix(season_id: int, name: str, race_datetime: datetime, current_user = Depends(require_admin)):
-    db = SessionLocal()
+def create_grand_prix(season_id: int, name: str, race_datetime: datetime, current_user = Depends(require_admin), db: Session = Depends(get_db)):
     season = db.query(Season).get(season_id)
     if not season:
-        db.close()
         raise HTTPException(404, "Temporada no encontrada")
     gp = GrandPrix(name=name, season_id=season_id, race_datetime=race_datetime)
     db.add(gp)
     db.commit()
+    bump_data_version(db, season_id=season_id)
     db.refresh(gp)
-    db.close()
     return gp
 
 @router.get("/gps")
-def get_admin_gps_list(season_id: int = None, current_user = Depends(require_admin)):
+def get_admin_gps_list(season_id: int = None, current_user = Depends(require_admin), db: Session = Depends(get_db)):
     """
     Lista los GPs para la tabla de administración.
     Ordenados por FECHA (ya que no existe el campo 'round').
     """
-    db = SessionLocal()
     query = db.query(GrandPrix)
     
     if season_id:
@@ -262,7 +289,6 @@ def get_admin_gps_list(season_id: int = None, current_user = Depends(require_adm
     
     # Ordenamos por fecha
     gps = query.order_by(GrandPrix.race_datetime.asc()).all()
-    db.close()
     return gps
 
 @router.post("/gps")
@@ -270,15 +296,14 @@ def create_gp_manual(
     name: str, 
     season_id: int, 
     race_datetime: datetime,
-    current_user = Depends(require_admin)
+    current_user = Depends(require_admin),
+    db: Session = Depends(get_db)
 ):
     """
     Creación manual desde el panel (además del import masivo que ya tienes).
     """
-    db = SessionLocal()
     season = db.query(Season).filter(Season.id == season_id).first()
     if not season:
-        db.close()
         raise HTTPException(400, "Temporada no encontrada")
 
     new_gp = GrandPrix(
@@ -288,8 +313,8 @@ def create_gp_manual(
     )
     db.add(new_gp)
     db.commit()
+    bump_data_version(db, season_id=season_id)
     db.refresh(new_gp)
-    db.close()
     return new_gp
 
 @router.put("/gps/{gp_id}")
@@ -298,38 +323,38 @@ def update_gp_manual(
     name: str,
     race_datetime: datetime,
     season_id: int, # Permitimos cambiarlo de temporada si hubo error
-    current_user = Depends(require_admin)
+    current_user = Depends(require_admin),
+    db: Session = Depends(get_db)
 ):
     """
     Edita nombre y fecha SIN tocar el ID.
     Las predicciones NO se pierden.
     """
-    db = SessionLocal()
     gp = db.query(GrandPrix).filter(GrandPrix.id == gp_id).first()
     if not gp:
-        db.close()
         raise HTTPException(404, "GP no encontrado")
 
+    old_season_id = gp.season_id
     gp.name = name
     gp.race_datetime = race_datetime
     gp.season_id = season_id
 
     db.commit()
+    bump_data_version(db, season_id=season_id)
+    if old_season_id != season_id:
+        bump_data_version(db, season_id=old_season_id)
     db.refresh(gp)
-    db.close()
     return gp
 
 @router.delete("/gps/{gp_id}")
-def delete_gp_manual(gp_id: int, current_user = Depends(require_admin)):
+def delete_gp_manual(gp_id: int, current_user = Depends(require_admin), db: Session = Depends(get_db)):
     """
     Borra el GP. 
     ATENCIÓN: Si no tienes CASCADE configurado en la BD, 
     habría que borrar las predicciones manualmente antes.
     """
-    db = SessionLocal()
     gp = db.query(GrandPrix).filter(GrandPrix.id == gp_id).first()
     if not gp:
-        db.close()
         raise HTTPException(404, "GP no encontrado")
 
     # Limpieza proactiva de datos hijos (por seguridad)
@@ -339,9 +364,13 @@ def delete_gp_manual(gp_id: int, current_user = Depends(require_admin)):
     db.query(Prediction).filter(Prediction.gp_id == gp_id).delete()
     # db.query(RaceResult).filter(RaceResult.gp_id == gp_id).delete()
     
+    season_id = gp.season_id
+    db.query(RankingSnapshot).filter(RankingSnapshot.gp_id == gp_id).delete()
     db.delete(gp)
     db.commit()
-    db.close()
+    refresh_season_ranking(db, season_id)
+    refresh_radar_metrics(db)
+    bump_data_version(db, season_id=season_id, stats=True)
     return {"message": "GP eliminado correctamente"}
 
 # -----------------------
@@ -351,17 +380,16 @@ def delete_gp_manual(gp_id: int, current_user = Depends(require_admin)):
 async def import_gps(
     season_id: int, 
     file: UploadFile = File(...), 
-    current_user = Depends(require_admin)
+    current_user = Depends(require_admin),
+    db: Session = Depends(get_db)
 ):
     """
     Carga un JSON de GPs.
     - Si el GP (por nombre) ya existe en la temporada: ACTUALIZA su fecha.
     - Si no existe: LO CREA.
     """
-    db = SessionLocal()
     season = db.query(Season).get(season_id)
     if not season:
-        db.close()
         raise HTTPException(404, "Temporada no encontrada")
 
     try:
@@ -401,26 +429,27 @@ async def import_gps(
                 created_count += 1
         
         db.commit()
-        db.close()
+        bump_data_version(db, season_id=season_id)
         
         return {
             "message": f"Proceso completado: {created_count} creados, {updated_count} actualizados."
         }
 
     except Exception as e:
-        db.close()
         raise HTTPException(400, f"Error procesando archivo: {str(e)}")
     
 @router.delete("/grand-prix/{gp_id}")
-def delete_grand_prix(gp_id: int, current_user = Depends(require_admin)):
-    db = SessionLocal()
+def delete_grand_prix(gp_id: int, current_user = Depends(require_admin), db: Session = Depends(get_db)):
     gp = db.query(GrandPrix).get(gp_id)
     if not gp:
-        db.close()
         raise HTTPException(404, "GP no encontrado")
+    season_id = gp.season_id
+    db.query(RankingSnapshot).filter(RankingSnapshot.gp_id == gp_id).delete()
     db.delete(gp)
     db.commit()
-    db.close()
+    refresh_season_ranking(db, season_id)
+    refresh_radar_metrics(db)
+    bump_data_version(db, season_id=season_id, stats=True)
     return {"message": "GP eliminado"}
 
 # -----------------------
@@ -428,14 +457,12 @@ def delete_grand_prix(gp_id: int, current_user = Depends(require_admin)):
 # -----------------------
 
 @router.get("/results/{gp_id}")
-def get_race_result_admin(gp_id: int, current_user = Depends(require_admin)):
-    db = SessionLocal()
+def get_race_result_admin(gp_id: int, current_user = Depends(require_admin), db: Session = Depends(get_db)):
     
     # Buscar si existe resultado
     result = db.query(RaceResult).filter(RaceResult.gp_id == gp_id).first()
     
     if not result:
-        db.close()
         # Devolvemos null/vacío para indicar que no hay datos
         return None 
 
@@ -445,7 +472,6 @@ def get_race_result_admin(gp_id: int, current_user = Depends(require_admin)):
     # Formatear eventos: {"FASTEST_LAP": "VER", ...}
     events = {e.event_type: e.value for e in result.events}
 
-    db.close()
     
     return {
         "positions": positions,
@@ -457,68 +483,25 @@ def upsert_race_result(
     gp_id: int,
     positions: dict[int, str],    # {1: "Verstappen", 2: "Leclerc", ...}
     events: dict[str, str],       # {"FASTEST_LAP": "Verstappen", "SAFETY_CAR": "Yes"}
-    current_user = Depends(require_admin)
+    current_user = Depends(require_admin),
+    db: Session = Depends(get_db)
 ):
-    db = SessionLocal()
 
     from app.db.models.grand_prix import GrandPrix
     gp = db.query(GrandPrix).get(gp_id)
     if not gp:
-        db.close()
         raise HTTPException(404, "GP no encontrado")
     
     if gp.race_datetime > datetime.utcnow():
-        db.close()
         raise HTTPException(
             status_code=400, 
             detail="✋ No corras tanto. No puedes introducir resultados de una carrera futura."
     )
 
-    # Comprobar si ya hay resultado
-    result = db.query(RaceResult).filter(RaceResult.gp_id == gp_id).first()
-    if not result:
-        result = RaceResult(gp_id=gp_id)
-        db.add(result)
-        db.flush()
-
-    # Borrar posiciones y eventos anteriores
-    db.query(RacePosition).filter(RacePosition.race_result_id == result.id).delete()
-    db.query(RaceEvent).filter(RaceEvent.race_result_id == result.id).delete()
-
-    # Guardar posiciones
-    for pos, driver in positions.items():
-        db.add(RacePosition(race_result_id=result.id, position=pos, driver_name=driver))
-
-    # Guardar eventos
-    for event_type, value in events.items():
-        db.add(RaceEvent(race_result_id=result.id, event_type=event_type, value=value))
-
-    db.commit()
-
-    # -------------------------
-    # 🔥 Calcular puntuaciones automáticamente
-    # -------------------------
-    predictions = db.query(Prediction).filter(Prediction.gp_id == gp_id).all()
-    season_id = gp.season_id
-    multipliers = db.query(MultiplierConfig).filter(MultiplierConfig.season_id == season_id).all()
-
-    for prediction in predictions:
-        result_score = calculate_prediction_score(
-            prediction,
-            result,
-            multipliers
-        )
-        prediction.points = result_score["final_points"]
-        prediction.points_base = result_score["base_points"]
-        prediction.multiplier = result_score["multiplier"]
-
-    db.commit()
-
-    print(f"🔄 Calculando logros para GP {gp_id}...")
-    evaluate_race_achievements(db, gp_id)
-    
-    db.close()
-    return {"message": "Resultado guardado, puntos calculados y logros actualizados."}
+    # Guardado, puntos, estadísticas, logros, clasificación y cachés en segundo plano.
+    # El progreso de cada etapa se consulta en GET /admin/publications/{job_id}.
+    job = publish_result(db, gp_id, "manual", {"positions": positions, "events": events})
+    return {"message": "Resultado recibido: publicando en segundo plano.", **publication_to_dict(job)}
 @router.post("/predictions/{user_id}/{gp_id}")
 
 def upsert_prediction_admin(
@@ -526,20 +509,18 @@ def upsert_prediction_admin(
     gp_id: int,
     positions: dict[int, str],   # {1: "Verstappen", 2: "Leclerc", ...}
     events: dict[str, str],      # {"FASTEST_LAP": "yes", "DNFS": "2"}
-    current_user = Depends(require_admin)
+    current_user = Depends(require_admin),
+    db: Session = Depends(get_db)
 ):
-    db = SessionLocal()
 
     # Comprobar si el usuario existe
     user = db.query(User).get(user_id)
     if not user:
-        db.close()
         raise HTTPException(404, "Usuario no encontrado")
 
     from app.db.models.grand_prix import GrandPrix
     gp = db.query(GrandPrix).get(gp_id)
     if not gp:
-        db.close()
         raise HTTPException(404, "GP no encontrado")
 
     # Comprobar si ya hay predicción
@@ -566,31 +547,46 @@ def upsert_prediction_admin(
         db.add(PredictionEvent(prediction_id=prediction.id, event_type=event_type, value=value))
 
     db.commit()
-    db.close()
+    bump_data_version(db, season_id=gp.season_id)
     return {"message": "Predicción guardada"}
 
 @router.post("/gps/{gp_id}/sync")
-def sync_gp_data(gp_id: int, current_user = Depends(require_admin)):
+def sync_gp_data(gp_id: int, refresh: bool = False, current_user = Depends(require_admin), db: Session = Depends(get_db)):
     """
-    Dispara la sincronización manual con FastF1 y devuelve los logs.
+    Dispara la sincronización con FastF1 en segundo plano. Devuelve el job de publicación:
+    los logs y el estado de cada etapa se consultan en GET /admin/publications/{job_id}.
+    Usa la sesión ya descargada si existe; ?refresh=true la vuelve a pedir a FastF1.
     """
-    db = SessionLocal()
-    success, logs = sync_race_data_manual(db, gp_id)
-    db.close()
-    
+    if not db.get(GrandPrix, gp_id):
+        raise HTTPException(404, "GP no encontrado")
+    job = publish_result(db, gp_id, "fastf1", {"refresh": True} if refresh else None)
+    return {"success": True, **publication_to_dict(job)}
+
+@router.post("/gps/{gp_id}/prefetch")
+def prefetch_gp_sessions(gp_id: int, current_user = Depends(require_admin), db: Session = Depends(get_db)):
+    """
+    Descarga en segundo plano la clasificación y la carrera del GP (las que no estén ya guardadas),
+    para que las sincronizaciones posteriores no esperen a FastF1.
+    """
+    gp = db.get(GrandPrix, gp_id)
+    if not gp:
+        raise HTTPException(404, "GP no encontrado")
+    sessions = gp_sessions(gp.name, gp.race_datetime, gp.season.year)
+    try:
+        queued = prefetch_missing(sessions)
+    except SessionNotAvailable as e:
+        raise HTTPException(409, str(e))
     return {
-        "success": success,
-        "logs": logs
+        "queued": queued,
+        "stored": [session_key(*s) for s in sessions if read_stored(*s) is not None],
     }
 
 @router.post("/gps/{gp_id}/sync-qualy")
-def sync_gp_qualy(gp_id: int, current_user = Depends(require_admin)):
+def sync_gp_qualy(gp_id: int, refresh: bool = False, current_user = Depends(require_admin), db: Session = Depends(get_db)):
     """
     Sincroniza los resultados de la CLASIFICACIÓN (Sábado) usando FastF1.
     """
-    db = SessionLocal()
-    result = sync_qualy_results(gp_id, db)
-    db.close()
+    result = sync_qualy_results(gp_id, db, refresh=refresh)
     
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result.get("error", "Error syncing qualy"))
@@ -601,8 +597,7 @@ def sync_gp_qualy(gp_id: int, current_user = Depends(require_admin)):
 # Gestión de Escuderías (Teams)
 # -----------------------
 @router.get("/seasons/{season_id}/teams")
-def list_teams(season_id: int, current_user = Depends(require_admin)):
-    db = SessionLocal()
+def list_teams(season_id: int, current_user = Depends(require_admin), db: Session = Depends(get_db)):
     teams = db.query(Team).filter(Team.season_id == season_id).all()
     
     # Enriquecemos la respuesta con los nombres de los miembros
@@ -615,12 +610,10 @@ def list_teams(season_id: int, current_user = Depends(require_admin)):
             "members": members
         })
         
-    db.close()
     return result
 
 @router.post("/seasons/{season_id}/teams")
-def create_team(season_id: int, name: str, current_user = Depends(require_admin)):
-    db = SessionLocal()
+def create_team(season_id: int, name: str, current_user = Depends(require_admin), db: Session = Depends(get_db)):
     
     # Generar un código de unión aleatorio y único
     code = generate_join_code()
@@ -630,22 +623,20 @@ def create_team(season_id: int, name: str, current_user = Depends(require_admin)
     team = Team(name=name, season_id=season_id, join_code=code)
     db.add(team)
     db.commit()
+    refresh_season_ranking(db, season_id, entity_types=("teams",))
+    bump_data_version(db, season_id=season_id)
     db.refresh(team)
-    db.close()
     return team
 
 @router.post("/teams/{team_id}/members")
-def add_team_member(team_id: int, user_id: int, current_user = Depends(require_admin)):
-    db = SessionLocal()
+def add_team_member(team_id: int, user_id: int, current_user = Depends(require_admin), db: Session = Depends(get_db)):
     
     team = db.query(Team).get(team_id)
     if not team:
-        db.close()
         raise HTTPException(404, "Equipo no encontrado")
 
     # 1. Validar si el equipo ya tiene 2 miembros
     if len(team.members) >= 2:
-        db.close()
         raise HTTPException(400, "El equipo ya está completo (máx 2)")
 
     # 2. Validar si el usuario ya está en OTRO equipo esta temporada
@@ -655,7 +646,6 @@ def add_team_member(team_id: int, user_id: int, current_user = Depends(require_a
         .first()
     )
     if existing_membership:
-        db.close()
         raise HTTPException(400, "El usuario ya pertenece a una escudería esta temporada")
 
     new_member = TeamMember(
@@ -665,15 +655,16 @@ def add_team_member(team_id: int, user_id: int, current_user = Depends(require_a
     )
     db.add(new_member)
     db.commit()
-    db.close()
+    # Los puntos del equipo salen de sus miembros actuales: la foto de equipos cambia entera
+    refresh_season_ranking(db, team.season_id, entity_types=("teams",))
+    bump_data_version(db, season_id=team.season_id)
     return {"message": "Usuario añadido al equipo"}
 
 @router.delete("/teams/{team_id}/members/{user_id}")
-def remove_team_member(team_id: int, user_id: int, current_user = Depends(require_admin)):
+def remove_team_member(team_id: int, user_id: int, current_user = Depends(require_admin), db: Session = Depends(get_db)):
     """
     Expulsa a un usuario específico de un equipo.
     """
-    db = SessionLocal()
     
     # Buscar la membresía específica
     membership = db.query(TeamMember).filter(
@@ -682,10 +673,10 @@ def remove_team_member(team_id: int, user_id: int, current_user = Depends(requir
     ).first()
 
     if not membership:
-        db.close()
         raise HTTPException(status_code=404, detail="El usuario no es miembro de este equipo")
 
     # Borrar la relación
+    season_id = membership.season_id
     db.delete(membership)
     db.commit()
     
@@ -698,22 +689,23 @@ def remove_team_member(team_id: int, user_id: int, current_user = Depends(requir
             db.delete(team)
             db.commit()
 
-    db.close()
+    refresh_season_ranking(db, season_id, entity_types=("teams",))
+    bump_data_version(db, season_id=season_id)
     return {"message": "Usuario expulsado del equipo"}
 
 @router.delete("/teams/{team_id}")
-def delete_team(team_id: int, current_user = Depends(require_admin)):
-    db = SessionLocal()
+def delete_team(team_id: int, current_user = Depends(require_admin), db: Session = Depends(get_db)):
     team = db.query(Team).get(team_id)
     if not team:
-        db.close() 
         raise HTTPException(404)
         
     # Borrar miembros primero (cascade manual si no está configurado en DB)
+    season_id = team.season_id
     db.query(TeamMember).filter(TeamMember.team_id == team_id).delete()
     db.delete(team)
     db.commit()
-    db.close()
+    refresh_season_ranking(db, season_id, entity_types=("teams",))
+    bump_data_version(db, season_id=season_id)
     return {"message": "Equipo eliminado"}
 
 # -----------------------
@@ -721,8 +713,7 @@ def delete_team(team_id: int, current_user = Depends(require_admin)):
 # -----------------------
 
 @router.get("/seasons/{season_id}/constructors")
-def list_constructors(season_id: int, current_user = Depends(require_admin)):
-    db = SessionLocal()
+def list_constructors(season_id: int, current_user = Depends(require_admin), db: Session = Depends(get_db)):
     constructors = db.query(Constructor).filter(Constructor.season_id == season_id).all()
     
     result = []
@@ -736,7 +727,6 @@ def list_constructors(season_id: int, current_user = Depends(require_admin)):
                 for d in c.drivers
             ]
         })
-    db.close()
     return result
 
 @router.post("/seasons/{season_id}/constructors")
@@ -744,20 +734,19 @@ def create_constructor(
     season_id: int, 
     name: str, 
     color: str, 
-    current_user = Depends(require_admin)
+    current_user = Depends(require_admin),
+    db: Session = Depends(get_db)
 ):
-    db = SessionLocal()
     # Verificar duplicado
     exists = db.query(Constructor).filter(Constructor.season_id==season_id, Constructor.name==name).first()
     if exists:
-        db.close()
         raise HTTPException(400, "Ya existe esa escudería en esta temporada")
 
     new_c = Constructor(name=name, color=color, season_id=season_id)
     db.add(new_c)
     db.commit()
+    bump_data_version(db, season_id=season_id)
     db.refresh(new_c)
-    db.close()
     return new_c
 
 @router.post("/constructors/{constructor_id}/drivers")
@@ -765,9 +754,9 @@ def create_driver(
     constructor_id: int, 
     code: str, 
     name: str, 
-    current_user = Depends(require_admin)
+    current_user = Depends(require_admin),
+    db: Session = Depends(get_db)
 ):
-    db = SessionLocal()
     driver = Driver(
         code=code.upper(), 
         name=name, 
@@ -775,49 +764,168 @@ def create_driver(
     )
     db.add(driver)
     db.commit()
+    constructor = db.query(Constructor).get(constructor_id)
+    if constructor:
+        bump_data_version(db, season_id=constructor.season_id)
     db.refresh(driver)
-    db.close()
     return driver
 
 @router.delete("/constructors/{id}")
-def delete_constructor(id: int, current_user = Depends(require_admin)):
-    db = SessionLocal()
+def delete_constructor(id: int, current_user = Depends(require_admin), db: Session = Depends(get_db)):
     c = db.query(Constructor).get(id)
     if not c:
-        db.close()
         raise HTTPException(404)
     # Borrar pilotos asociados primero
     db.query(Driver).filter(Driver.constructor_id == id).delete()
+    season_id = c.season_id
     db.delete(c)
     db.commit()
-    db.close()
+    bump_data_version(db, season_id=season_id)
     return {"message": "Constructor eliminado"}
 
 @router.delete("/drivers/{id}")
-def delete_driver(id: int, current_user = Depends(require_admin)):
-    db = SessionLocal()
+def delete_driver(id: int, current_user = Depends(require_admin), db: Session = Depends(get_db)):
     d = db.query(Driver).get(id)
     if d:
+        constructor = db.query(Constructor).get(d.constructor_id)
         db.delete(d)
         db.commit()
-    db.close()
+        if constructor:
+            bump_data_version(db, season_id=constructor.season_id)
     return {"message": "Piloto eliminado"}
 
+# -----------------------
+# INSTRUMENTACIÓN
+# -----------------------
+
+@router.get("/db/pool")
+def get_pool_metrics(current_user = Depends(require_admin)):
+    """
+    Estado del pool de conexiones (checked-out, overflow...) y tiempos de espera/retención
+    de sesión por petición, para dimensionar pool_size/max_overflow con datos.
+    """
+    return pool_metrics.snapshot(engine.pool, async_engine.pool)
+
+@router.get("/auth/cache")
+def get_auth_cache_stats(current_user = Depends(require_admin)):
+    """Tasa de acierto de la caché de usuarios autenticados (get_current_user)."""
+    return principal_cache.stats()
+
+@router.get("/auth/hashing")
+def get_hashing_pool_stats(current_user = Depends(require_admin)):
+    """Cola y tiempos del pool de bcrypt (login/registro), coste actual y peticiones rechazadas."""
+    return hashing_pool.stats()
+
+@router.get("/cache/responses")
+def get_response_cache_stats(current_user = Depends(require_admin)):
+    """Respuestas servidas desde la caché HTTP (200 cacheados y 304) frente a las calculadas."""
+    return response_cache.stats()
+
+@router.delete("/cache/responses")
+def clear_response_cache(current_user = Depends(require_admin)):
+    """Vacía la caché de respuestas de este worker (las versiones de datos no cambian)."""
+    response_cache.clear()
+    return {"message": "Caché de respuestas vaciada"}
+
+@router.get("/cache/stats")
+def get_stats_cache_stats(current_user = Depends(require_admin)):
+    """Aciertos y tamaño de la caché de estadísticas calculadas (radar de /stats), por nivel."""
+    return stats_cache.stats()
+
+@router.delete("/cache/stats")
+def clear_stats_cache(current_user = Depends(require_admin)):
+    """Vacía la caché de estadísticas (el LRU de este worker y el backend compartido, si hay)."""
+    stats_cache.clear()
+    return {"message": "Caché de estadísticas vaciada"}
+
+@router.get("/stats/radar")
+def get_radar_metrics_status(current_user = Depends(require_admin), db: Session = Depends(get_db)):
+    """Último recálculo de user_radar_metrics: cuándo, cuántos usuarios y cuánto tardó."""
+    row = db.query(UserRadarMetrics).get(GLOBAL_ROW_ID)
+    if not row:
+        return {"computed_at": None, "users": 0, "compute_ms": None}
+    return {"computed_at": row.computed_at, "users": row.users_count, "compute_ms": row.compute_ms}
+
+@router.post("/stats/radar/refresh")
+def refresh_radar_metrics_now(current_user = Depends(require_admin), db: Session = Depends(get_db)):
+    """Fuerza el recálculo (normalmente se hace solo al publicar resultados)."""
+    result = refresh_radar_metrics(db)
+    bump_data_version(db, stats=True)
+    return result
+
+@router.get("/startup")
+def get_startup_profile(current_user = Depends(require_admin)):
+    """Tiempo de cada fase del arranque de este worker (o "skipped" si otro ya lo hizo)."""
+    return startup_profile
+
+@router.delete("/db/pool")
+def reset_pool_metrics(current_user = Depends(require_admin)):
+    """Reinicia las muestras (p.ej. antes de una prueba de carga)."""
+    pool_metrics.reset()
+    return {"message": "Métricas del pool reiniciadas"}
+
 # -----------------------
 # ZONA DE PÁNICO
 # -----------------------
 
 @router.post("/panic/rebuild-achievements")
-def panic_rebuild_achievements(current_user = Depends(require_admin)):
+def panic_rebuild_achievements(
+    background_tasks: BackgroundTasks,
+    fresh: bool = False,
+    current_user = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
     """
-    🚨 BOTÓN DEL PÁNICO: Borra y recalcula TODOS los logros y estadísticas.
+    🚨 BOTÓN DEL PÁNICO: Borra y recalcula TODOS los logros y estadísticas en segundo plano.
+    Si una reconstrucción anterior quedó a medias se reanuda desde su último GP (salvo fresh=true).
+    El progreso se consulta en GET /admin/panic/rebuild-achievements/{job_id}.
     """
-    db = SessionLocal()
-    try:
-        rebuild_all_achievements(db)
-        db.close()
-        return {"message": "Reconstrucción completada con éxito. Todos los logros han sido recalculados."}
-    except Exception as e:
-        db.close()
-        print(f"Error en panic rebuild: {e}")
-        raise HTTPException(status_code=500, detail=f"Error durante la reconstrucción: {str(e)}")
\ No newline at end of file
+    job = start_rebuild_job(db, fresh=fresh)
+    if job is None:
+        raise HTTPException(status_code=409, detail=f"Ya hay una reconstrucción en curso (job {get_active_job_id(db)}).")
+
+    background_tasks.add_task(run_rebuild_job, job.id)
+    if job.processed_gps:
+        message = f"Reanudando reconstrucción desde el GP {job.processed_gps + 1}/{len(job.gp_ids)}."
+    else:
+        message = "Reconstrucción lanzada en segundo plano."
+    return {"message": message, **job_to_dict(job)}
+
+# -----------------------
+# PUBLICACIÓN DE RESULTADOS
+# -----------------------
+
+@router.get("/publications")
+def list_publications(gp_id: int = None, limit: int = 20, current_user = Depends(require_admin), db: Session = Depends(get_db)):
+    """Últimas publicaciones de resultados (opcionalmente de un GP), con el estado de cada etapa."""
+    query = db.query(PublicationJob)
+    if gp_id is not None:
+        query = query.filter(PublicationJob.gp_id == gp_id)
+    jobs = query.order_by(PublicationJob.id.desc()).limit(min(limit, 100)).all()
+    return {"queue_depth": publication_queue_depth(), "jobs": [publication_to_dict(j) for j in jobs]}
+
+@router.get("/publications/{job_id}")
+def get_publication(job_id: int, current_user = Depends(require_admin), db: Session = Depends(get_db)):
+    """Estado, duración de cada etapa y logs de una publicación."""
+    job = db.get(PublicationJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job no encontrado")
+    return publication_to_dict(job)
+
+@router.post("/publications/{job_id}/retry")
+def retry_publication(job_id: int, current_user = Depends(require_admin), db: Session = Depends(get_db)):
+    """Reintenta una publicación fallida desde la etapa que falló."""
+    job = db.get(PublicationJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job no encontrado")
+    if job.status != "failed":
+        raise HTTPException(status_code=409, detail=f"Solo se reintentan publicaciones fallidas (estado: {job.status})")
+    return publication_to_dict(retry_publication_job(db, job))
+
+@router.get("/panic/rebuild-achievements/{job_id}")
+def get_rebuild_job(job_id: int, current_user = Depends(require_admin), db: Session = Depends(get_db)):
+    """Progreso de una reconstrucción de logros."""
+    job = db.query(RebuildJob).filter(RebuildJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job no encontrado")
+    return job_to_dict(job)
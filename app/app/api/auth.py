@@ -1,12 +1,16 @@
 from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
 from app.schemas.user import UserCreate, UserLogin, UserOut, UserUpdate
-from app.db.session import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 from app.db.models.user import User
 from app.core.security import hash_password, verify_password, create_access_token, create_verification_token
-from app.core.deps import get_current_user
+from app.core.deps import get_current_user, get_db, get_async_db
+from app.core.hashing_pool import hashing_pool
+from app.core.principal_cache import principal_cache
+from app.core.response_cache import bump_data_version
 from app.services.email import send_verification_email_sync
 from datetime import timedelta
-from sqlalchemy import or_
+from sqlalchemy import or_, select, update
 import re
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
@@ -15,16 +19,17 @@ def is_valid_email(email: str) -> bool:
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
     return re.match(pattern, email) is not None
 
+# login y register son async: bcrypt corre en el pool acotado (hashing_pool) y la petición
+# espera en el event loop, así una avalancha de logins no ocupa el threadpool del resto de rutas.
 @router.post("/register")
-def register(user: UserCreate):
-    db = SessionLocal()
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
 
     # 1. Validar que no exista email o username
-    existing_user = db.query(User).filter(
+    existing_user = (await db.scalars(select(User).filter(
         (User.email == user.email) | 
         (User.username == user.username) |
         (User.acronym == user.acronym.upper())
-    ).first()
+    ).limit(1))).first()
     if existing_user:
         raise HTTPException(status_code=400, detail="El email, usuario o acrónimo ya está registrado")
     
@@ -37,32 +42,45 @@ def register(user: UserCreate):
         raise HTTPException(status_code=400, detail="El acrónimo debe tener máximo 3 letras")
 
     # 4. Crear usuario (Ya verificado por defecto)
+    # Soltamos la conexión mientras se calcula el hash
+    await db.rollback()
     new_user = User(
         email=user.email,
         username=user.username,
         acronym=user.acronym.upper(),
-        hashed_password=hash_password(user.password),
+        hashed_password=await hashing_pool.hash(user.password),
         role="user",
         is_verified=True,
         verification_token=None
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    db.close()
+    await db.commit()
+    await db.run_sync(bump_data_version, users=True)
 
     return {"message": "Usuario creado exitosamente. Ya puedes iniciar sesión."}
 
 @router.post("/login")
-def login(user: UserLogin):
-    db = SessionLocal()
-    db_user = db.query(User).filter(
+async def login(user: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    db_user = (await db.scalars(select(User).filter(
         (User.email == user.identifier) | 
         (User.acronym == user.identifier.upper())
-    ).first()
-    if not db_user or not verify_password(user.password, db_user.hashed_password):
+    ).limit(1))).first()
+    if not db_user:
         raise HTTPException(status_code=401, detail="Credenciales incorrectas")
 
+    # Devolvemos la conexión al pool mientras esperamos a bcrypt (el objeto conserva sus datos)
+    db.expunge(db_user)
+    await db.rollback()
+
+    valid, new_hash = await hashing_pool.verify_and_update(user.password, db_user.hashed_password)
+    if not valid:
+        raise HTTPException(status_code=401, detail="Credenciales incorrectas")
+
+    # Hash con otro coste (BCRYPT_ROUNDS cambió): lo rehacemos ahora que tenemos la contraseña
+    if new_hash:
+        await db.execute(update(User).where(User.id == db_user.id).values(hashed_password=new_hash))
+        await db.commit()
+
     if not db_user.is_verified:
         raise HTTPException(
             status_code=403, 
@@ -81,7 +99,6 @@ def login(user: UserLogin):
         "username": db_user.username,
         "acronym": db_user.acronym
     })
-    db.close()
 
     return {"access_token": token, "token_type": "bearer"}
 
@@ -91,40 +108,33 @@ class VerifyToken(BaseModel):
     token: str
 
 @router.post("/verify-email")
-def verify_email(data: VerifyToken):
-    db = SessionLocal()
+def verify_email(data: VerifyToken, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.verification_token == data.token).first()
     if not user:
-        db.close()
         raise HTTPException(status_code=400, detail="Token inválido o expirado.")
     
     user.is_verified = True
     user.verification_token = None
     db.commit()
-    db.close()
     return {"message": "Correo verificado exitosamente. Ya puedes iniciar sesión."}
 
 class ResendVerification(BaseModel):
     email: str
 
 @router.post("/resend-verification")
-def resend_verification(data: ResendVerification):
-    db = SessionLocal()
+def resend_verification(data: ResendVerification, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.email == data.email).first()
     if not user:
-        db.close()
         # No revelamos si el correo existe o no al usuario por seguridad
         return {"message": "Si tu correo estaba registrado, se ha enviado un nuevo enlace de verificación."}
     
     if user.is_verified:
-        db.close()
         raise HTTPException(status_code=400, detail="El correo ya está verificado.")
     
     token = create_verification_token()
     user.verification_token = token
     db.commit()
     db.refresh(user)
-    db.close()
     
     send_verification_email_sync(user.email, token, user.username)
     return {"message": "Se ha enviado un nuevo enlace de verificación a tu correo."}
@@ -137,9 +147,9 @@ def get_current_user_data(current_user: User = Depends(get_current_user)):
 @router.patch("/me")
 def update_profile(
     user_update: UserUpdate,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
-    db = SessionLocal()
     user = db.query(User).get(current_user.id)
     
     # 1. Validar Username
@@ -160,12 +170,14 @@ def update_profile(
     if user_update.new_password:
         if not user_update.current_password:
             raise HTTPException(400, "Requerida contraseña actual para cambiarla")
-        if not verify_password(user_update.current_password, user.hashed_password):
+        if not hashing_pool.call(verify_password, user_update.current_password, user.hashed_password):
             raise HTTPException(401, "Contraseña actual incorrecta")
-        user.hashed_password = hash_password(user_update.new_password)
+        user.hashed_password = hashing_pool.call(hash_password, user_update.new_password)
 
     db.commit()
+    bump_data_version(db, users=True)
     db.refresh(user)
+    principal_cache.invalidate(user.id)
     
     # --- NOVEDAD: GENERAMOS EL TOKEN ---
     new_token = create_access_token({
@@ -188,7 +200,6 @@ def update_profile(
         "avatar": user.avatar
     }
     
-    db.close()
     
     # Devolvemos el diccionario limpio Y el token
     return {
@@ -1,67 +1,114 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
-import shutil
 import os
+import threading
 from typing import List
 
-from app.db.session import SessionLocal
 from app.db.models.user import User
 from app.db.models.avatar import Avatar
 from app.schemas.user import UserOut, AvatarSchema
-from app.core.deps import get_current_user, require_admin
+from app.core.deps import get_current_user, require_admin, get_db
+from app.core.principal_cache import principal_cache
+from app.core.response_cache import bump_data_version
+from app.services import avatar_thumbnails
 
 router = APIRouter(prefix="/avatars", tags=["Avatars"])
 
 # CONFIGURACIÓN
 UPLOAD_DIR = "app/static/avatars"
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+AVATAR_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+
+# Firma (inode, mtime) del directorio en la última sincronización y galería en memoria.
+# Crear, borrar o renombrar un archivo cambia el mtime del directorio, así que basta un os.stat
+# por petición para saber si hay que volver a sincronizar (también si lo cambió otro worker).
+_sync_lock = threading.Lock()
+_synced_signature = None
+_gallery = None
+_gallery_version = 0
+
+def _dir_signature():
+    st = os.stat(UPLOAD_DIR)
+    return (st.st_ino, st.st_mtime_ns)
+
+def invalidate_gallery():
+    global _gallery, _gallery_version
+    with _sync_lock:
+        _gallery = None
+        _gallery_version += 1
 
-def sync_avatars_from_disk(db: Session):
-    """Escanea el directorio de avatares y los añade a la BD si no existen."""
+def sync_avatars_from_disk(db: Session, force: bool = False):
+    """
+    Añade a la BD los avatares que están en disco y no en la tabla.
+    Solo escanea si la firma del directorio ha cambiado: una consulta y una inserción en bloque.
+    """
+    global _synced_signature, _gallery, _gallery_version
     if not os.path.exists(UPLOAD_DIR):
         os.makedirs(UPLOAD_DIR, exist_ok=True)
         return
 
-    files = [f for f in os.listdir(UPLOAD_DIR) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp'))]
-    
-    # 1. Añadir los que están en disco pero no en BD
-    for filename in files:
-        if filename == "default.png":
-            continue
-        exists = db.query(Avatar).filter(Avatar.filename == filename).first()
-        if not exists:
-            print(f"📦 Sincronizando nuevo avatar desde disco: {filename}")
-            new_avatar = Avatar(filename=filename)
-            db.add(new_avatar)
-    
-    db.commit()
+    with _sync_lock:
+        # La firma se toma antes de listar: un cambio durante el listado fuerza otra pasada
+        signature = _dir_signature()
+        if not force and signature == _synced_signature:
+            return
+
+        files = {
+            f for f in os.listdir(UPLOAD_DIR)
+            if f.lower().endswith(AVATAR_EXTENSIONS) and f != "default.png"
+        }
+        known = {row[0] for row in db.query(Avatar.filename).all()}
+        missing = sorted(files - known)
+
+        if missing:
+            print(f"📦 Sincronizando {len(missing)} avatares nuevos desde disco")
+            db.execute(insert(Avatar), [{"filename": f} for f in missing])
+            db.commit()
+
+        # Hashes y miniaturas que falten (se generan en segundo plano)
+        avatar_thumbnails.warm(sorted(files | {"default.png"}))
+
+        _synced_signature = signature
+        _gallery = None
+        _gallery_version += 1
+
+def _get_gallery(db: Session):
+    """(id, filename) de todos los avatares, en memoria hasta la próxima subida/borrado/cambio en disco."""
+    global _gallery
+    sync_avatars_from_disk(db)
+    with _sync_lock:
+        if _gallery is not None:
+            return _gallery
+        version = _gallery_version
+    gallery = [(av.id, av.filename) for av in db.query(Avatar.id, Avatar.filename).order_by(Avatar.id).all()]
+    with _sync_lock:
+        # Si alguien invalidó mientras leíamos, no guardamos una lista que ya puede estar vieja
+        if version == _gallery_version:
+            _gallery = gallery
+    return gallery
+
+def _thumb(base_url: str, filename: str, size: int = 128):
+    path = avatar_thumbnails.thumbnail_url(filename, size)
+    return f"{base_url}{path}" if path else None
 
 # 1. VER GALERÍA (Público/Usuarios)
 @router.get("/", response_model=List[AvatarSchema])
 def get_all_avatars(request: Request, db: Session = Depends(get_db)):
-    # Sincronizar antes de listar (opcional, pero asegura que esté al día)
-    sync_avatars_from_disk(db)
-    
     base_url = str(request.base_url).rstrip("/")
-    avatars = db.query(Avatar).all()
-    results = []
     
     # El avatar por defecto siempre debería estar disponible aunque no esté en la tabla Avatar
     # pero para simplificar, si no está en la tabla, lo añadimos virtualmente o el front ya lo maneja.
     
-    for av in avatars:
-        results.append({
-            "id": av.id,
-            "filename": av.filename,
-            "url": f"{base_url}/static/avatars/{av.filename}"
-        })
-    return results
+    return [
+        {
+            "id": av_id,
+            "filename": filename,
+            "url": f"{base_url}/static/avatars/{filename}",
+            "thumb_url": _thumb(base_url, filename),
+        }
+        for av_id, filename in _get_gallery(db)
+    ]
 
 # 2. CAMBIAR MI AVATAR (Usuario)
 @router.put("/me/{avatar_filename}", response_model=UserOut)
@@ -82,7 +129,9 @@ def select_avatar(
 
     user_to_update.avatar = avatar_filename
     db.commit()
+    bump_data_version(db, users=True)
     db.refresh(user_to_update)
+    principal_cache.invalidate(user_to_update.id)
     return user_to_update
 
 # 3. SUBIR AVATAR (Admin)
@@ -93,30 +142,44 @@ def upload_avatar(
     db: Session = Depends(get_db),
     admin: User = Depends(require_admin)
 ):
+    data = file.file.read()
+    try:
+        avatar_thumbnails.validate_image(data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Guardamos por hash de contenido: la misma imagen subida dos veces es el mismo avatar
+    digest = avatar_thumbnails.content_digest(data)
+    ext = os.path.splitext(file.filename or "")[1].lower()
+    if ext not in AVATAR_EXTENSIONS:
+        ext = ".png"
+    filename = f"{digest}{ext}"
+
+    # Las miniaturas se generan en el pool mientras se escribe el original
+    thumbs = avatar_thumbnails.submit_thumbnails(data, digest)
+
     os.makedirs(UPLOAD_DIR, exist_ok=True)
-    file_location = os.path.join(UPLOAD_DIR, file.filename)
-    
-    with open(file_location, "wb+") as file_object:
-        shutil.copyfileobj(file.file, file_object)
-        
+    file_location = os.path.join(UPLOAD_DIR, filename)
+    if not os.path.exists(file_location):
+        with open(file_location, "wb") as file_object:
+            file_object.write(data)
+    avatar_thumbnails.remember(filename, digest)
+    thumbs.result()
+
     base_url = str(request.base_url).rstrip("/")
-    existing = db.query(Avatar).filter(Avatar.filename == file.filename).first()
-    if existing:
-        return {
-            "id": existing.id,
-            "filename": existing.filename,
-            "url": f"{base_url}/static/avatars/{existing.filename}"
-        }
+    avatar = db.query(Avatar).filter(Avatar.filename == filename).first()
+    if not avatar:
+        avatar = Avatar(filename=filename)
+        db.add(avatar)
+        db.commit()
+        db.refresh(avatar)
+        invalidate_gallery()
 
-    new_avatar = Avatar(filename=file.filename)
-    db.add(new_avatar)
-    db.commit()
-    db.refresh(new_avatar)
-    
     return {
-        "id": new_avatar.id,
-        "filename": new_avatar.filename,
-        "url": f"{base_url}/static/avatars/{new_avatar.filename}"
+        "id": avatar.id,
+        "filename": avatar.filename,
+        "url": f"{base_url}/static/avatars/{avatar.filename}",
+        "thumb_url": _thumb(base_url, avatar.filename),
     }
 
 # 4. BORRAR AVATAR (Admin)
@@ -145,4 +208,11 @@ def delete_avatar(
         
     db.delete(avatar_to_delete)
     db.commit()
+    if users_affected:
+        bump_data_version(db, users=True)
+    invalidate_gallery()
+    # Las miniaturas se quedan en disco: son inmutables y otra subida idéntica las reutiliza
+    avatar_thumbnails.forget(filename)
+    for user in users_affected:
+        principal_cache.invalidate(user.id)
     return {"msg": f"Avatar eliminado. {len(users_affected)} usuarios han vuelto al avatar por defecto."}
\ No newline at end of file
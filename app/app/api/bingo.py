@@ -1,21 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException
+import csv
+import io
+import json
+import time
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
 
 # Importaciones del proyecto
-from app.db.session import SessionLocal
-from app.core.deps import get_current_user, require_admin
-from app.db.models.user import User
+from app.core.deps import get_current_user, require_admin, get_db, get_async_db
+from app.core.response_cache import bump_data_version
+from app.core.pagination import parse_fields, parse_cursor, take_page, set_next_cursor
 from app.db.models.season import Season
 from app.db.models.bingo import BingoTile, BingoSelection
 from app.db.models.grand_prix import GrandPrix
+from app.services.bingo_stats import (
+    MAX_SELECTIONS, SelectionLimitReached, add_tile_stats, toggle_tile, rebuild_bingo_stats,
+    import_tiles, set_tiles_completed, board_tiles_query, board_rows, bingo_standings,
+    STANDINGS_FIELDS, STANDINGS_DEFAULT_FIELDS
+)
 
-router = APIRouter(prefix="/bingo", tags=["Bingo"])
+from app.services.live_updates import notify_bingo_tiles, notify_bingo_toggle, notify_bingo_reload
 
-# --- CONSTANTES ---
-MAX_SELECTIONS = 20  # Límite duro del backend para evitar trampas
+router = APIRouter(prefix="/bingo", tags=["Bingo"])
 
 # --- ESQUEMAS PYDANTIC ---
 
@@ -38,43 +50,32 @@ class BingoTileResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class BingoTileImportItem(BaseModel):
+    description: str
+    is_completed: bool = False
+
+class BingoTilesComplete(BaseModel):
+    tile_ids: List[int]
+    is_completed: bool = True
+    season_id: Optional[int] = None
+
 class BingoStandingsItem(BaseModel):
-    username: str
-    acronym: str
-    selections_count: int # <--- NUEVO
-    hits: int
-    missed: int           # <--- NUEVO
-    total_points: int
+    # Opcionales por ?fields= (la respuesta solo lleva los campos pedidos)
+    rank: Optional[int] = None
+    user_id: Optional[int] = None
+    username: Optional[str] = None
+    acronym: Optional[str] = None
+    selections_count: Optional[int] = None # <--- NUEVO
+    hits: Optional[int] = None
+    missed: Optional[int] = None           # <--- NUEVO
+    total_points: Optional[int] = None
 
 class BingoBoardResponse(BaseModel):
     tiles: List[BingoTileResponse]
     is_open: bool
     status: str # "preseason", "closed", "admin_force_open"
+    season_id: Optional[int] = None # Para suscribirse a /events/season/{id}
 
-# --- UTILIDAD DE PUNTUACIÓN ---
-def calculate_tile_value(total_participants: int, selections_count: int) -> int:
-    """
-    Calcula el valor basado en la rareza (Porcentaje).
-    Escala de 10 a 100 puntos independiente del número de usuarios.
-    
-    Fórmula: 
-    - Ratio = Selecciones / Total
-    - Puntos = 10 + (90 * (1 - Ratio))
-    """
-    if total_participants == 0: return 10
-    
-    # Si nadie la ha cogido aún, es una oportunidad de oro (Máximo valor)
-    if selections_count == 0: return 100 
-
-    ratio = selections_count / total_participants
-    
-    # Invertimos el ratio: cuanto MENOS gente (ratio bajo), MÁS puntos.
-    # (1 - ratio) va de 0.0 (todos la tienen) a 1.0 (nadie la tiene).
-    # Multiplicamos por 90 y sumamos 10 base.
-    # Rango final: [10 ... 100]
-    points = 10 + int(90 * (1 - ratio))
-    
-    return points
 # ------------------------------------------------------------------
 # ENDPOINTS ADMIN (Gestión del Bingo Base)
 # ------------------------------------------------------------------
@@ -82,23 +83,25 @@ def calculate_tile_value(total_participants: int, selections_count: int) -> int:
 @router.post("/tile", response_model=BingoTileResponse)
 def create_bingo_tile(
     tile: BingoTileCreate, 
-    current_user = Depends(require_admin)
+    current_user = Depends(require_admin),
+    db: Session = Depends(get_db)
 ):
-    db = SessionLocal()
     
     s_id = tile.season_id
     if not s_id:
         season = db.query(Season).filter(Season.is_active == True).first()
         if not season: 
-            db.close()
             raise HTTPException(status_code=400, detail="No hay temporada activa ni season_id proporcionado")
         s_id = season.id
 
     new_tile = BingoTile(description=tile.description, season_id=s_id)
     db.add(new_tile)
+    db.flush()
+    add_tile_stats(db, [new_tile])
     db.commit()
+    bump_data_version(db, bingo_season_id=s_id)
+    notify_bingo_reload(s_id)
     db.refresh(new_tile)
-    db.close()
     
     return new_tile
 
@@ -106,13 +109,12 @@ def create_bingo_tile(
 def update_bingo_tile(
     tile_id: int,
     update_data: BingoTileUpdate,
-    current_user = Depends(require_admin)
+    current_user = Depends(require_admin),
+    db: Session = Depends(get_db)
 ):
-    db = SessionLocal()
     
     tile = db.query(BingoTile).get(tile_id)
     if not tile: 
-        db.close()
         raise HTTPException(status_code=404, detail="Casilla no encontrada")
 
     if update_data.description is not None:
@@ -121,63 +123,169 @@ def update_bingo_tile(
         tile.is_completed = update_data.is_completed
     
     db.commit()
+    bump_data_version(db, bingo_season_id=tile.season_id)
+    notify_bingo_tiles(tile.season_id, [{"id": tile.id, "is_completed": tile.is_completed, "description": tile.description}])
     db.refresh(tile)
-    db.close()
     
     return tile
 
 @router.delete("/tile/{tile_id}")
 def delete_bingo_tile(
     tile_id: int, 
-    current_user = Depends(require_admin)
+    current_user = Depends(require_admin),
+    db: Session = Depends(get_db)
 ):
-    db = SessionLocal()
     
     tile = db.query(BingoTile).get(tile_id)
     if not tile: 
-        db.close()
         raise HTTPException(status_code=404, detail="Casilla no encontrada")
         
+    season_id = tile.season_id
     db.delete(tile)
     db.commit()
-    db.close()
+    # Sus selecciones se van con ella: cambian los contadores de usuarios y participantes
+    rebuild_bingo_stats(db, season_id)
+    bump_data_version(db, bingo_season_id=season_id)
+    notify_bingo_reload(season_id)
     
     return {"msg": "Casilla eliminada"}
 
+# --- OPERACIONES EN BLOQUE ---
+# Import/export de las casillas de una temporada (JSON o CSV) y marcado de varias a la vez.
+# Cada operación es una sola transacción y una sola subida de versión (las clasificaciones se
+# recalculan una vez, en la siguiente lectura).
+
+CSV_FIELDS = ["id", "description", "is_completed", "selection_count", "current_value"]
+TRUE_VALUES = {"1", "true", "yes", "si", "sí", "x"}
+
+def _season_id_or_active(db: Session, season_id: Optional[int]) -> int:
+    if season_id:
+        if not db.get(Season, season_id):
+            raise HTTPException(status_code=404, detail="Temporada no encontrada")
+        return season_id
+    season = db.query(Season).filter(Season.is_active == True).first()
+    if not season:
+        raise HTTPException(status_code=400, detail="No hay temporada activa ni season_id proporcionado")
+    return season.id
+
+@router.get("/tiles/export")
+def export_bingo_tiles(
+    season_id: Optional[int] = None,
+    fmt: str = Query("json", alias="format", pattern="^(json|csv)$"),
+    current_user = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Casillas de la temporada con su contador y valor, en JSON o CSV (?format=csv)."""
+    t0 = time.perf_counter()
+    s_id = _season_id_or_active(db, season_id)
+    tiles = [dict(zip(CSV_FIELDS, row)) for row in db.execute(board_tiles_query(s_id)).all()]
+    elapsed_ms = round((time.perf_counter() - t0) * 1000, 1)
+
+    if fmt == "csv":
+        out = io.StringIO()
+        writer = csv.DictWriter(out, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        writer.writerows(tiles)
+        return Response(
+            content=out.getvalue(),
+            media_type="text/csv; charset=utf-8",
+            headers={
+                "Content-Disposition": f'attachment; filename="bingo_season_{s_id}.csv"',
+                "X-Row-Count": str(len(tiles)),
+                "X-Elapsed-Ms": str(elapsed_ms),
+            },
+        )
+    return {"season_id": s_id, "count": len(tiles), "elapsed_ms": elapsed_ms, "tiles": tiles}
+
+@router.post("/tiles/import")
+async def import_bingo_tiles(
+    request: Request,
+    season_id: Optional[int] = None,
+    current_user = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Alta en bloque de casillas. Cuerpo JSON ([{description, is_completed}] o {"tiles": [...]})
+    o CSV con cabecera (Content-Type: text/csv; columnas description e is_completed, el resto
+    se ignora: admite lo que devuelve el export). Las descripciones repetidas se saltan.
+    """
+    t0 = time.perf_counter()
+    body = await request.body()
+    try:
+        if request.headers.get("content-type", "").startswith("text/csv"):
+            reader = csv.DictReader(io.StringIO(body.decode("utf-8-sig")))
+            raw = [
+                {"description": r.get("description") or "", "is_completed": (r.get("is_completed") or "").strip().lower() in TRUE_VALUES}
+                for r in reader
+            ]
+        else:
+            data = json.loads(body or b"[]")
+            raw = data.get("tiles", []) if isinstance(data, dict) else data
+        rows = [BingoTileImportItem.model_validate(r).model_dump() for r in raw]
+    except (ValueError, ValidationError, AttributeError, TypeError) as e:
+        raise HTTPException(status_code=422, detail=f"Formato de importación no válido: {e}")
+
+    # La sesión síncrona va al threadpool: el handler es async solo para leer el cuerpo crudo
+    s_id = await run_in_threadpool(_season_id_or_active, db, season_id)
+    result = await run_in_threadpool(import_tiles, db, s_id, rows)
+    if result["inserted"]:
+        await run_in_threadpool(bump_data_version, db, bingo_season_id=s_id)
+        notify_bingo_reload(s_id)
+    return {"season_id": s_id, "received": len(rows), **result, "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1)}
+
+@router.post("/tiles/complete")
+def complete_bingo_tiles(
+    data: BingoTilesComplete,
+    current_user = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Marca como ocurridas (o no, con is_completed=false) varias casillas en un solo UPDATE."""
+    t0 = time.perf_counter()
+    s_id = _season_id_or_active(db, data.season_id)
+    tile_ids = sorted(set(data.tile_ids))
+    updated = set_tiles_completed(db, s_id, tile_ids, data.is_completed)
+    if updated:
+        bump_data_version(db, bingo_season_id=s_id)
+        notify_bingo_tiles(s_id, [{"id": tid, "is_completed": data.is_completed} for tid in tile_ids])
+    return {
+        "season_id": s_id,
+        "requested": len(tile_ids),
+        "updated": updated,
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+    }
+
 # ------------------------------------------------------------------
 # ENDPOINTS USUARIO (Tablero y Selección)
 # ------------------------------------------------------------------
 
 @router.get("/board", response_model=BingoBoardResponse)
-def get_my_bingo_board(
+async def get_my_bingo_board(
     season_id: Optional[int] = None,
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Devuelve el tablero completo con el estado actual de cada casilla.
     """
-    db = SessionLocal()
     
     s_id = season_id
     if not s_id:
-        season = db.query(Season).filter(Season.is_active == True).first()
+        season = (await db.scalars(select(Season).filter(Season.is_active == True).limit(1))).first()
         if not season: 
-            db.close()
             return {"tiles": [], "is_open": False, "status": "closed"}
         s_id = season.id
     else:
-        season = db.query(Season).get(s_id)
+        season = await db.get(Season, s_id)
         if not season:
-            db.close()
             return {"tiles": [], "is_open": False, "status": "closed"}
 
     # 0. Calcular Estado del Bingo
-    first_gp = (
-        db.query(GrandPrix)
+    first_gp = (await db.scalars(
+        select(GrandPrix)
         .filter(GrandPrix.season_id == s_id)
         .order_by(GrandPrix.race_datetime)
-        .first()
-    )
+        .limit(1)
+    )).first()
     
     is_preseason = True
     if first_gp and datetime.utcnow() > first_gp.race_datetime:
@@ -187,74 +295,47 @@ def get_my_bingo_board(
     status = "closed"
     if is_preseason: status = "preseason"
     elif season.bingo_manual_open: status = "admin_force_open"
-    tiles = db.query(BingoTile).filter(BingoTile.season_id == s_id).all()
+    # 1. Casillas con su contador y valor (bingo_tile_stats): una fila por casilla
+    tiles = (await db.execute(board_tiles_query(s_id))).all()
     
     # 2. Obtener mis selecciones (Las selecciones son globales pero vinculadas a casillas de una temporada)
-    my_selections = db.query(BingoSelection).join(BingoTile).filter(
-        BingoSelection.user_id == current_user.id,
-        BingoTile.season_id == s_id
-    ).all()
-    my_selected_ids = {s.bingo_tile_id for s in my_selections}
-
-    # 3. Calcular métricas locales para la rareza de esta temporada
-    # Contamos usuarios únicos que han participado en el bingo de ESTA temporada
-    total_participants = db.query(BingoSelection.user_id).join(BingoTile).filter(
-        BingoTile.season_id == s_id
-    ).distinct().count()
-    if total_participants == 0: total_participants = 1
-
-    # Optimizamos contando las selecciones de esta temporada
-    all_selections = db.query(BingoSelection).join(BingoTile).filter(
-        BingoTile.season_id == s_id
-    ).all()
-    tile_counts = {}
-    for sel in all_selections:
-        tile_counts[sel.bingo_tile_id] = tile_counts.get(sel.bingo_tile_id, 0) + 1
-
-    response = []
-    for t in tiles:
-        count = tile_counts.get(t.id, 0)
-        val = calculate_tile_value(total_participants, count)
-        
-        response.append({
-            "id": t.id,
-            "description": t.description,
-            "is_completed": t.is_completed,
-            "selection_count": count,
-            "current_value": val,
-            "is_selected_by_me": t.id in my_selected_ids
-        })
+    my_selected_ids = set((await db.scalars(
+        select(BingoSelection.bingo_tile_id).join(BingoTile).filter(
+            BingoSelection.user_id == current_user.id,
+            BingoTile.season_id == s_id
+        )
+    )).all())
+
+    response = board_rows(tiles, my_selected_ids)
     
-    db.close()
     return {
         "tiles": response,
         "is_open": is_open,
-        "status": status
+        "status": status,
+        "season_id": s_id
     }
 
 @router.get("/board/{target_user_id}", response_model=BingoBoardResponse)
 def get_user_bingo_board(
     target_user_id: int, 
     season_id: Optional[int] = None,
-    current_user = Depends(get_current_user) # Necesario para autenticación, aunque no usemos sus datos
+    current_user = Depends(get_current_user), # Necesario para autenticación, aunque no usemos sus datos
+    db: Session = Depends(get_db)
 ):
     """
     Devuelve el tablero visto desde la perspectiva de otro usuario (target_user_id).
     'is_selected_by_me' en la respuesta indicará si el target_user seleccionó la casilla.
     """
-    db = SessionLocal()
     
     s_id = season_id
     if not s_id:
         season = db.query(Season).filter(Season.is_active == True).first()
         if not season: 
-            db.close()
             return {"tiles": [], "is_open": False, "status": "closed"}
         s_id = season.id
     else:
         season = db.query(Season).get(s_id)
         if not season:
-            db.close()
             return {"tiles": [], "is_open": False, "status": "closed"}
 
     # 0. Calcular Estado
@@ -273,45 +354,20 @@ def get_user_bingo_board(
     if is_preseason: status = "preseason"
     elif season.bingo_manual_open: status = "admin_force_open"
 
-    # 1. Obtener todas las casillas
-    tiles = db.query(BingoTile).filter(BingoTile.season_id == s_id).all()
+    # 1. Casillas con su contador y valor (bingo_tile_stats): una fila por casilla
+    tiles = db.execute(board_tiles_query(s_id)).all()
     
     # 2. Obtener selecciones del USUARIO OBJETIVO
-    target_selections = db.query(BingoSelection).join(BingoTile).filter(
-        BingoSelection.user_id == target_user_id,
-        BingoTile.season_id == s_id
-    ).all()
-    target_selected_ids = {s.bingo_tile_id for s in target_selections}
-
-    # 3. Métricas locales de la temporada para calcular el valor de la casilla
-    total_participants = db.query(BingoSelection.user_id).join(BingoTile).filter(
-        BingoTile.season_id == s_id
-    ).distinct().count()
-    if total_participants == 0: total_participants = 1
-
-    all_selections = db.query(BingoSelection).join(BingoTile).filter(
-        BingoTile.season_id == s_id
-    ).all()
-    tile_counts = {}
-    for sel in all_selections:
-        tile_counts[sel.bingo_tile_id] = tile_counts.get(sel.bingo_tile_id, 0) + 1
-
-    response = []
-    for t in tiles:
-        count = tile_counts.get(t.id, 0)
-        val = calculate_tile_value(total_participants, count)
-        
-        response.append({
-            "id": t.id,
-            "description": t.description,
-            "is_completed": t.is_completed,
-            "selection_count": count,
-            "current_value": val,
-            # Aquí la "magia": is_selected_by_me será true si el target_user la eligió
-            "is_selected_by_me": t.id in target_selected_ids 
-        })
+    target_selected_ids = set(db.scalars(
+        select(BingoSelection.bingo_tile_id).join(BingoTile).filter(
+            BingoSelection.user_id == target_user_id,
+            BingoTile.season_id == s_id
+        )
+    ).all())
+
+    # Aquí la "magia": is_selected_by_me será true si el target_user la eligió
+    response = board_rows(tiles, target_selected_ids)
     
-    db.close()
     return {
         "tiles": response,
         "is_open": is_open,
@@ -321,16 +377,16 @@ def get_user_bingo_board(
 @router.post("/toggle/{tile_id}")
 def toggle_selection(
     tile_id: int, 
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
     """
-    Marca o desmarca una casilla.
+    Marca o desmarca una casilla. Devuelve el contador y el valor nuevos de la casilla; si ha
+    entrado o salido un participante (values_changed), el resto de valores también cambió.
     """
-    db = SessionLocal()
     
     season = db.query(Season).filter(Season.is_active == True).first()
     if not season: 
-        db.close()
         raise HTTPException(status_code=400, detail="No hay temporada activa")
 
     # --- VALIDACIÓN DE FECHA LÍMITE ---
@@ -344,133 +400,53 @@ def toggle_selection(
     if first_gp and datetime.utcnow() > first_gp.race_datetime:
         # Si la temporada ha empezado, SOLO permitimos si el admin lo ha habilitado manualmente
         if not season.bingo_manual_open:
-            db.close()
             raise HTTPException(status_code=403, detail="⛔ El Bingo está cerrado. La temporada ya ha comenzado.")
 
     # --- LÓGICA DE TOGGLE ---
     target_tile = db.query(BingoTile).get(tile_id)
     if not target_tile:
-        db.close()
         raise HTTPException(404, "Casilla no encontrada.")
 
-    existing = db.query(BingoSelection).filter(
-        BingoSelection.user_id == current_user.id,
-        BingoSelection.bingo_tile_id == tile_id
-    ).first()
-
-    if existing:
-        # Si ya existe, borramos (siempre permitido)
-        db.delete(existing)
-        db.commit()
-        db.close()
-        return {"status": "removed", "msg": "Casilla desmarcada"}
-    else:
-        # Si no existe, verificamos el LÍMITE antes de añadir
-        # El límite de 20 es por TEMPORADA
-        current_count = db.query(BingoSelection).join(BingoTile).filter(
-            BingoSelection.user_id == current_user.id,
-            BingoTile.season_id == target_tile.season_id
-        ).count()
-
-        if current_count >= MAX_SELECTIONS:
-            db.close()
-            raise HTTPException(status_code=400, detail=f"Has alcanzado el límite de {MAX_SELECTIONS} selecciones para esta temporada.")
+    # Atómico en la BD: el límite por temporada se respeta aunque muchos marquen a la vez
+    try:
+        result = toggle_tile(db, current_user.id, target_tile)
+    except SelectionLimitReached:
+        raise HTTPException(status_code=400, detail=f"Has alcanzado el límite de {MAX_SELECTIONS} selecciones para esta temporada.")
 
-        new_sel = BingoSelection(user_id=current_user.id, bingo_tile_id=tile_id)
-        db.add(new_sel)
-        db.commit()
-        db.close()
-        return {"status": "added", "msg": "Casilla marcada"}
+    bump_data_version(db, bingo_season_id=target_tile.season_id)
+    notify_bingo_toggle(target_tile.season_id, result)
+    msg = "Casilla marcada" if result["status"] == "added" else "Casilla desmarcada"
+    return {**result, "msg": msg}
 
 # ------------------------------------------------------------------
 # ENDPOINT CLASIFICACIÓN (Standings)
 # ------------------------------------------------------------------
 
-@router.get("/standings", response_model=List[BingoStandingsItem])
-def get_bingo_standings(season_id: Optional[int] = None):
+@router.get("/standings", response_model=List[BingoStandingsItem], response_model_exclude_unset=True)
+def get_bingo_standings(
+    response: Response,
+    season_id: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
     """
-    Calcula la clasificación del Bingo incluyendo aciertos, fallos y puntos.
+    Calcula la clasificación del Bingo incluyendo aciertos, fallos y puntos (ordenada por puntos).
+    Paginable con ?limit y ?after=<rank,user_id> (siguiente en X-Next-Cursor) y ?fields=.
     """
-    db = SessionLocal()
+    wanted = parse_fields(fields, STANDINGS_FIELDS, STANDINGS_DEFAULT_FIELDS)
+    cursor = parse_cursor(after, 2)
     
     s_id = season_id
     if not s_id:
         season = db.query(Season).filter(Season.is_active == True).first()
         if not season: 
-            db.close()
             return []
         s_id = season.id
 
-    # 1. Obtener Datos Base de la temporada
-    tiles = db.query(BingoTile).filter(BingoTile.season_id == s_id).all()
-    all_selections = db.query(BingoSelection).join(BingoTile).filter(
-        BingoTile.season_id == s_id
-    ).all()
-    users = db.query(User).all()
-
-    # 2. Calcular cuántas tiles están completadas en total
-    # Esto sirve para calcular las "oportunidades perdidas"
-    completed_tiles_ids = {t.id for t in tiles if t.is_completed}
-    total_completed_count = len(completed_tiles_ids)
-
-    # 3. Calcular valores de rareza (Puntos) de la temporada
-    total_participants = db.query(BingoSelection.user_id).join(BingoTile).filter(
-        BingoTile.season_id == s_id
-    ).distinct().count()
-    if total_participants == 0: total_participants = 1
-    
-    tile_counts = {}
-    for sel in all_selections:
-        tile_counts[sel.bingo_tile_id] = tile_counts.get(sel.bingo_tile_id, 0) + 1
-        
-    tile_values = {}
-    for t in tiles:
-        count = tile_counts.get(t.id, 0)
-        tile_values[t.id] = calculate_tile_value(total_participants, count)
-
-    # 4. Construir Clasificación por Usuario
-    ranking = []
-    
-    # Mapear selecciones por usuario para acceso rápido
-    # user_selections_map = { user_id: [tile_id, tile_id...] }
-    user_selections_map = {}
-    for sel in all_selections:
-        if sel.user_id not in user_selections_map:
-            user_selections_map[sel.user_id] = []
-        user_selections_map[sel.user_id].append(sel.bingo_tile_id)
-
-    for user in users:
-        # Obtener IDs de casillas elegidas por este usuario
-        selected_ids = user_selections_map.get(user.id, [])
-        
-        selections_count = len(selected_ids)
-        
-        # Si el usuario no ha jugado al bingo, podemos decidir si mostrarlo o no.
-        # Mostrémoslo con 0 puntos para que vea la tabla vacía.
-        
-        hits = 0
-        total_points = 0
-        
-        for tid in selected_ids:
-            # Si la casilla elegida está completada (está en el set completed_tiles_ids)
-            if tid in completed_tiles_ids:
-                hits += 1
-                total_points += tile_values.get(tid, 0)
-        
-        # Oportunidades perdidas: Total de eventos ocurridos - Los que yo acerté
-        # Ej: Han pasado 10 cosas. Yo acerté 3. Me perdí 7.
-        missed = total_completed_count - hits
-
-        ranking.append({
-            "username": user.username,
-            "acronym": user.acronym,
-            "selections_count": selections_count,
-            "hits": hits,
-            "missed": missed,
-            "total_points": total_points
-        })
-
-    db.close()
-
-    # Ordenar por puntos descendente
-    return sorted(ranking, key=lambda x: x["total_points"], reverse=True)
\ No newline at end of file
+    # Agregado en la BD con los valores materializados de bingo_tile_stats
+    rows, has_more = take_page(bingo_standings(db, s_id, wanted, limit + 1 if limit else None, cursor), limit)
+    if rows:
+        set_next_cursor(response, has_more, rows[-1]["rank"], rows[-1]["user_id"])
+    return [{f: row[f] for f in wanted} for row in rows]
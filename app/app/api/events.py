@@ -0,0 +1,45 @@
+import asyncio
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from app.core.deps import get_current_user, require_admin
+from app.core.event_hub import event_hub, season_channel, HEARTBEAT_SECONDS
+
+router = APIRouter(prefix="/events", tags=["Events"])
+
+@router.get("/season/{season_id}")
+async def season_events(season_id: int, request: Request, token: str = Query(...)):
+    """
+    Canal en vivo de la temporada (Server-Sent Events). Cada mensaje es un JSON con "type":
+    "results" (diff de clasificación, puntos y logros al publicar un GP), "bingo_tile",
+    "bingo_tiles", "bingo_reload" o "resync" (el cliente se ha quedado atrás: recargar todo).
+    EventSource no permite cabeceras: el token va en ?token=.
+    """
+    await run_in_threadpool(get_current_user, token)
+    channel = season_channel(season_id)
+    sub = event_hub.subscribe(channel)
+
+    async def stream():
+        try:
+            # Si se corta, el navegador reconecta solo a los 5 s
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    payload = await asyncio.wait_for(sub.queue.get(), timeout=HEARTBEAT_SECONDS)
+                    yield f"data: {payload}\n\n"
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n" # Mantiene viva la conexión a través de proxies
+        finally:
+            event_hub.unsubscribe(channel, sub)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/stats")
+def events_stats(current_user = Depends(require_admin)):
+    """Clientes conectados por canal y contadores del hub de este proceso."""
+    return event_hub.stats()
@@ -1,9 +1,10 @@
 from fastapi import APIRouter, HTTPException, Depends
 from datetime import datetime
-from app.db.session import SessionLocal
+from sqlalchemy.orm import Session
 from app.db.models.grand_prix import GrandPrix
 from app.db.models.season import Season
-from app.core.deps import get_current_user
+from app.core.deps import get_current_user, get_db
+from app.core.response_cache import bump_data_version
 
 router = APIRouter(prefix="/grand-prix", tags=["Grand Prix"])
 
@@ -12,16 +13,15 @@ def create_grand_prix(
     season_id: int,
     name: str,
     race_datetime: datetime,
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Solo admins")
 
-    db = SessionLocal()
 
     season = db.query(Season).get(season_id)
     if not season:
-        db.close()
         raise HTTPException(status_code=404, detail="Temporada no encontrada")
 
     gp = GrandPrix(
@@ -32,14 +32,13 @@ def create_grand_prix(
 
     db.add(gp)
     db.commit()
+    bump_data_version(db, season_id=season_id)
     db.refresh(gp)
-    db.close()
 
     return gp
 
 @router.get("/season/{season_id}")
-def list_grand_prix(season_id: int):
-    db = SessionLocal()
+def list_grand_prix(season_id: int, db: Session = Depends(get_db)):
 
     gps = (
         db.query(GrandPrix)
@@ -48,5 +47,4 @@ def list_grand_prix(season_id: int):
         .all()
     )
 
-    db.close()
     return gps
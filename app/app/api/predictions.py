@@ -1,13 +1,17 @@
-from fastapi import APIRouter, HTTPException, Depends
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
 from datetime import datetime
-from sqlalchemy.orm import joinedload
-from app.db.session import SessionLocal
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
 from app.db.models.prediction import Prediction
 from app.db.models.prediction_position import PredictionPosition
 from app.db.models.prediction_event import PredictionEvent
 from app.db.models.grand_prix import GrandPrix
 from app.db.models.user import User
-from app.core.deps import get_current_user
+from app.core.deps import get_current_user, get_db, get_async_db
+from app.core.response_cache import bump_data_version
+from app.core.pagination import parse_fields, parse_cursor, take_page, set_next_cursor
 
 router = APIRouter(prefix="/predictions", tags=["Predictions"])
 
@@ -16,17 +20,15 @@ def upsert_prediction(
     gp_id: int,
     positions: dict[int, str],   # {1: "Verstappen", 2: "Leclerc", ...}
     events: dict[str, str],      # {"FASTEST_LAP": "yes", "DNFS": "2"}
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
-    db = SessionLocal()
 
     gp = db.query(GrandPrix).get(gp_id)
     if not gp:
-        db.close()
         raise HTTPException(status_code=404, detail="GP no encontrado")
 
     if datetime.utcnow() >= gp.race_datetime:
-        db.close()
         raise HTTPException(status_code=400, detail="Predicción bloqueada")
 
     prediction = (
@@ -38,6 +40,8 @@ def upsert_prediction(
         .first()
     )
 
+    # Una predicción nueva añade una fila a las clasificaciones; editarla no cambia nada hasta puntuar
+    is_new = prediction is None
     if not prediction:
         prediction = Prediction(
             user_id=current_user.id,
@@ -72,16 +76,17 @@ def upsert_prediction(
         ))
 
     db.commit()
-    db.close()
+    if is_new:
+        bump_data_version(db, season_id=gp.season_id)
 
     return {"message": "Predicción guardada"}
 
 @router.get("/{gp_id}/me")
 def get_my_prediction(
     gp_id: int,
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
-    db = SessionLocal()
 
     # Usamos options(joinedload(...)) para cargar las relaciones ANTES de cerrar la sesión
     prediction = (
@@ -98,7 +103,6 @@ def get_my_prediction(
     )
 
     if not prediction:
-        db.close()
         return None
 
     # Forzamos la lectura de datos para asegurar que están en memoria
@@ -106,50 +110,86 @@ def get_my_prediction(
     _ = prediction.positions
     _ = prediction.events
 
-    db.close()
     return prediction
 
+PREDICTION_LIST_FIELDS = ("user_id", "username", "points", "base_points", "multiplier", "positions", "events")
+PREDICTION_LIST_DEFAULT = ("username", "points", "base_points", "multiplier", "positions", "events")
+
 @router.get("/{gp_id}/all")
-def get_all_predictions_for_gp(
+async def get_all_predictions_for_gp(
     gp_id: int,
-    current_user = Depends(get_current_user)
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db = SessionLocal()
-    
+    """
+    Predicciones de todos los usuarios en un GP, por user_id. Paginable con ?limit y
+    ?after=<user_id>; con ?fields= solo se leen las tablas necesarias (p.ej. sin positions ni
+    events no se tocan prediction_positions ni prediction_events).
+    """
     # Obtenemos el GP para saber si la carrera ya empezó (opcional, por si quieres ocultar antes)
     # Por ahora lo dejamos abierto como pediste.
-    
-    predictions = (
-        db.query(Prediction)
-        .options(
-            joinedload(Prediction.user),
-            joinedload(Prediction.positions),
-            joinedload(Prediction.events)
-        )
-        .filter(Prediction.gp_id == gp_id)
-        .all()
-    )
-    
+    wanted = parse_fields(fields, PREDICTION_LIST_FIELDS, PREDICTION_LIST_DEFAULT)
+    columns = {
+        "user_id": Prediction.user_id,
+        "username": User.username,
+        "points": Prediction.points,
+        "base_points": Prediction.points_base,
+        "multiplier": Prediction.multiplier,
+    }
+    query = select(Prediction.id, Prediction.user_id.label("_user_id"), *[col.label(f) for f, col in columns.items() if f in wanted])
+    if "username" in wanted:
+        query = query.join(User, User.id == Prediction.user_id)
+    query = query.filter(Prediction.gp_id == gp_id)
+    cursor = parse_cursor(after, 1)
+    if cursor:
+        query = query.filter(Prediction.user_id > cursor[0])
+    query = query.order_by(Prediction.user_id)
+    if limit:
+        query = query.limit(limit + 1)
+
+    predictions, has_more = take_page((await db.execute(query)).all(), limit)
+    if predictions:
+        set_next_cursor(response, has_more, predictions[-1]._user_id)
+
+    # Posiciones y eventos solo de las predicciones de la página (sin JOIN que multiplique filas)
+    ids = [p.id for p in predictions]
+    positions, events = {}, {}
+    if ids and "positions" in wanted:
+        for pred_id, position, driver in await db.execute(
+            select(PredictionPosition.prediction_id, PredictionPosition.position, PredictionPosition.driver_name)
+            .filter(PredictionPosition.prediction_id.in_(ids))
+            .order_by(PredictionPosition.id)
+        ):
+            positions.setdefault(pred_id, {})[position] = driver
+    if ids and "events" in wanted:
+        for pred_id, event_type, value in await db.execute(
+            select(PredictionEvent.prediction_id, PredictionEvent.event_type, PredictionEvent.value)
+            .filter(PredictionEvent.prediction_id.in_(ids))
+            .order_by(PredictionEvent.id)
+        ):
+            events.setdefault(pred_id, {})[event_type] = value
+
     results = []
     for p in predictions:
-        results.append({
-            "username": p.user.username,
-            "points": p.points,
-            "base_points": p.points_base,
-            "multiplier": p.multiplier,
-            "positions": {pos.position: pos.driver_name for pos in p.positions},
-            "events": {ev.event_type: ev.value for ev in p.events},
-        })
+        item = {f: getattr(p, f) for f in wanted if f in columns}
+        if "positions" in wanted:
+            item["positions"] = positions.get(p.id, {})
+        if "events" in wanted:
+            item["events"] = events.get(p.id, {})
+        results.append({f: item[f] for f in wanted})
         
-    db.close()
     return results
 
 @router.get("/season/{season_id}/me/brief")
 def get_my_predictions_brief(
     season_id: int,
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
-    db = SessionLocal()
     
     preds = (
         db.query(Prediction.gp_id)
@@ -161,5 +201,4 @@ def get_my_predictions_brief(
         .all()
     )
     
-    db.close()
     return [p[0] for p in preds]
\ No newline at end of file
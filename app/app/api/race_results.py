@@ -1,11 +1,9 @@
 from fastapi import APIRouter, HTTPException, Depends
-from app.db.session import SessionLocal
+from sqlalchemy.orm import Session
 from app.db.models.race_result import RaceResult
-from app.db.models.race_position import RacePosition
-from app.db.models.race_event import RaceEvent
 from app.db.models.grand_prix import GrandPrix
-from app.core.deps import get_current_user
-from app.services.achievements_service import evaluate_race_achievements
+from app.core.deps import get_current_user, get_db
+from app.services.publication import publish_result, job_to_dict
 
 router = APIRouter(prefix="/results", tags=["Race Results"])
 
@@ -14,66 +12,27 @@ def upsert_race_result(
     gp_id: int,
     positions: dict[int, str],
     events: dict[str, str],
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Solo admins")
 
-    db = SessionLocal()
 
     gp = db.query(GrandPrix).get(gp_id)
     if not gp:
-        db.close()
         raise HTTPException(status_code=404, detail="GP no encontrado")
 
-    result = (
-        db.query(RaceResult)
-        .filter(RaceResult.gp_id == gp_id)
-        .first()
-    )
-
-    if not result:
-        result = RaceResult(gp_id=gp_id)
-        db.add(result)
-        db.flush()
-
-    db.query(RacePosition).filter(
-        RacePosition.race_result_id == result.id
-    ).delete()
-
-    db.query(RaceEvent).filter(
-        RaceEvent.race_result_id == result.id
-    ).delete()
-
-    for pos, driver in positions.items():
-        db.add(RacePosition(
-            race_result_id=result.id,
-            position=pos,
-            driver_name=driver
-        ))
-
-    for event_type, value in events.items():
-        db.add(RaceEvent(
-            race_result_id=result.id,
-            event_type=event_type,
-            value=value
-        ))
-
-    db.commit()
-
-    # 🔥 VALIDAR LOGROS AUTOMÁTICAMENTE
-    evaluate_race_achievements(db, gp_id)
-
-    db.close()
-
-    return {"message": "Resultado guardado y logros calculados"}
+    # Mismo pipeline que el panel de admin (services/publication.py)
+    job = publish_result(db, gp_id, "manual", {"positions": positions, "events": events})
+    return {"message": "Resultado recibido: publicando en segundo plano.", **job_to_dict(job)}
 
 @router.get("/{gp_id}")
 def get_race_result(
     gp_id: int,
-    current_user = Depends(get_current_user) # Requiere login, pero no ser admin
+    current_user = Depends(get_current_user), # Requiere login, pero no ser admin
+    db: Session = Depends(get_db)
 ):
-    db = SessionLocal()
     result = (
         db.query(RaceResult)
         .filter(RaceResult.gp_id == gp_id)
@@ -81,7 +40,6 @@ def get_race_result(
     )
     
     if not result:
-        db.close()
         raise HTTPException(status_code=404, detail="Resultados no disponibles aún")
 
     # Forzamos la carga de relaciones para que FastAPI las serialice
@@ -93,5 +51,4 @@ def get_race_result(
         "events": {e.event_type: e.value for e in result.events}
     }
     
-    db.close()
     return data
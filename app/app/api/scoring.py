@@ -1,22 +1,22 @@
 from fastapi import APIRouter, HTTPException, Depends
-from app.db.session import SessionLocal
-from app.db.models.prediction import Prediction
+from sqlalchemy.orm import Session
 from app.db.models.race_result import RaceResult
-from app.db.models.multiplier_config import MultiplierConfig
-from app.services.scoring import calculate_prediction_score
-from app.core.deps import get_current_user
+from app.services.scoring import score_and_save_gp
+from app.services.ranking_snapshot import refresh_season_ranking
+from app.core.response_cache import bump_data_version
+from app.core.deps import get_current_user, get_db
 
 router = APIRouter(prefix="/scoring", tags=["Scoring"])
 
 @router.post("/gp/{gp_id}")
 def score_gp(
     gp_id: int,
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Solo admins")
 
-    db = SessionLocal()
 
     race_result = (
         db.query(RaceResult)
@@ -25,35 +25,12 @@ def score_gp(
     )
 
     if not race_result:
-        db.close()
         raise HTTPException(status_code=400, detail="Resultado no introducido")
 
-    predictions = (
-        db.query(Prediction)
-        .filter(Prediction.gp_id == gp_id)
-        .all()
-    )
-
     season_id = race_result.grand_prix.season_id
 
-    multipliers = (
-        db.query(MultiplierConfig)
-        .filter(MultiplierConfig.season_id == season_id)
-        .all()
-    )
-
-    for prediction in predictions:
-        result = calculate_prediction_score(
-            prediction,
-            race_result,
-            multipliers
-        )
-
-        prediction.points_base = result["base_points"]
-        prediction.multiplier = result["multiplier"]
-        prediction.points = result["final_points"]
-
-    db.commit()
-    db.close()
+    score_and_save_gp(db, gp_id, race_result, season_id)
+    refresh_season_ranking(db, season_id)
+    bump_data_version(db, season_id=season_id)
 
     return {"message": "Puntuaciones calculadas"}
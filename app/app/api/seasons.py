@@ -1,28 +1,24 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import joinedload
-from app.db.session import SessionLocal
+from sqlalchemy.orm import Session, joinedload
 from app.db.models.season import Season
 from app.db.models.team import Team
 from app.db.models.team_member import TeamMember
 from app.db.models.constructor import Constructor
-from app.core.deps import get_current_user
+from app.core.deps import get_current_user, get_db
 
 router = APIRouter(prefix="/seasons", tags=["Seasons (Public)"])
 
 @router.get("/")
-def get_seasons(current_user = Depends(get_current_user)):
-    db = SessionLocal()
+def get_seasons(current_user = Depends(get_current_user), db: Session = Depends(get_db)):
     seasons = db.query(Season).order_by(Season.year.desc()).all()
-    db.close()
     return seasons
 
 @router.get("/{season_id}/teams")
-def get_season_teams(season_id: int, current_user = Depends(get_current_user)):
+def get_season_teams(season_id: int, current_user = Depends(get_current_user), db: Session = Depends(get_db)):
     """ 
     Equipos de JUGADORES (Team).
     Devuelve los nombres de los miembros como lista de strings.
     """
-    db = SessionLocal()
     
     # Cargamos Equipo -> Miembros -> Usuario (para sacar el username)
     teams = (
@@ -43,18 +39,15 @@ def get_season_teams(season_id: int, current_user = Depends(get_current_user)):
             "members": member_names # ["User1", "User2"]
         })
         
-    db.close()
     return result
 
 @router.get("/{season_id}/constructors")
-def get_season_constructors(season_id: int, current_user = Depends(get_current_user)):
+def get_season_constructors(season_id: int, current_user = Depends(get_current_user), db: Session = Depends(get_db)):
     """ Parrilla F1 REAL (Constructor + Drivers) """
-    db = SessionLocal()
     constructors = (
         db.query(Constructor)
         .options(joinedload(Constructor.drivers)) # Cargar pilotos automáticamente
         .filter(Constructor.season_id == season_id)
         .all()
     )
-    db.close()
     return constructors
\ No newline at end of file
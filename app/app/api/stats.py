@@ -1,310 +1,264 @@
-from fastapi import APIRouter, Query, HTTPException, Depends
+from typing import Optional
+from fastapi import APIRouter, Query, HTTPException, Depends, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import or_, func, desc
-from app.db.session import SessionLocal
-from app.core.deps import get_current_user
+from sqlalchemy import or_, func, desc, select
+from app.core.deps import get_current_user, get_async_db
 from app.db.models.prediction import Prediction
 from app.db.models.grand_prix import GrandPrix
 from app.db.models.user import User
 from app.db.models.team import Team
-from app.db.models.race_result import RaceResult
 from app.db.models.race_position import RacePosition
-from app.db.models.race_event import RaceEvent
 from app.db.models.prediction_position import PredictionPosition
 from app.db.models.prediction_event import PredictionEvent
 from app.db.models.achievement import Achievement, UserAchievement
-
-import statistics
-from datetime import datetime, timezone
+from app.db.models.ranking_snapshot import RankingSnapshot
+from app.services.ranking_snapshot import neutral_value, as_mode_number
+from app.services.avatar_thumbnails import thumbnail_urls
+from app.core.cache_backends import build_cache
+from app.core.pagination import parse_fields, parse_cursor, keyset_after, take_page, set_next_cursor
+from app.db.models.data_version import DataVersion
+from app.db.models.season import Season
+from app.db.models.user_radar_metrics import UserRadarMetrics, GLOBAL_ROW_ID
+from app.services.radar_metrics import ensure_radar_metrics, RADAR_COLUMNS
 
 router = APIRouter(prefix="/stats", tags=["Stats"])
 
+async def _fill_avatar_thumbs(entries):
+    """
+    avatar_thumb llega con el nombre del archivo del avatar: se cambia por la URL de la miniatura
+    resolviendo una vez cada avatar distinto y fuera del event loop (thumbnail_url toca disco).
+    """
+    entries = list({id(e): e for e in entries}.values()) # La cola de no puntuados se comparte entre GPs
+    thumbs = await run_in_threadpool(thumbnail_urls, [e["avatar_thumb"] for e in entries])
+    for e in entries:
+        e["avatar_thumb"] = thumbs[e["avatar_thumb"]]
+
 @router.get("/evolution")
-def evolution(
+async def evolution(
     season_id: int,
     type: str = Query(..., pattern="^(users|teams)$"),
     ids: list[int] = Query(None),
     names: list[str] = Query(None),
-    mode: str = Query("total", pattern="^(base|total|multiplier)$")
+    mode: str = Query("total", pattern="^(base|total|multiplier)$"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db: Session = SessionLocal()
     response = {}
 
-    try:
-        # --- PROCESAMIENTO SEGÚN TIPO ---
-        # Hemos eliminado el filtro automático de Top 5 para devolver todos los datos
-        # y que el frontend pueda buscar usuarios.
+    # Hemos eliminado el filtro automático de Top 5 para devolver todos los datos
+    # y que el frontend pueda buscar usuarios.
+    # La curva sale de la foto materializada: el acumulado en los GPs donde la entidad jugó.
 
-        if type == "users":
-            query = db.query(User)
+    if type == "users":
+        query = select(User.id, User.username.label("name"))
             
-            # Aplicar filtros solo si se especifican
-            if ids and names:
-                query = query.filter(or_(User.id.in_(ids), User.username.in_(names)))
-            elif ids:
-                query = query.filter(User.id.in_(ids))
-            elif names:
-                query = query.filter(User.username.in_(names))
+        # Aplicar filtros solo si se especifican
+        if ids and names:
+            query = query.filter(or_(User.id.in_(ids), User.username.in_(names)))
+        elif ids:
+            query = query.filter(User.id.in_(ids))
+        elif names:
+            query = query.filter(User.username.in_(names))
             
-            # Si no hay filtros, query.all() devuelve TODOS los usuarios (admins incluidos)
-            items = query.all()
-            
-            if not items:
-                return {}
-
-            for user in items:
-                # Solo incluir predicciones de GPs que tengan resultados guardados
-                preds = (
-                    db.query(Prediction)
-                    .join(GrandPrix)
-                    .join(RaceResult, RaceResult.gp_id == GrandPrix.id)  # JOIN con RaceResult
-                    .filter(
-                        Prediction.user_id == user.id,
-                        GrandPrix.season_id == season_id
-                    )
-                    .order_by(GrandPrix.race_datetime)
-                    .all()
-                )
-
-                acc_value = 1.0 if mode == "multiplier" else 0
-                evolution_list = []
-
-                for p in preds:
-                    if mode == "base":
-                        acc_value += p.points_base
-                    elif mode == "total":
-                        acc_value += p.points
-                    elif mode == "multiplier":
-                        acc_value *= p.multiplier
-
-                    evolution_list.append({
-                        "gp_id": p.gp_id,
-                        "value": round(acc_value, 4)
-                    })
-
-                response[user.username] = evolution_list
+        # Si no hay filtros, devuelve TODOS los usuarios (admins incluidos)
+        items = (await db.execute(query)).all()
 
-        elif type == "teams":
-            query = db.query(Team).filter(Team.season_id == season_id)
+    elif type == "teams":
+        query = select(Team.id, Team.name).filter(Team.season_id == season_id)
             
-            if ids and names:
-                query = query.filter(or_(Team.id.in_(ids), Team.name.in_(names)))
-            elif ids:
-                query = query.filter(Team.id.in_(ids))
-            elif names:
-                query = query.filter(Team.name.in_(names))
-
-            items = query.all()
-            if not items:
-                return {}
-
-            for team in items:
-                member_ids = [tm.user_id for tm in team.members]
-                # Solo incluir predicciones de GPs que tengan resultados guardados
-                preds = (
-                    db.query(Prediction)
-                    .join(GrandPrix)
-                    .join(RaceResult, RaceResult.gp_id == GrandPrix.id)  # JOIN con RaceResult
-                    .filter(
-                        Prediction.user_id.in_(member_ids),
-                        GrandPrix.season_id == season_id
-                    )
-                    .order_by(GrandPrix.race_datetime, Prediction.user_id)
-                    .all()
-                )
-
-                # Agrupar predicciones por GP
-                gp_map = {}
-                for p in preds:
-                    gp_map.setdefault(p.gp_id, []).append(p)
-
-                acc_value = 1.0 if mode == "multiplier" else 0
-                evolution_list = []
-
-                for gp_id in sorted(gp_map.keys()):
-                    gp_preds = gp_map[gp_id]
-
-                    if mode == "base":
-                        gp_points = sum(p.points_base for p in gp_preds)
-                        acc_value += gp_points
-                    elif mode == "total":
-                        gp_points = sum(p.points for p in gp_preds)
-                        acc_value += gp_points
-                    elif mode == "multiplier":
-                        gp_multiplier = 1.0
-                        for p in gp_preds:
-                            gp_multiplier *= p.multiplier
-                        acc_value *= gp_multiplier
+        if ids and names:
+            query = query.filter(or_(Team.id.in_(ids), Team.name.in_(names)))
+        elif ids:
+            query = query.filter(Team.id.in_(ids))
+        elif names:
+            query = query.filter(Team.name.in_(names))
+
+        items = (await db.execute(query)).all()
+
+    if not items:
+        return {}
+
+    # Solo GPs con resultados guardados y en los que la entidad tiene predicción
+    snap_query = (
+        select(RankingSnapshot.entity_id, RankingSnapshot.gp_id, RankingSnapshot.accumulated)
+        .join(GrandPrix, GrandPrix.id == RankingSnapshot.gp_id)
+        .filter(
+            RankingSnapshot.season_id == season_id,
+            RankingSnapshot.entity_type == type,
+            RankingSnapshot.mode == mode,
+            RankingSnapshot.played == True
+        )
+    )
+    if ids or names:
+        snap_query = snap_query.filter(RankingSnapshot.entity_id.in_([i.id for i in items]))
+
+    evolution_map = {}
+    for row in (await db.execute(snap_query.order_by(GrandPrix.race_datetime))).all():
+        evolution_map.setdefault(row.entity_id, []).append({
+            "gp_id": row.gp_id,
+            "value": round(as_mode_number(mode, row.accumulated), 4)
+        })
 
-                    evolution_list.append({
-                        "gp_id": gp_id,
-                        "value": round(acc_value, 4)
-                    })
+    for item in items:
+        response[item.name] = evolution_map.get(item.id, [])
 
-                response[team.name] = evolution_list
+    return response
 
-        return response
 
-    finally:
-        db.close()
 
+RANKING_FIELDS = {
+    "users": ("id", "rank", "name", "acronym", "avatar", "avatar_thumb", "gp_points", "accumulated"),
+    "teams": ("id", "rank", "name", "gp_points", "accumulated"),
+}
+RANKING_DEFAULT_FIELDS = {
+    "users": ("name", "acronym", "avatar", "avatar_thumb", "gp_points", "accumulated"),
+    "teams": ("name", "gp_points", "accumulated"),
+}
 
 @router.get("/ranking")
-def ranking(
+async def ranking(
     season_id: int,
+    response: Response,
     type: str = Query(..., pattern="^(users|teams)$"),
     mode: str = Query("total", pattern="^(base|total|multiplier)$"),
-    limit: int = Query(None)
+    limit: int = Query(None),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    by_gp: bool = True,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db: Session = SessionLocal()
-    try:
-        result = {}
-
-        # Obtener todos los GPs de la temporada
-        gps = db.query(GrandPrix).filter(GrandPrix.season_id == season_id).order_by(GrandPrix.race_datetime).all()
-        if not gps:
-            # Si no hay GPs, devolvemos listas vacías pero estructura válida
-            return {"by_gp": {}, "overall": []}
-
-        # FIX: Identificar GPs con resultados para no incluir los futuros en "by_gp"
-        completed_gp_ids = {res.gp_id for res in db.query(RaceResult.gp_id).filter(RaceResult.gp_id.in_([gp.id for gp in gps])).all()}
-
-        gp_ids = [gp.id for gp in gps]
-
-        if type == "users":
-            users = db.query(User).all()
-            if not users:
-                 return {"by_gp": {}, "overall": []}
-
-            # Inicializar acumuladores por usuario
-            acc = {u.username: 1.0 if mode=="multiplier" else 0 for u in users}
-
-            # Ranking por GP
-            ranking_by_gp = {}
-            for gp_id in gp_ids:
-                preds = db.query(Prediction).filter(Prediction.gp_id==gp_id).all()
-                gp_ranking = []
-                
-                # Crear mapa rápido de predicciones para este GP
-                preds_map = {p.user_id: p for p in preds}
-
-                for u in users:
-                    p = preds_map.get(u.id)
-                    gp_points = 0
-                    if mode == "multiplier": gp_points = 1.0
-
-                    if p and gp_id in completed_gp_ids:
-                        if mode == "base":
-                            gp_points = p.points_base
-                            acc[u.username] += gp_points
-                        elif mode == "total":
-                            gp_points = p.points
-                            acc[u.username] += gp_points
-                        elif mode == "multiplier":
-                            gp_points = p.multiplier
-                            acc[u.username] *= gp_points
-                    else:
-                        # Si no hay predicción en modo multiplier, multiplicamos por 1.0 (neutro)
-                        if mode == "multiplier":
-                            acc[u.username] *= gp_points  # gp_points ya es 1.0
-
-                    gp_ranking.append({
-                        "name": u.username,
-                        "acronym": u.acronym,
-                        "avatar": u.avatar, # <--- Añadimos el avatar
-                        "gp_points": gp_points,
-                        "accumulated": round(acc[u.username], 4)
-                    })
-
-                # Ordenar descendente por acumulado
-                gp_ranking.sort(key=lambda x: x["accumulated"], reverse=True)
-                if limit:
-                    gp_ranking = gp_ranking[:limit]
-                
-                # FIX: Solo añadir al desglose si el GP tiene resultados
-                if gp_id in completed_gp_ids:
-                    ranking_by_gp[gp_id] = gp_ranking
+    """
+    Clasificación de cada GP (by_gp) y general (overall, la foto del último GP con resultados).
+    limit/after paginan por posición: la página es la misma franja de puestos en cada GP y en la
+    general (after=<rank,id> de la última fila de overall; la siguiente en X-Next-Cursor).
+    by_gp=false devuelve solo la general. Solo se leen de la foto las filas de la página.
+    """
+    # Si no hay GPs, devolvemos listas vacías pero estructura válida
+    if not (await db.execute(select(GrandPrix.id).filter(GrandPrix.season_id == season_id).limit(1))).first():
+        return {"by_gp": {}, "overall": []}
+
+    limit = limit or None # limit=0 siempre ha sido "sin límite"
+    wanted = parse_fields(fields, RANKING_FIELDS[type], RANKING_DEFAULT_FIELDS[type])
+    cursor = parse_cursor(after, 2)
+    lo = cursor[0] if cursor else 0 # Último puesto de la página anterior
+    neutral = neutral_value(mode)
+
+    if type == "users":
+        entity = User
+        entity_columns = {"name": User.username, "acronym": User.acronym, "avatar": User.avatar}
+    else:
+        entity = Team
+        entity_columns = {"name": Team.name}
+    needed = [
+        name for name in entity_columns
+        if name in wanted or (name == "avatar" and "avatar_thumb" in wanted)
+    ]
+    info_columns = [entity_columns[name].label(name) for name in needed]
+
+    def entry(row, entity_id, rank, gp_points, accumulated):
+        values = {
+            "id": entity_id,
+            "rank": rank,
+            "gp_points": as_mode_number(mode, gp_points),
+            "accumulated": round(as_mode_number(mode, accumulated), 4),
+        }
+        for name in needed:
+            values[name] = getattr(row, name)
+        if "avatar_thumb" in wanted:
+            values["avatar_thumb"] = row.avatar # Se resuelve al final, una vez por avatar
+        return {f: values[f] for f in wanted}
+
+    snap_filter = (
+        RankingSnapshot.season_id == season_id,
+        RankingSnapshot.entity_type == type,
+        RankingSnapshot.mode == mode,
+    )
+    # GPs de la foto en orden (una fila por GP: el líder) y tamaño de la foto. Toda la temporada
+    # se reescribe a la vez, así que todos los GPs tienen las mismas entidades.
+    gp_ids = list((await db.scalars(
+        select(RankingSnapshot.gp_id)
+        .join(GrandPrix, GrandPrix.id == RankingSnapshot.gp_id)
+        .filter(*snap_filter, RankingSnapshot.rank == 1)
+        .order_by(GrandPrix.race_datetime)
+    )).all())
+    snap_size = (await db.scalar(select(func.max(RankingSnapshot.rank)).filter(*snap_filter))) or 0
+    last_gp_id = gp_ids[-1] if gp_ids else None
+
+    # Filas de la foto con los datos de la entidad (el JOIN descarta las entidades borradas)
+    snap_query = (
+        select(RankingSnapshot.gp_id, RankingSnapshot.entity_id, RankingSnapshot.rank,
+               RankingSnapshot.gp_points, RankingSnapshot.accumulated, *info_columns)
+        .join(entity, entity.id == RankingSnapshot.entity_id)
+        .filter(*snap_filter)
+    )
+
+    # (rank, id, entrada): el cursor necesita rank e id aunque no se hayan pedido en fields
+    page = []
+    if last_gp_id is not None:
+        query = snap_query.filter(RankingSnapshot.gp_id == last_gp_id)
+        if cursor:
+            query = query.filter(keyset_after([(RankingSnapshot.rank, "asc"), (RankingSnapshot.entity_id, "asc")], cursor))
+        query = query.order_by(RankingSnapshot.rank, RankingSnapshot.entity_id)
+        if limit:
+            query = query.limit(limit + 1)
+        page = [
+            (r.rank, r.entity_id, entry(r, r.entity_id, r.rank, r.gp_points, r.accumulated))
+            for r in (await db.execute(query)).all()
+        ]
+
+    # Entidades creadas después de la última foto: no han puntuado, van al final con valor neutro
+    # y puestos a continuación de la foto, por id
+    unseen = []
+    if not limit or len(page) <= limit:
+        unseen_query = select(entity.id.label("entity_id"), *info_columns).order_by(entity.id)
+        if type == "teams":
+            unseen_query = unseen_query.filter(Team.season_id == season_id)
+        if last_gp_id is not None:
+            unseen_query = unseen_query.filter(entity.id.not_in(
+                select(RankingSnapshot.entity_id).filter(*snap_filter, RankingSnapshot.gp_id == last_gp_id)
+            ))
+        first_rank = max(lo, snap_size) + 1
+        if lo > snap_size:
+            unseen_query = unseen_query.offset(lo - snap_size)
+        if limit:
+            unseen_query = unseen_query.limit(limit + 1)
+        unseen = [
+            (first_rank + i, r.entity_id, entry(r, r.entity_id, first_rank + i, neutral, neutral))
+            for i, r in enumerate((await db.execute(unseen_query)).all())
+        ]
+        page += unseen[:limit + 1 - len(page)] if limit else unseen
+
+    page, has_more = take_page(page, limit)
+    if page:
+        set_next_cursor(response, has_more, page[-1][0], page[-1][1])
+    overall = [{k: v for k, v in e.items() if k != "gp_points"} for _, _, e in page]
+
+    ranking_by_gp = {}
+    if by_gp and gp_ids:
+        query = (
+            snap_query.join(GrandPrix, GrandPrix.id == RankingSnapshot.gp_id)
+            .filter(RankingSnapshot.rank > lo)
+            .order_by(GrandPrix.race_datetime, RankingSnapshot.rank)
+        )
+        # Mismos puestos que abarca la página de la general (que salta los huecos de borrados)
+        hi = page[-1][0] if has_more else None
+        if hi is not None:
+            query = query.filter(RankingSnapshot.rank <= hi)
+        ranking_by_gp = {gp_id: [] for gp_id in gp_ids}
+        for r in (await db.execute(query)).all():
+            ranking_by_gp[r.gp_id].append(entry(r, r.entity_id, r.rank, r.gp_points, r.accumulated))
+        tail = [e for rank, _, e in unseen if hi is None or rank <= hi]
+        for gp_ranking in ranking_by_gp.values():
+            gp_ranking.extend(tail)
+        ranking_by_gp = {gp_id: rows for gp_id, rows in ranking_by_gp.items() if rows}
+
+    if "avatar_thumb" in wanted:
+        await _fill_avatar_thumbs(overall + [e for rows in ranking_by_gp.values() for e in rows])
+
+    return {"by_gp": ranking_by_gp, "overall": overall}
+
 
-            result["by_gp"] = ranking_by_gp
-            
-            # Ranking GENERAL final
-            overall_list = [
-                {
-                    "name": u.username, 
-                    "acronym": u.acronym,
-                    "avatar": u.avatar, # <--- Añadimos el avatar
-                    "accumulated": round(acc[u.username], 4)
-                }
-                for u in sorted(users, key=lambda u: acc[u.username], reverse=True)
-            ]
-            
-            if limit:
-                overall_list = overall_list[:limit]
-            
-            result["overall"] = overall_list
-
-        elif type == "teams":
-            teams = db.query(Team).filter(Team.season_id==season_id).all()
-            if not teams:
-                 return {"by_gp": {}, "overall": []}
-
-            # Inicializar acumuladores
-            acc = {t.name: 1.0 if mode=="multiplier" else 0 for t in teams}
-            ranking_by_gp = {}
-
-            for gp_id in gp_ids:
-                gp_ranking = []
-                for t in teams:
-                    member_ids = [tm.user_id for tm in t.members]
-                    preds = db.query(Prediction).filter(
-                        Prediction.user_id.in_(member_ids),
-                        Prediction.gp_id==gp_id
-                    ).all()
-
-                    gp_points = 0
-                    if mode == "multiplier": gp_points = 1.0
-
-                    if preds and gp_id in completed_gp_ids:
-                        if mode == "base":
-                            gp_points = sum(p.points_base for p in preds)
-                            acc[t.name] += gp_points
-                        elif mode == "total":
-                            gp_points = sum(p.points for p in preds)
-                            acc[t.name] += gp_points
-                        elif mode == "multiplier":
-                            for p in preds:
-                                gp_points *= p.multiplier
-                            acc[t.name] *= gp_points
-                    else:
-                        # Si no hay predicciones en modo multiplier, multiplicamos por 1.0 (neutro)
-                        if mode == "multiplier":
-                            acc[t.name] *= gp_points  # gp_points ya es 1.0
-                    
-                    gp_ranking.append({
-                        "name": t.name,
-                        "gp_points": gp_points,
-                        "accumulated": round(acc[t.name], 4)
-                    })
-
-                # Ordenar descendente
-                gp_ranking.sort(key=lambda x: x["accumulated"], reverse=True)
-                if limit:
-                    gp_ranking = gp_ranking[:limit]
-
-                # FIX: Solo añadir al desglose si el GP tiene resultados
-                if gp_id in completed_gp_ids:
-                    ranking_by_gp[gp_id] = gp_ranking
-
-            result["by_gp"] = ranking_by_gp
-            result["overall"] = [
-                {"name": t.name, "accumulated": round(acc[t.name], 4)}
-                for t in sorted(teams, key=lambda t: acc[t.name], reverse=True)
-            ][:limit]
-
-        return result
-    
-    finally:
-        db.close()
 
 # --- UTILIDADES ---
 def normalize_score(value, min_val, max_val, reverse=False):
@@ -319,125 +273,81 @@ def normalize_score(value, min_val, max_val, reverse=False):
     return max(0, min(100, score))
 
 # --- LÓGICA CORE (REUTILIZABLE) ---
-def _calculate_stats(db: Session, target_user_id: int):
-    """Calcula las estadísticas completas de forma instantánea usando cachés y tuplas, manteniendo idéntica la lógica matemática original."""
-    import statistics
-    from app.db.models.user_stats import UserStats, UserGpStats
-    
-    # 1. DATOS PRELIMINARES GLOBALES (Lectura super rápida)
-    all_users = db.query(User.id, User.created_at).all()
-    user_created_map = {u.id: u.created_at.replace(tzinfo=timezone.utc) if u.created_at else datetime.min.replace(tzinfo=timezone.utc) for u in all_users}
-    
-    gps_data = {gp.id: gp for gp in db.query(GrandPrix).options(joinedload(GrandPrix.season)).all()}
-    gps_dates = {gp.id: gp.race_datetime.replace(tzinfo=timezone.utc) if gp.race_datetime.tzinfo is None else gp.race_datetime for gp in gps_data.values()}
-    
-    # Participación por GP para ponderación
-    part_counts = db.query(UserGpStats.gp_id, func.count(UserGpStats.user_id)).group_by(UserGpStats.gp_id).all()
-    gp_participation_map = {gp_id: count for gp_id, count in part_counts}
-
-    # Resultados oficiales (solo necesitamos contar cuántos hubo por carrera para "Vidente")
-    # Vidente = (Aciertos de posiciones + Aciertos de eventos) / (Posibles posiciones + Posibles eventos)
-    # Por defecto, en cada carrera hay 10 posiciones. Los eventos varían, los contamos rápido:
-    race_ev_counts = db.query(RaceResult.gp_id, func.count(RaceEvent.id)).join(RaceEvent, RaceResult.id == RaceEvent.race_result_id).group_by(RaceResult.gp_id).all()
-    gp_events_count = {gp_id: count for gp_id, count in race_ev_counts}
-
-    # 2. Tuplas para lógica rápida
-    # A) UserGpStats para Regularidad, Calidad y Trofeos
-    user_gp_stats = db.query(UserGpStats.user_id, UserGpStats.gp_id, UserGpStats.points).all()
-    user_pts_map = {}
-    gp_pts_map = {}
-    for uid, gpid, pts in user_gp_stats:
-        user_pts_map.setdefault(uid, []).append({'gp_id': gpid, 'points': pts})
-        gp_pts_map.setdefault(gpid, []).append(pts)
-
-    # B) Anticipación (solo necesitamos fechas, sin instanciar las relaciones ORM)
-    preds_dates = db.query(Prediction.user_id, Prediction.gp_id, Prediction.updated_at).all()
-    user_ant_map = {}
-    for uid, gpid, updated in preds_dates:
-        user_ant_map.setdefault(uid, {})[gpid] = updated
-
-    # C) Vidente (usamos UserStats que ya tiene los hits cacheados)
-    cached_stats = db.query(UserStats).all()
-    user_stats_map = {s.user_id: s for s in cached_stats}
-
-    # 3. BUCLE GLOBAL RÁPIDO PARA LAS MÉTRICAS RAW
-    metrics_raw = []
-    for uid, u_created_at in user_created_map.items():
-        u_gps = user_pts_map.get(uid, [])
-        if not u_gps: continue
-
-        # Regularidad: varianza
-        points_list = [x['points'] for x in u_gps]
-        regularity_raw = statistics.variance(points_list) if len(points_list) >= 3 else 999999
-
-        # Compromiso: ratio
-        relevant_gps = sum(1 for gpid, d in gps_dates.items() if gpid in gp_pts_map and d > u_created_at)
-        commitment_raw = 1.0 if relevant_gps == 0 else len(u_gps) / relevant_gps
-
-        # Anticipación: media
-        deltas = []
-        u_preds_d = user_ant_map.get(uid, {})
-        for x in u_gps:
-            gp_date = gps_dates.get(x['gp_id'])
-            p_date = u_preds_d.get(x['gp_id'])
-            if gp_date and p_date:
-                p_date = p_date.replace(tzinfo=timezone.utc) if p_date.tzinfo is None else p_date
-                deltas.append(max(0, (gp_date - p_date).total_seconds()))
-        anticipation_raw = statistics.mean(deltas) if deltas else 0
-
-        # Calidad: Ponderada por participación
-        pod_scores = []
-        for x in u_gps:
-            pts = x['points']
-            gp_id = x['gp_id']
-            total_in_race = gp_participation_map.get(gp_id, 1)
-            better = sum(1 for p in gp_pts_map.get(gp_id, []) if p > pts)
-            rank = better + 1
-            if total_in_race > 0:
-                pos_equiv = (rank / total_in_race) * 100
-                pod_scores.append(100 - pos_equiv)
-            else:
-                pod_scores.append(0)
-        podium_raw = statistics.mean(pod_scores) if pod_scores else 0
-
-        # Vidente: Aciertos caché
-        st = user_stats_map.get(uid)
-        vidente_raw = 0
-        if st:
-            hits = st.exact_positions_count + st.fastest_lap_hits + st.safety_car_hits + st.dnf_count_hits + st.dnf_driver_hits
-            possible = sum((10 + gp_events_count.get(x['gp_id'], 5)) for x in u_gps)
-            vidente_raw = hits / possible if possible > 0 else 0
-
-        metrics_raw.append({
-            "id": uid, "reg": regularity_raw, "com": commitment_raw, 
-            "ant": anticipation_raw, "pod": podium_raw, "vid": vidente_raw
-        })
-
-    # 4. DATOS DEL USUARIO TARGET
-    target_st = user_stats_map.get(target_user_id)
-    if not target_st or target_st.total_gps_played == 0:
+# Caché de lo calculado (LRU local + backend compartido opcional, ver cache_backends).
+# Las claves llevan la versión "stats", que sube al publicar resultados: no hace falta borrar nada.
+stats_cache = build_cache("stats")
+
+RADAR_SUBJECTS = ("Regularidad", "Compromiso", "Anticipación", "Calidad/Podios", "Vidente")
+
+def _stats_version(db: Session) -> int:
+    return db.query(DataVersion.version).filter(DataVersion.scope == "stats").scalar() or 0
+
+def _user_stats(db: Session, version: int, target_user_id: int):
+    """
+    Totales, trofeos, mejor carrera, racha y radar de un usuario. Salen de user_radar_metrics
+    (recalculada al publicar resultados): la fila del usuario y la global de mín/máx.
+    """
+    key = f"v{version}:user:{target_user_id}"
+    cached = stats_cache.get(key)
+    if cached is not None:
+        return cached
+
+    ensure_radar_metrics(db)
+    rows = (
+        db.query(UserRadarMetrics, GrandPrix.name, Season.year)
+        .outerjoin(GrandPrix, GrandPrix.id == UserRadarMetrics.best_gp_id)
+        .outerjoin(Season, Season.id == GrandPrix.season_id)
+        .filter(UserRadarMetrics.user_id.in_([target_user_id, GLOBAL_ROW_ID]))
+        .all()
+    )
+    by_id = {m.user_id: (m, gp_name, year) for m, gp_name, year in rows}
+    if target_user_id not in by_id or not by_id[target_user_id][0].races_played:
         return None
+    me, gp_name, year = by_id[target_user_id]
+    bounds = by_id[GLOBAL_ROW_ID][0]
 
-    target_gps = user_pts_map.get(target_user_id, [])
-    target_gps_sorted = sorted(target_gps, key=lambda x: gps_dates.get(x['gp_id'], datetime.min))
-    
-    total_points = target_st.total_points
-    races_played = target_st.total_gps_played
+    total_points = me.total_points
+    races_played = me.races_played
     avg_points = round(total_points / races_played, 2) if races_played > 0 else 0
 
-    trophies = {"gold": 0, "silver": 0, "bronze": 0}
-    for x in target_gps:
-        pts = x['points']
-        better = sum(1 for p in gp_pts_map.get(x['gp_id'], []) if p > pts)
-        if better == 0: trophies["gold"] += 1
-        elif better == 1: trophies["silver"] += 1
-        elif better == 2: trophies["bronze"] += 1
-    
+    trophies = {"gold": me.gold, "silver": me.silver, "bronze": me.bronze}
     podium_ratio_percent = int(((trophies["gold"]+trophies["silver"]+trophies["bronze"]) / races_played * 100)) if races_played > 0 else 0
 
-    # 5. INSIGHTS (Optimizados en memoria)
-    insights = {"hero": {"code": "---", "count": 0}, "villain": {"code": "---", "count": 0}, "best_race": None, "momentum": 0}
-    
+    # INSIGHTS. Hero y villano se rellenan fuera: dependen de las predicciones
+    insights = {"best_race": None, "momentum": me.momentum}
+    if me.best_gp_id is not None and gp_name is not None:
+        insights["best_race"] = {"gp_name": gp_name, "year": year or 2026, "points": me.best_points, "percentile": f"Top {me.best_percentile}%"}
+
+    # RADAR FINAL usando 'normalize_score' con los mín/máx de la fila global
+    radar_data = []
+    if me.regularity is not None:
+        radar_data = [
+            {"subject": subject, "A": normalize_score(getattr(me, col), getattr(bounds, col), getattr(bounds, f"{col}_max"), reverse=(col == "regularity")), "fullMark": 100}
+            for subject, col in zip(RADAR_SUBJECTS, RADAR_COLUMNS)
+        ]
+
+    if not radar_data:
+        radar_data = [{"subject": "N/A", "A": 0, "fullMark": 100}]
+
+    data = {
+        "total_points": total_points, "avg_points": avg_points, "races_played": races_played,
+        "podium_ratio_percent": podium_ratio_percent,
+        "trophies": trophies,
+        "radar": radar_data, "insights": insights
+    }
+    stats_cache.set(key, data)
+    return data
+
+def _calculate_stats(db: Session, target_user_id: int):
+    """Calcula las estadísticas completas de forma instantánea usando cachés y tuplas, manteniendo idéntica la lógica matemática original."""
+    version = _stats_version(db)
+    res = _user_stats(db, version, target_user_id)
+    if res is None:
+        return None
+
+    # Copia: lo cacheado se comparte entre peticiones y no se debe mutar
+    insights = {"hero": {"code": "---", "count": 0}, "villain": {"code": "---", "count": 0}, **res["insights"]}
+
     # Hero: piloto más puesto en Top 3
     hero = (db.query(PredictionPosition.driver_name, func.count(PredictionPosition.driver_name).label('c'))
             .join(Prediction).filter(
@@ -460,79 +370,56 @@ def _calculate_stats(db: Session, target_user_id: int):
                 .group_by(PredictionEvent.value).order_by(desc('c')).first())
     if villain: insights["villain"] = {"code": villain[0], "count": villain[1]}
 
-    # Best Race
-    best_x = max(target_gps, key=lambda x: x['points']) if target_gps else None
-    if best_x:
-        bgp = gps_data.get(best_x['gp_id'])
-        if bgp:
-            total_in_race = gp_participation_map.get(best_x['gp_id'], 1)
-            worse = sum(1 for p in gp_pts_map.get(best_x['gp_id'], []) if p < best_x['points'])
-            perc = 100
-            if total_in_race > 1:
-                perc = 100 - int((worse / (total_in_race - 1)) * 100)
-            insights["best_race"] = {"gp_name": bgp.name, "year": bgp.season.year if bgp.season else 2026, "points": best_x['points'], "percentile": f"Top {max(1, perc)}%"}
-
-    # Momentum
-    streak = 0
-    for x in reversed(target_gps_sorted):
-        if x['points'] >= avg_points: streak += 1
-        else: break
-    insights["momentum"] = streak
-
-    # 6. RADAR FINAL usando 'normalize_score' (Min/Max scaling equivalente)
-    radar_data = []
-    if metrics_raw:
-        regs = [m["reg"] for m in metrics_raw]; coms = [m["com"] for m in metrics_raw]
-        ants = [m["ant"] for m in metrics_raw]; pods = [m["pod"] for m in metrics_raw]
-        vids = [m["vid"] for m in metrics_raw]
-        my_m = next((m for m in metrics_raw if m["id"] == target_user_id), None)
-        
-        if my_m:
-            radar_data = [
-                {"subject": "Regularidad", "A": normalize_score(my_m["reg"], min(regs), max(regs), reverse=True), "fullMark": 100},
-                {"subject": "Compromiso", "A": normalize_score(my_m["com"], min(coms), max(coms)), "fullMark": 100},
-                {"subject": "Anticipación", "A": normalize_score(my_m["ant"], min(ants), max(ants)), "fullMark": 100},
-                {"subject": "Calidad/Podios", "A": normalize_score(my_m["pod"], min(pods), max(pods)), "fullMark": 100},
-                {"subject": "Vidente", "A": normalize_score(my_m["vid"], min(vids), max(vids)), "fullMark": 100}
-            ]
-            
-    if not radar_data:
-        radar_data = [{"subject": "N/A", "A": 0, "fullMark": 100}]
-
-    return {
-        "total_points": total_points, "avg_points": avg_points, "races_played": races_played,
-        "podium_ratio_percent": podium_ratio_percent,
-        "trophies": trophies,
-        "radar": radar_data, "insights": insights
-    }
+    return {**res, "insights": insights}
 
 # --- ENDPOINTS ---
 
+USER_LIST_FIELDS = ("id", "username", "acronym", "avatar", "avatar_thumb", "created_at")
+
 @router.get("/users")
-def get_all_users_light(current_user: User = Depends(get_current_user)):
-    """Lista ligera para el buscador."""
-    db = SessionLocal()
-    users = db.query(User.id, User.username, User.acronym, User.avatar, User.created_at).all() # Optimizado
-    db.close()
-    return [{"id": u.id, "username": u.username, "acronym": u.acronym, "avatar": u.avatar, "created_at": u.created_at} for u in users]
+async def get_all_users_light(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Lista ligera para el buscador, por id (paginable con ?limit y ?after=<user_id>)."""
+    wanted = parse_fields(fields, USER_LIST_FIELDS)
+    columns = {"id": User.id, "username": User.username, "acronym": User.acronym, "avatar": User.avatar, "created_at": User.created_at}
+    needed = set(wanted) | {"id"} | ({"avatar"} if "avatar_thumb" in wanted else set())
+    query = select(*[col.label(name) for name, col in columns.items() if name in needed]).order_by(User.id)
+    cursor = parse_cursor(after, 1)
+    if cursor:
+        query = query.filter(User.id > cursor[0])
+    if limit:
+        query = query.limit(limit + 1)
+
+    users, has_more = take_page((await db.execute(query)).all(), limit)
+    if users:
+        set_next_cursor(response, has_more, users[-1].id)
+    rows = [
+        {f: u.avatar if f == "avatar_thumb" else getattr(u, f) for f in wanted}
+        for u in users
+    ]
+    if "avatar_thumb" in wanted:
+        await _fill_avatar_thumbs(rows)
+    return rows
 
 @router.get("/me")
-def get_my_stats(current_user: User = Depends(get_current_user)):
-    db = SessionLocal()
-    res = _calculate_stats(db, current_user.id)
-    db.close()
+async def get_my_stats(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    # _calculate_stats es código ORM síncrono: run_sync lo ejecuta sobre la conexión asíncrona
+    res = await db.run_sync(_calculate_stats, current_user.id)
     return res
 
 @router.get("/user/{user_id}")
-def get_user_stats(user_id: int, current_user: User = Depends(get_current_user)):
-    db = SessionLocal()
+async def get_user_stats(user_id: int, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     # Verificar si usuario existe
-    u = db.query(User).get(user_id)
+    u = await db.get(User, user_id)
     if not u:
-        db.close()
         raise HTTPException(404, "Usuario no encontrado")
-    res = _calculate_stats(db, user_id)
-    db.close()
+    res = await db.run_sync(_calculate_stats, user_id)
     return res
 
 # --- ENDPOINTS DE LOGROS (Necesarios para ver los de otros) ---
@@ -540,57 +427,54 @@ def get_user_stats(user_id: int, current_user: User = Depends(get_current_user))
 # Aquí asumo que lo ponemos en stats para simplificar la importación.
 
 @router.get("/achievements/{user_id}")
-def get_user_achievements(user_id: int, current_user: User = Depends(get_current_user)):
-    db = SessionLocal()
-    try:
-        # Verificar que el usuario existe
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-
-        all_achievements = db.query(Achievement).all()
+async def get_user_achievements(user_id: int, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    # Verificar que el usuario existe
+    user = await db.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    all_achievements = (await db.scalars(select(Achievement))).all()
         
-        # Carga optimizada de los logros del usuario con sus relaciones
-        unlocked_rows = db.query(UserAchievement).options(
-            joinedload(UserAchievement.gp).joinedload(GrandPrix.season),
-            joinedload(UserAchievement.season)
-        ).filter(UserAchievement.user_id == user_id).all()
+    # Carga optimizada de los logros del usuario con sus relaciones
+    # (en asyncio no hay carga perezosa: todo lo que se usa abajo va en los joinedload)
+    unlocked_rows = (await db.scalars(select(UserAchievement).options(
+        joinedload(UserAchievement.gp).joinedload(GrandPrix.season),
+        joinedload(UserAchievement.season)
+    ).filter(UserAchievement.user_id == user_id))).all()
         
-        unlocked_map = {}
-        for u in unlocked_rows:
-            season_name = None
-            if u.season:
-                season_name = u.season.name
-            elif u.gp and u.gp.season:
-                season_name = u.gp.season.name
+    unlocked_map = {}
+    for u in unlocked_rows:
+        season_name = None
+        if u.season:
+            season_name = u.season.name
+        elif u.gp and u.gp.season:
+            season_name = u.gp.season.name
                 
-            unlocked_map[u.achievement_id] = {
-                "unlocked_at": u.unlocked_at,
-                "gp_name": u.gp.name if u.gp else None,
-                "season_name": season_name
-            }
+        unlocked_map[u.achievement_id] = {
+            "unlocked_at": u.unlocked_at,
+            "gp_name": u.gp.name if u.gp else None,
+            "season_name": season_name
+        }
         
-        result = []
-        for ach in all_achievements:
-            is_unlocked = ach.id in unlocked_map
-            unlocked_data = unlocked_map.get(ach.id)
+    result = []
+    for ach in all_achievements:
+        is_unlocked = ach.id in unlocked_map
+        unlocked_data = unlocked_map.get(ach.id)
 
-            is_hidden = ach.rarity == "HIDDEN" and not is_unlocked
+        is_hidden = ach.rarity == "HIDDEN" and not is_unlocked
             
-            result.append({
-                "id": ach.id,
-                "slug": ach.slug,
-                "name": "???" if is_hidden else ach.name,
-                "description": "Logro Secreto: Sigue jugando para descubrirlo." if is_hidden else ach.description,
-                "icon": "Lock" if is_hidden else ach.icon,
-                "rarity": ach.rarity.value,
-                "type": ach.type.value,
-                "unlocked": is_unlocked,
-                "unlocked_at": unlocked_data["unlocked_at"] if unlocked_data else None,
-                "gp_name": unlocked_data["gp_name"] if unlocked_data else None,
-                "season_name": unlocked_data["season_name"] if unlocked_data else None,
-            })
+        result.append({
+            "id": ach.id,
+            "slug": ach.slug,
+            "name": "???" if is_hidden else ach.name,
+            "description": "Logro Secreto: Sigue jugando para descubrirlo." if is_hidden else ach.description,
+            "icon": "Lock" if is_hidden else ach.icon,
+            "rarity": ach.rarity.value,
+            "type": ach.type.value,
+            "unlocked": is_unlocked,
+            "unlocked_at": unlocked_data["unlocked_at"] if unlocked_data else None,
+            "gp_name": unlocked_data["gp_name"] if unlocked_data else None,
+            "season_name": unlocked_data["season_name"] if unlocked_data else None,
+        })
             
-        return result
-    finally:
-        db.close()
\ No newline at end of file
+    return result
\ No newline at end of file
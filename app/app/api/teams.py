@@ -1,29 +1,28 @@
 import secrets
 import string
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import joinedload
-from app.db.session import SessionLocal
+from sqlalchemy.orm import Session, joinedload
 from app.db.models.team import Team
 from app.db.models.team_member import TeamMember
 from app.db.models.season import Season
-from app.core.deps import get_current_user
+from app.core.deps import get_current_user, get_db
+from app.core.response_cache import bump_data_version
+from app.services.ranking_snapshot import refresh_season_ranking
 from app.services.achievements_service import grant_achievements
 from app.core.utils import generate_join_code
 
 router = APIRouter(prefix="/teams", tags=["Player Teams"])
 
 @router.get("/my-team")
-def get_my_team(current_user = Depends(get_current_user)):
+def get_my_team(current_user = Depends(get_current_user), db: Session = Depends(get_db)):
     """
     Devuelve la información de tu equipo actual en la temporada activa.
     Incluye el código para invitar amigos.
     """
-    db = SessionLocal()
     
     # 1. Buscar temporada activa
     active_season = db.query(Season).filter(Season.is_active == True).first()
     if not active_season:
-        db.close()
         # Si no hay temporada activa, no devolvemos error, solo null
         return None
 
@@ -39,7 +38,6 @@ def get_my_team(current_user = Depends(get_current_user)):
     )
 
     if not membership:
-        db.close()
         return None
 
     # 3. Formatear respuesta limpia
@@ -54,20 +52,17 @@ def get_my_team(current_user = Depends(get_current_user)):
         "is_full": len(members_names) >= 2
     }
     
-    db.close()
     return response
 
 @router.post("/create")
-def create_team_player(name: str, current_user = Depends(get_current_user)):
+def create_team_player(name: str, current_user = Depends(get_current_user), db: Session = Depends(get_db)):
     """
     Crea un equipo nuevo y asigna al creador como primer miembro.
     """
-    db = SessionLocal()
 
     # 1. Validar temporada activa
     active_season = db.query(Season).filter(Season.is_active == True).first()
     if not active_season:
-        db.close()
         raise HTTPException(400, "No hay una temporada activa para crear equipos.")
 
     # 2. Verificar que el usuario no tenga equipo ya
@@ -77,7 +72,6 @@ def create_team_player(name: str, current_user = Depends(get_current_user)):
     ).first()
     
     if existing_member:
-        db.close()
         raise HTTPException(400, "Ya perteneces a una escudería en esta temporada.")
 
     # 3. Generar código único
@@ -104,6 +98,8 @@ def create_team_player(name: str, current_user = Depends(get_current_user)):
         db.add(membership)
         
         db.commit()
+        refresh_season_ranking(db, active_season.id, entity_types=("teams",))
+        bump_data_version(db, season_id=active_season.id)
         db.refresh(new_team)
         grant_achievements(db, current_user.id, ["event_founder","event_join_team"], season_id=active_season.id)
         
@@ -111,20 +107,16 @@ def create_team_player(name: str, current_user = Depends(get_current_user)):
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        db.close()
 
 @router.post("/join")
-def join_team_player(code: str, current_user = Depends(get_current_user)):
+def join_team_player(code: str, current_user = Depends(get_current_user), db: Session = Depends(get_db)):
     """
     Unirse a un equipo usando el código de invitación.
     """
-    db = SessionLocal()
     
     # 1. Validar temporada
     active_season = db.query(Season).filter(Season.is_active == True).first()
     if not active_season:
-        db.close()
         raise HTTPException(400, "No hay temporada activa.")
 
     # 2. Verificar si usuario ya tiene equipo
@@ -134,7 +126,6 @@ def join_team_player(code: str, current_user = Depends(get_current_user)):
     ).first()
     
     if existing_member:
-        db.close()
         raise HTTPException(400, "Ya tienes equipo. Debes salirte primero.")
 
     # 3. Buscar el equipo por código
@@ -144,13 +135,11 @@ def join_team_player(code: str, current_user = Depends(get_current_user)):
     ).first()
     
     if not team:
-        db.close()
         raise HTTPException(404, "Código de escudería inválido o de otra temporada.")
 
     # 4. Verificar capacidad (Máximo 2)
     current_members_count = db.query(TeamMember).filter(TeamMember.team_id == team.id).count()
     if current_members_count >= 2:
-        db.close()
         raise HTTPException(400, "La escudería está completa (Max 2 pilotos).")
 
     try:
@@ -166,6 +155,9 @@ def join_team_player(code: str, current_user = Depends(get_current_user)):
         team_name = team.name 
         
         db.commit()
+        # Los puntos del equipo salen de sus miembros actuales
+        refresh_season_ranking(db, active_season.id, entity_types=("teams",))
+        bump_data_version(db, season_id=active_season.id)
         grant_achievements(db, current_user.id, ["event_join_team"], season_id=active_season.id)
 
         # Usamos la variable team_name, no team.name (que podría dar error de 'DetachedInstance')
@@ -173,20 +165,16 @@ def join_team_player(code: str, current_user = Depends(get_current_user)):
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        db.close()
 
 @router.delete("/leave")
-def leave_team_player(current_user = Depends(get_current_user)):
+def leave_team_player(current_user = Depends(get_current_user), db: Session = Depends(get_db)):
     """
     Salirse del equipo actual.
     Si el equipo queda vacío (0 miembros), SE BORRA automáticamente.
     """
-    db = SessionLocal()
     
     active_season = db.query(Season).filter(Season.is_active == True).first()
     if not active_season:
-        db.close()
         raise HTTPException(400, "No hay temporada activa.")
 
     # 1. Buscar mi membresía
@@ -196,7 +184,6 @@ def leave_team_player(current_user = Depends(get_current_user)):
     ).first()
 
     if not membership:
-        db.close()
         raise HTTPException(400, "No tienes equipo del que salir.")
 
     team_id = membership.team_id
@@ -215,5 +202,6 @@ def leave_team_player(current_user = Depends(get_current_user)):
             db.delete(team_to_delete)
             db.commit()
 
-    db.close()
+    refresh_season_ranking(db, active_season.id, entity_types=("teams",))
+    bump_data_version(db, season_id=active_season.id)
     return {"message": "Has abandonado la escudería."}
\ No newline at end of file
@@ -0,0 +1,124 @@
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import text
+
+from app.db.session import engine, Base, SessionLocal
+from app.db.models.bootstrap_run import BootstrapRun
+
+# Clave fija del advisory lock de PostgreSQL para el arranque (cualquier bigint sirve)
+BOOTSTRAP_LOCK_KEY = 0x46315F424F4F54  # "F1_BOOT"
+
+# Identificador del despliegue. Sin él (desarrollo local) el bootstrap se ejecuta en cada arranque.
+DEPLOYMENT_ID = os.getenv("DEPLOYMENT_ID") or os.getenv("RENDER_GIT_COMMIT")
+
+# Fases que se pueden saltar: BOOTSTRAP_SKIP=avatars,achievements
+SKIP_PHASES = {p.strip() for p in os.getenv("BOOTSTRAP_SKIP", "").split(",") if p.strip()}
+
+# Perfil del último arranque de este proceso (GET /admin/startup)
+startup_profile = {"status": "pending", "phases": {}}
+
+@contextmanager
+def _deployment_lock():
+    """
+    En PostgreSQL serializa el arranque entre workers con un advisory lock de sesión:
+    el primero hace el trabajo y los demás esperan y encuentran la marca ya escrita.
+    En SQLite (desarrollo, un solo proceso) no hace falta.
+    """
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": BOOTSTRAP_LOCK_KEY})
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": BOOTSTRAP_LOCK_KEY})
+            conn.commit()
+
+def _previous_run(db):
+    """Marca del despliegue actual, o None si hay que hacer el arranque completo."""
+    if not DEPLOYMENT_ID or os.getenv("BOOTSTRAP_FORCE") == "1":
+        return None
+    return db.get(BootstrapRun, DEPLOYMENT_ID)
+
+def _phases():
+    # Importaciones diferidas: estos módulos arrastran routers y no deben cargarse antes que los modelos
+    from app.db.db_utils import sync_all_sequences, add_missing_columns
+    from app.api.avatars import sync_avatars_from_disk
+    from app.api.achievements import seed_achievements
+    from app.services.achievements_service import backfill_running_stats
+    from app.services.bingo_stats import rebuild_bingo_stats
+    from app.services.ranking_snapshot import build_missing_rankings
+    return [
+        ("columns", add_missing_columns),
+        ("sequences", sync_all_sequences),
+        ("avatars", sync_avatars_from_disk),
+        ("achievements", seed_achievements),
+        ("running_stats", backfill_running_stats),
+        ("bingo_stats", rebuild_bingo_stats),
+        ("rankings", build_missing_rankings),
+    ]
+
+def run_bootstrap() -> dict:
+    """
+    Trabajo de arranque (antes se hacía al importar main.py): crear tablas y columnas nuevas,
+    sincronizar secuencias, avatares y logros, y poner al día los agregados de UserStats.
+    Una vez por despliegue, con el tiempo de cada fase.
+    """
+    started = time.perf_counter()
+    phases = {}
+    status = "done"
+
+    def timed(name, fn, *args):
+        if name in SKIP_PHASES:
+            phases[name] = "skipped"
+            return
+        t0 = time.perf_counter()
+        fn(*args)
+        phases[name] = round(time.perf_counter() - t0, 4)
+        print(f"⏱️  Arranque - {name}: {phases[name]:.3f}s")
+
+    with _deployment_lock():
+        # Lo que hemos esperado a que otro worker terminase su arranque
+        phases["lock_wait"] = round(time.perf_counter() - started, 4)
+
+        # La tabla de marcas tiene que existir antes de poder consultarla
+        BootstrapRun.__table__.create(bind=engine, checkfirst=True)
+
+        db = SessionLocal()
+        try:
+            previous = _previous_run(db)
+            # Las fases saltadas con BOOTSTRAP_SKIP quedan pendientes en la marca: el siguiente
+            # arranque del mismo despliegue las hace (salvo que también las salte)
+            pending = None if previous is None else {
+                name for name, value in (previous.phases or {}).items() if value == "skipped"
+            }
+            if pending == set():
+                status = "skipped"
+                print(f"⏭️  Bootstrap ya hecho para el despliegue {DEPLOYMENT_ID}")
+            else:
+                steps = [("create_all", Base.metadata.create_all, engine)] + [(name, fn, db) for name, fn in _phases()]
+                for name, fn, arg in steps:
+                    if pending is None or name in pending:
+                        timed(name, fn, arg)
+
+                if DEPLOYMENT_ID:
+                    recorded = {**(previous.phases if previous else {}), **phases}
+                    db.merge(BootstrapRun(deployment_id=DEPLOYMENT_ID, finished_at=datetime.utcnow(), phases=recorded))
+                    db.commit()
+        finally:
+            db.close()
+
+    startup_profile.update({
+        "status": status,
+        "deployment_id": DEPLOYMENT_ID,
+        "skip": sorted(SKIP_PHASES),
+        "phases": phases,
+        "total_s": round(time.perf_counter() - started, 4),
+        "finished_at": datetime.utcnow(),
+    })
+    print(f"🚀 Arranque completado ({status}) en {startup_profile['total_s']:.3f}s")
+    return startup_profile
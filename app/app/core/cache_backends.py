@@ -0,0 +1,238 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+class CacheBackend:
+    """
+    Interfaz mínima de caché clave -> valor con TTL. Los valores son objetos Python
+    (dicts, listas...); los backends compartidos los serializan con pickle.
+    """
+    name = "base"
+
+    def get(self, key: str):
+        raise NotImplementedError
+
+    def set(self, key: str, value, ttl: float = None):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {"backend": self.name}
+
+class MemoryLRUBackend(CacheBackend):
+    """LRU en memoria del proceso. Sin serialización: el valor se comparte, no se debe mutar."""
+    name = "memory"
+
+    def __init__(self, maxsize: int = 256, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry and entry[1] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value, ttl: float = None):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + (ttl or self.ttl))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": self.name,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_s": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+class SQLiteBackend(CacheBackend):
+    """
+    Caché en un archivo SQLite local, compartida por todos los workers de la máquina.
+    Expira por TTL y, al pasar de max_entries, borra las entradas que antes caducan.
+    """
+    name = "sqlite"
+
+    def __init__(self, path: str, ttl: float = 300.0, max_entries: int = 5000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires_at REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_expires ON cache (expires_at)")
+
+    def _conn(self):
+        # Una conexión por hilo: sqlite3 no comparte conexiones entre hilos
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str):
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def set(self, key: str, value, ttl: float = None):
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), now + (ttl or self.ttl)),
+        )
+        conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+        conn.execute(
+            "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def delete(self, key: str):
+        self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self):
+        self._conn().execute("DELETE FROM cache")
+
+    def stats(self) -> dict:
+        size = self._conn().execute("SELECT COUNT(*) FROM cache WHERE expires_at > ?", (time.time(),)).fetchone()[0]
+        return {"backend": self.name, "path": self.path, "size": size, "max_entries": self.max_entries, "ttl_s": self.ttl}
+
+class RedisBackend(CacheBackend):
+    """
+    Cualquier servidor que hable el protocolo de Redis (Redis, Valkey, KeyDB o un stub local).
+    Necesita el paquete `redis`; solo se importa si se elige este backend.
+    """
+    name = "redis"
+
+    def __init__(self, url: str, ttl: float = 300.0, prefix: str = "porras:"):
+        import redis
+        self.ttl = ttl
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str):
+        raw = self._client.get(self.prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value, ttl: float = None):
+        self._client.set(self.prefix + key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ex=max(1, int(ttl or self.ttl)))
+
+    def delete(self, key: str):
+        self._client.delete(self.prefix + key)
+
+    def clear(self):
+        keys = list(self._client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self._client.delete(*keys)
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "prefix": self.prefix, "ttl_s": self.ttl}
+
+class TieredCache(CacheBackend):
+    """
+    LRU en memoria delante de un backend compartido: los aciertos locales no salen del proceso
+    y los fallos locales se rellenan desde el compartido (que calculó otro worker).
+    """
+    name = "tiered"
+
+    def __init__(self, local: MemoryLRUBackend, shared: CacheBackend = None):
+        self.local = local
+        self.shared = shared
+
+    def get(self, key: str):
+        value = self.local.get(key)
+        if value is None and self.shared is not None:
+            try:
+                value = self.shared.get(key)
+            except Exception as e:
+                # Un backend compartido caído no debe tumbar las estadísticas: se recalculan
+                print(f"⚠️ Caché compartida ({self.shared.name}) no disponible: {e}")
+                value = None
+            if value is not None:
+                self.local.set(key, value)
+        return value
+
+    def set(self, key: str, value, ttl: float = None):
+        self.local.set(key, value, ttl)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value, ttl)
+            except Exception as e:
+                print(f"⚠️ Caché compartida ({self.shared.name}) no disponible: {e}")
+
+    def delete(self, key: str):
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(key)
+
+    def clear(self):
+        self.local.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "local": self.local.stats(),
+            "shared": self.shared.stats() if self.shared is not None else None,
+        }
+
+def build_cache(namespace: str) -> TieredCache:
+    """
+    Caché configurada por entorno:
+    - STATS_CACHE_BACKEND: "memory" (por defecto), "sqlite" o "redis"
+    - STATS_CACHE_URL: ruta del archivo SQLite o URL redis://
+    - STATS_CACHE_TTL / STATS_CACHE_SIZE: TTL en segundos y tamaño del LRU local
+    """
+    ttl = float(os.getenv("STATS_CACHE_TTL", "600"))
+    local = MemoryLRUBackend(maxsize=int(os.getenv("STATS_CACHE_SIZE", "256")), ttl=ttl)
+
+    kind = os.getenv("STATS_CACHE_BACKEND", "memory").lower()
+    shared = None
+    if kind == "sqlite":
+        shared = SQLiteBackend(os.getenv("STATS_CACHE_URL", f"cache/{namespace}_cache.sqlite3"), ttl=ttl)
+    elif kind == "redis":
+        shared = RedisBackend(os.getenv("STATS_CACHE_URL", "redis://localhost:6379/0"), ttl=ttl, prefix=f"porras:{namespace}:")
+    return TieredCache(local, shared)
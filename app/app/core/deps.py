@@ -1,30 +1,68 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
 from app.core.security import SECRET_KEY, ALGORITHM
-from app.db.session import SessionLocal
+from app.db.session import SessionLocal, AsyncSessionLocal
+from app.db import pool_metrics as _pool_metrics # Registra la instrumentación del pool
+from app.core.principal_cache import Principal, principal_cache
 from app.db.models.user import User
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
+def get_db(request: Request):
+    """
+    Sesión por petición. Se cierra siempre, también cuando el endpoint lanza una excepción.
+    La conexión se pide al pool con la primera query; app/db/pool_metrics.py mide la espera y
+    la retención de cada checkout por ruta.
+    """
+    db = SessionLocal()
+    db.info["route"] = getattr(request.scope.get("route"), "path", request.url.path)
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db(request: Request):
+    """
+    Igual que get_db pero con AsyncSession, para los endpoints `async def` de lectura.
+    Comparte las métricas de get_db (espera y retención por ruta).
+    """
+    db = AsyncSessionLocal()
+    db.info["route"] = getattr(request.scope.get("route"), "path", request.url.path)
+    try:
+        yield db
+    finally:
+        await db.close()
+
+def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
+    """
+    Usuario del token. Sale de la caché de principals si está (sin tocar la BD);
+    si no, se carga una vez y se cachea hasta que caduque o se modifique el usuario.
+    """
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id = int(payload.get("sub"))
     except:
         raise HTTPException(status_code=401, detail="Token inválido")
 
-    db = SessionLocal()
-    user = db.query(User).get(user_id)
-    db.close()
+    principal = principal_cache.get(user_id)
+    if principal:
+        return principal
 
-    if not user:
-        raise HTTPException(status_code=401, detail="Usuario no encontrado")
+    db = SessionLocal()
+    try:
+        user = db.query(User).get(user_id)
+        if not user:
+            raise HTTPException(status_code=401, detail="Usuario no encontrado")
+        principal = Principal(user)
+    finally:
+        db.close()
 
-    return user
+    principal_cache.put(principal)
+    return principal
 
 def require_admin(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     if current_user.role != "admin":
         raise HTTPException(
@@ -0,0 +1,223 @@
+import asyncio
+import json
+import os
+import select
+import threading
+import time
+from datetime import datetime
+
+# Canal de eventos en vivo por temporada (GET /events/season/{id}, SSE). Lo que se publica es un
+# diff compacto (rankings que cambian, puntos nuevos, casillas...) para que el frontend no tenga
+# que volver a pedir /stats/ranking, /standings o /bingo/board tras cada carrera.
+#
+# El hub reparte en memoria a los clientes conectados a ESTE proceso. Con varios workers, los
+# eventos pasan por un broker (Redis pub/sub o LISTEN/NOTIFY de PostgreSQL) y cada worker los
+# reparte a los suyos: el que publica también los recibe por el broker, nunca dos veces.
+
+# Mensajes pendientes por cliente. Si se llena (cliente lento), se descarta lo pendiente y se
+# le manda un "resync": recargar todo una vez es más barato que acumular diffs sin límite.
+QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "64"))
+HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+
+RESYNC = json.dumps({"type": "resync"}, separators=(",", ":"))
+
+class Broker:
+    """Transporte entre procesos: publish() en un worker acaba en deliver() de todos."""
+    name = "base"
+
+    def start(self, deliver):
+        raise NotImplementedError
+
+    def publish(self, channel: str, payload: str):
+        raise NotImplementedError
+
+class LocalBroker(Broker):
+    """Un solo proceso (desarrollo, o un único worker): entrega directa."""
+    name = "memory"
+
+    def start(self, deliver):
+        self._deliver = deliver
+
+    def publish(self, channel: str, payload: str):
+        self._deliver(channel, payload)
+
+class RedisBroker(Broker):
+    """Redis pub/sub. Necesita el paquete `redis`; solo se importa si se elige este broker."""
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = "porras:events:"):
+        import redis
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def start(self, deliver):
+        def listen():
+            while True:
+                try:
+                    pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                    pubsub.psubscribe(self.prefix + "*")
+                    for message in pubsub.listen():
+                        if message["type"] == "pmessage":
+                            deliver(message["channel"].decode()[len(self.prefix):], message["data"].decode())
+                except Exception as e:
+                    print(f"⚠️ Broker de eventos (redis): {e}. Reconectando...")
+                    time.sleep(2)
+        threading.Thread(target=listen, name="events-redis", daemon=True).start()
+
+    def publish(self, channel: str, payload: str):
+        self._client.publish(self.prefix + channel, payload)
+
+class PostgresBroker(Broker):
+    """
+    LISTEN/NOTIFY de PostgreSQL: sin servicios extra en un despliegue que ya tiene la BD.
+    NOTIFY admite hasta ~8000 bytes; un diff más grande se sustituye por un "resync".
+    """
+    name = "postgres"
+    PG_CHANNEL = "porras_events"
+    MAX_PAYLOAD = 7900
+
+    def __init__(self, url: str):
+        # psycopg2 acepta la URL de SQLAlchemy sin el sufijo del driver
+        self.url = url.replace("postgresql+psycopg2://", "postgresql://", 1)
+
+    def start(self, deliver):
+        def listen():
+            import psycopg2
+            while True:
+                try:
+                    conn = psycopg2.connect(self.url)
+                    conn.set_isolation_level(0) # AUTOCOMMIT: LISTEN fuera de transacción
+                    conn.cursor().execute(f"LISTEN {self.PG_CHANNEL}")
+                    while True:
+                        if select.select([conn], [], [], 30) == ([], [], []):
+                            continue
+                        conn.poll()
+                        while conn.notifies:
+                            channel, _, payload = conn.notifies.pop(0).payload.partition("|")
+                            deliver(channel, payload)
+                except Exception as e:
+                    print(f"⚠️ Broker de eventos (postgres): {e}. Reconectando...")
+                    time.sleep(2)
+        threading.Thread(target=listen, name="events-postgres", daemon=True).start()
+
+    def publish(self, channel: str, payload: str):
+        from sqlalchemy import text
+        from app.db.session import engine
+        if len(payload.encode()) > self.MAX_PAYLOAD:
+            payload = RESYNC
+        with engine.connect() as conn:
+            conn.execute(text("SELECT pg_notify(:ch, :payload)"), {"ch": self.PG_CHANNEL, "payload": f"{channel}|{payload}"})
+            conn.commit()
+
+class Subscriber:
+    """Un cliente conectado: su cola vive en el event loop del servidor."""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.dropped = 0
+
+    def offer(self, payload: str):
+        # Se ejecuta en el event loop (call_soon_threadsafe): no hace falta lock
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+                self.dropped += 1
+            self.queue.put_nowait(RESYNC)
+            return
+        self.queue.put_nowait(payload)
+
+class EventHub:
+    """Reparto en memoria por canal ("season:<id>") a los clientes de este proceso."""
+
+    def __init__(self, broker: Broker):
+        self.broker = broker
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._started = False
+        self.published = 0
+        self.delivered = 0
+
+    def _ensure_started(self):
+        with self._lock:
+            if not self._started:
+                self.broker.start(self._deliver)
+                self._started = True
+
+    def subscribe(self, channel: str) -> Subscriber:
+        """Llamar desde el event loop (handler async)."""
+        self._ensure_started()
+        sub = Subscriber(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, channel: str, sub: Subscriber):
+        with self._lock:
+            subs = self._subscribers.get(channel)
+            if subs:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[channel]
+
+    def _deliver(self, channel: str, payload: str):
+        # Puede llegar desde cualquier hilo (worker de publicación, listener del broker...)
+        with self._lock:
+            subs = list(self._subscribers.get(channel, ()))
+        for sub in subs:
+            try:
+                sub.loop.call_soon_threadsafe(sub.offer, payload)
+                self.delivered += 1
+            except RuntimeError:
+                self.unsubscribe(channel, sub) # Event loop cerrado
+
+    def publish(self, channel: str, event: dict):
+        """
+        Serializa una vez y publica. Nunca lanza: un fallo del broker no debe tumbar la
+        escritura que ya se ha hecho (los clientes se pondrán al día en la siguiente carga).
+        """
+        payload = json.dumps({**event, "ts": datetime.utcnow().isoformat()}, separators=(",", ":"), default=str)
+        try:
+            self._ensure_started()
+            self.broker.publish(channel, payload)
+            self.published += 1
+        except Exception as e:
+            print(f"⚠️ No se pudo publicar el evento en {channel}: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            channels = {channel: len(subs) for channel, subs in self._subscribers.items()}
+            dropped = sum(sub.dropped for subs in self._subscribers.values() for sub in subs)
+        return {
+            "broker": self.broker.name,
+            "channels": channels,
+            "subscribers": sum(channels.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": dropped,
+            "queue_size": QUEUE_SIZE,
+        }
+
+def build_event_hub() -> EventHub:
+    """
+    Hub configurado por entorno:
+    - EVENTS_BROKER: "memory" (por defecto), "redis" o "postgres"
+    - EVENTS_URL: URL redis:// o de PostgreSQL (por defecto, DATABASE_URL)
+    """
+    kind = os.getenv("EVENTS_BROKER", "memory").lower()
+    if kind == "redis":
+        broker = RedisBroker(os.getenv("EVENTS_URL", "redis://localhost:6379/0"))
+    elif kind == "postgres":
+        from app.db.session import DATABASE_URL
+        broker = PostgresBroker(os.getenv("EVENTS_URL", DATABASE_URL))
+    else:
+        broker = LocalBroker()
+    return EventHub(broker)
+
+event_hub = build_event_hub()
+
+def season_channel(season_id: int) -> str:
+    return f"season:{season_id}"
+
+def publish_season_event(season_id: int, event_type: str, **data):
+    event_hub.publish(season_channel(season_id), {"type": event_type, "season_id": season_id, **data})
@@ -0,0 +1,115 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+
+from app.core.security import BCRYPT_ROUNDS, hash_password, verify_and_update_password
+
+class HashingPool:
+    """
+    Pool acotado para bcrypt (hash/verify). bcrypt suelta el GIL, así que unos pocos hilos
+    dedicados bastan para usar varios núcleos sin ocupar el threadpool de FastAPI ni el event loop.
+    Con una avalancha de logins la cola crece hasta max_queue y a partir de ahí se responde 503:
+    el resto de rutas sigue atendiéndose.
+    """
+
+    def __init__(self, workers: int = 4, max_queue: int = 64, window: int = 1000):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._wait = deque(maxlen=window)
+        self._run = deque(maxlen=window)
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.max_queued = 0
+
+    def _reserve(self):
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail="Demasiados inicios de sesión a la vez, inténtalo en unos segundos",
+                    headers={"Retry-After": "2"},
+                )
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+
+    def _task(self, fn, args, submitted):
+        started = time.perf_counter()
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        try:
+            return fn(*args)
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self._wait.append(started - submitted)
+                self._run.append(finished - started)
+
+    def submit(self, fn, *args):
+        self._reserve()
+        return self._executor.submit(self._task, fn, args, time.perf_counter())
+
+    async def run(self, fn, *args):
+        """Para endpoints async: espera el resultado sin bloquear el event loop."""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def call(self, fn, *args):
+        """Para endpoints síncronos (ya corren en un hilo del threadpool)."""
+        return self.submit(fn, *args).result()
+
+    # --- Atajos ---
+    async def hash(self, password: str) -> str:
+        return await self.run(hash_password, password)
+
+    async def verify_and_update(self, password: str, hashed: str):
+        return await self.run(verify_and_update_password, password, hashed)
+
+    def reset(self):
+        with self._lock:
+            self._wait.clear()
+            self._run.clear()
+            self.completed = self.rejected = 0
+            self.max_queued = self.queued
+
+    @staticmethod
+    def _summary(samples) -> dict:
+        if not samples:
+            return {"samples": 0, "avg_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        ordered = sorted(samples)
+        return {
+            "samples": len(ordered),
+            "avg_ms": round(1000 * sum(ordered) / len(ordered), 2),
+            "p95_ms": round(1000 * ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 2),
+            "max_ms": round(1000 * ordered[-1], 2),
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "bcrypt_rounds": BCRYPT_ROUNDS,
+                "queued": self.queued,
+                "running": self.running,
+                "max_queued": self.max_queued,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "queue_wait": self._summary(self._wait),
+                "hash_time": self._summary(self._run),
+            }
+
+hashing_pool = HashingPool(
+    workers=int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1)))),
+    max_queue=int(os.getenv("PASSWORD_HASH_QUEUE", "64")),
+)
@@ -0,0 +1,67 @@
+from typing import Optional
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, or_
+
+# Paginación por cursor (keyset) y proyección de campos para los listados grandes
+# (/stats/users, /admin/users, /predictions/{gp_id}/all, /stats/ranking, /bingo/standings).
+#
+# - ?limit=N: tamaño de página. Sin limit, el listado completo (lo de siempre).
+# - ?after=<cursor>: continuar después del último elemento recibido. El cursor de la página
+#   siguiente va en la cabecera X-Next-Cursor (no aparece si no hay más). En clasificaciones es
+#   "rank,user_id" (rank,team_id para equipos); en listados por usuario, "user_id".
+# - ?fields=a,b,c: solo esos campos. La consulta selecciona únicamente las columnas necesarias
+#   y se salta las tablas que ningún campo pide.
+#
+# El cursor se traduce a un WHERE sobre el orden de la consulta (no OFFSET), así que cada página
+# cuesta lo mismo esté donde esté.
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def parse_fields(fields: Optional[str], allowed, default=None) -> list:
+    """Campos pedidos en ?fields=, en el orden de `allowed`. Sin fields: `default` (o todos)."""
+    if not fields:
+        return list(default if default is not None else allowed)
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Campos no válidos: {', '.join(sorted(unknown))}. Disponibles: {', '.join(allowed)}"
+        )
+    return [f for f in allowed if f in requested]
+
+def parse_cursor(after: Optional[str], parts: int) -> Optional[tuple]:
+    """'12,345' -> (12, 345). `parts` enteros separados por comas; 400 si no encaja."""
+    if not after:
+        return None
+    try:
+        values = tuple(int(v) for v in after.split(","))
+    except ValueError:
+        values = ()
+    if len(values) != parts:
+        expected = "rank,id" if parts == 2 else "id"
+        raise HTTPException(status_code=400, detail=f"Cursor no válido: se esperaba after=<{expected}>")
+    return values
+
+def keyset_after(order: list, values: tuple):
+    """
+    Condición "va después de `values`" para un ORDER BY de varias columnas, p.ej.
+    order=[(points, "desc"), (User.id, "asc")] -> points < p OR (points = p AND id > u).
+    Se escribe expandida (no con tuple_ > tuple_) para poder mezclar ASC y DESC.
+    """
+    clauses = []
+    for i, (column, direction) in enumerate(order):
+        value = values[i]
+        step = column < value if direction == "desc" else column > value
+        clauses.append(and_(*[c == v for (c, _), v in zip(order[:i], values[:i])], step))
+    return or_(*clauses)
+
+def take_page(rows: list, limit: Optional[int]) -> tuple:
+    """Las consultas piden limit + 1 filas: si llega la extra, hay página siguiente."""
+    if limit is None or len(rows) <= limit:
+        return rows, False
+    return rows[:limit], True
+
+def set_next_cursor(response: Response, has_more: bool, *values):
+    if has_more:
+        response.headers[NEXT_CURSOR_HEADER] = ",".join(str(v) for v in values)
@@ -0,0 +1,77 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+class Principal:
+    """
+    Usuario autenticado tal y como lo ven los endpoints (id, rol, nombre, avatar...).
+    Es una copia plana, sin sesión de BD detrás: se puede cachear y compartir entre peticiones.
+    """
+    __slots__ = ("id", "email", "username", "role", "acronym", "avatar", "created_at")
+
+    def __init__(self, user):
+        for field in self.__slots__:
+            setattr(self, field, getattr(user, field))
+
+class PrincipalCache:
+    """
+    LRU con TTL de Principals por user_id. El TTL acota lo que tarda en verse un cambio
+    hecho desde otro proceso; dentro del proceso los cambios se invalidan al momento.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id: int) -> Optional[Principal]:
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry and entry[1] > time.monotonic():
+                self._data.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            if entry:
+                del self._data[user_id]
+            self.misses += 1
+            return None
+
+    def put(self, principal: Principal):
+        with self._lock:
+            self._data[principal.id] = (principal, time.monotonic() + self.ttl)
+            self._data.move_to_end(principal.id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._data.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_s": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+principal_cache = PrincipalCache(
+    maxsize=int(os.getenv("AUTH_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("AUTH_CACHE_TTL", "60")),
+)
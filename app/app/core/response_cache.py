@@ -0,0 +1,226 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from jose import jwt
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import Response
+
+from app.core.security import SECRET_KEY, ALGORITHM
+from app.core.bootstrap import DEPLOYMENT_ID
+from app.db.session import async_engine
+from app.db.models.data_version import DataVersion
+
+# --- RUTAS CACHEADAS ---
+# (patrón, depende de nombres/avatares de usuarios, requiere token, ámbito de versión)
+# La temporada sale del grupo season_id del path o del query param season_id; si no hay,
+# la clave usa la versión "global", que sube con cualquier temporada.
+# Ámbito "bingo": solo cambia con el bingo de la temporada (bingo:<id>), así que un toggle no
+# invalida las clasificaciones ni el calendario.
+CACHED_ROUTES = [
+    (re.compile(r"^/stats/ranking$"), True, False, "season"),
+    (re.compile(r"^/stats/evolution$"), True, False, "season"),
+    (re.compile(r"^/bingo/standings$"), True, False, "bingo"),
+    (re.compile(r"^/grand-prix/season/(?P<season_id>\d+)$"), False, False, "season"),
+    (re.compile(r"^/seasons/(?P<season_id>\d+)/constructors$"), False, True, "season"),
+]
+
+def bump_data_version(db: Session, season_id: int = None, users: bool = False, stats: bool = False, bingo_season_id: int = None):
+    """
+    Marca como cambiados los datos de una temporada (y "global"), de los usuarios y/o las
+    estadísticas calculadas (UserStats/UserGpStats, de las que sale el radar de /stats).
+    bingo_season_id: solo el bingo de esa temporada (toggles y casillas), sin tocar "global".
+    Se llama DESPUÉS del commit de la escritura: en el hueco entre ambos, lo peor que pasa es
+    que se cachee un dato ya nuevo con la versión vieja, que se descarta al subir la versión.
+    """
+    scopes = []
+    if season_id is not None:
+        scopes += [f"season:{season_id}", "global"]
+    if bingo_season_id is not None:
+        scopes.append(f"bingo:{bingo_season_id}")
+    if users:
+        scopes.append("users")
+    if stats:
+        scopes.append("stats")
+    if not scopes:
+        scopes = ["global"]
+
+    bump = lambda scope: db.execute(
+        update(DataVersion).where(DataVersion.scope == scope).values(version=DataVersion.version + 1)
+    ).rowcount
+
+    for scope in scopes:
+        if bump(scope):
+            continue
+        try:
+            with db.begin_nested():
+                db.add(DataVersion(scope=scope, version=1))
+        except IntegrityError:
+            # Otro proceso creó la fila a la vez
+            bump(scope)
+    db.commit()
+    data_versions.invalidate()
+
+class DataVersions:
+    """
+    Copia en memoria de data_versions. Se relee como mucho cada `ttl` segundos (lo que tarda un
+    worker en ver lo que ha escrito otro); las escrituras de este proceso la invalidan al momento.
+    """
+
+    def __init__(self, ttl: float = 1.0):
+        self.ttl = ttl
+        self._versions = {}
+        self._loaded_at = None
+
+    async def snapshot(self) -> dict:
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self.ttl:
+            async with async_engine.connect() as conn:
+                rows = (await conn.execute(select(DataVersion.scope, DataVersion.version))).all()
+            self._versions = dict(rows)
+            self._loaded_at = time.monotonic()
+        return self._versions
+
+    def invalidate(self):
+        self._loaded_at = None
+
+data_versions = DataVersions(ttl=float(os.getenv("RESPONSE_CACHE_VERSION_TTL", "1.0")))
+
+class ResponseCache:
+    """LRU de respuestas (ETag -> cuerpo y cabeceras) de las rutas de CACHED_ROUTES."""
+
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, etag: str):
+        with self._lock:
+            entry = self._data.get(etag)
+            if entry is not None:
+                self._data.move_to_end(etag)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry
+
+    def put(self, etag: str, body: bytes, headers: dict):
+        with self._lock:
+            self._data[etag] = (body, headers)
+            self._data.move_to_end(etag)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.not_modified = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            served = self.hits + self.misses + self.not_modified
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "not_modified": self.not_modified,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.not_modified) / served, 4) if served else 0.0,
+            }
+
+response_cache = ResponseCache(maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", "512")))
+
+def _match(path: str):
+    for pattern, uses_users, needs_auth, kind in CACHED_ROUTES:
+        m = pattern.match(path)
+        if m:
+            return m, uses_users, needs_auth, kind
+    return None
+
+def _has_valid_token(request) -> bool:
+    # Misma comprobación que get_current_user salvo la existencia del usuario,
+    # que get_current_user también cachea (principal_cache).
+    auth = request.headers.get("authorization", "")
+    if not auth.lower().startswith("bearer "):
+        return False
+    try:
+        jwt.decode(auth[7:], SECRET_KEY, algorithms=[ALGORITHM])
+        return True
+    except Exception:
+        return False
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if not header:
+        return False
+    candidates = [c.strip().removeprefix("W/") for c in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+class ResponseCacheMiddleware(BaseHTTPMiddleware):
+    """
+    ETag fuerte + 304 y caché de respuestas para lecturas que solo cambian cuando un admin
+    guarda un resultado, un GP o una casilla de bingo. La ETag depende de la ruta, sus
+    parámetros y las versiones de datos implicadas, así que no hace falta tocar la BD para
+    contestar 304 ni para servir una respuesta ya calculada.
+    """
+
+    async def dispatch(self, request, call_next):
+        if request.method != "GET":
+            return await call_next(request)
+        matched = _match(request.url.path)
+        if not matched:
+            return await call_next(request)
+        m, uses_users, needs_auth, kind = matched
+        if needs_auth and not _has_valid_token(request):
+            return await call_next(request) # El endpoint contestará 401
+
+        season_id = m.groupdict().get("season_id") or request.query_params.get("season_id")
+        versions = await data_versions.snapshot()
+        if season_id:
+            scope = f"{kind}:{season_id}"
+            scope_version = f"{scope}={versions.get(scope, 0)}"
+        elif kind == "bingo":
+            # Temporada activa: cambia con cualquier bingo o con el cambio de temporada ("global")
+            bingo = sum(v for k, v in versions.items() if k.startswith("bingo:"))
+            scope_version = f"bingo={bingo}|global={versions.get('global', 0)}"
+        else:
+            scope_version = f"global={versions.get('global', 0)}"
+        key = "|".join([
+            DEPLOYMENT_ID or "", # Un despliegue nuevo puede cambiar el formato de las respuestas
+            request.url.path,
+            "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items())),
+            scope_version,
+            f"users={versions.get('users', 0) if uses_users else '-'}",
+        ])
+        etag = '"' + hashlib.sha1(key.encode()).hexdigest() + '"'
+        cache_control = "private, no-cache" if needs_auth else "no-cache"
+
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            response_cache.record_not_modified()
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+        cached = response_cache.get(etag)
+        if cached is not None:
+            body, headers = cached
+            return Response(content=body, status_code=200, headers=headers)
+
+        response = await call_next(request)
+        if response.status_code != 200:
+            return response
+
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+        headers.update({"ETag": etag, "Cache-Control": cache_control})
+        response_cache.put(etag, body, headers)
+        return Response(content=body, status_code=200, headers=headers)
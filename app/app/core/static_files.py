@@ -0,0 +1,13 @@
+from fastapi.staticfiles import StaticFiles
+
+class ImmutableStaticFiles(StaticFiles):
+    """
+    StaticFiles para archivos nombrados por el hash de su contenido (miniaturas de avatares).
+    El nombre cambia si cambia el contenido, así que el navegador puede cachearlos para siempre.
+    ETag/Last-Modified y las respuestas 304 ya los pone StaticFiles.
+    """
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
@@ -1,4 +1,4 @@
-from sqlalchemy import text
+from sqlalchemy import text, inspect
 from sqlalchemy.orm import Session
 
 def sync_all_sequences(db: Session):
@@ -16,19 +16,64 @@ def sync_all_sequences(db: Session):
         "teams", "team_members", "grand_prix", "race_results", 
         "race_positions", "race_events", "predictions", 
         "prediction_positions", "prediction_events", "bingo_tiles", 
-        "bingo_selections", "avatars", "user_stats", "user_gp_stats"
+        "bingo_selections", "avatars", "user_stats", "user_gp_stats",
+        "ranking_snapshots", "rebuild_jobs", "user_achievements_rebuild", "publication_jobs"
     ]
     
-    for table in tables:
-        try:
+    # Solo las tablas que existen: un fallo dentro de la transacción la abortaría entera
+    existing = {
+        row[0] for row in db.execute(text(
+            "SELECT table_name FROM information_schema.tables WHERE table_schema = current_schema()"
+        ))
+    }
+
+    # Todas las secuencias en una sola transacción (antes: un setval + commit por tabla)
+    try:
+        for table in tables:
+            if table not in existing:
+                continue
             # Sincronizamos la secuencia al máximo ID actual + 1
             # El tercer parámetro 'false' en setval hace que el PRÓXIMO sea el valor dado.
             # Pero usando 'coalesce(MAX(id), 0) + 1' con 'false', el próximo será ese valor.
             db.execute(text(f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), coalesce((SELECT MAX(id) FROM \"{table}\"), 0) + 1, false);"))
-            db.commit()
-        except Exception as e:
-            # Probablemente la tabla no existe o no tiene una secuencia estándar de id
-            db.rollback()
-            continue
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ No se pudieron sincronizar las secuencias: {e}")
+        return
 
     print("✅ Secuencias sincronizadas.")
+
+def add_missing_columns(db: Session):
+    """
+    create_all crea tablas nuevas pero no añade columnas a las que ya existen. Esto añade las
+    columnas de los modelos que falten en la BD (nullable o con default escalar), para que un
+    despliegue con columnas nuevas no necesite una migración a mano.
+    """
+    from app.db.session import Base
+
+    bind = db.get_bind()
+    inspector = inspect(bind)
+    added = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for col in table.columns:
+            if col.name in existing:
+                continue
+            default = col.default.arg if col.default is not None and col.default.is_scalar else None
+            if col.primary_key or (not col.nullable and default is None):
+                print(f"⚠️ No se puede añadir {table.name}.{col.name} automáticamente (PK o NOT NULL sin default)")
+                continue
+            ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{col.name}" {col.type.compile(dialect=bind.dialect)}'
+            if isinstance(default, bool):
+                ddl += f" DEFAULT {'true' if default else 'false'}" if bind.dialect.name == "postgresql" else f" DEFAULT {int(default)}"
+            elif isinstance(default, (int, float)):
+                ddl += f" DEFAULT {default!r}"
+            db.execute(text(ddl))
+            added.append(f"{table.name}.{col.name}")
+
+    db.commit()
+    if added:
+        print(f"🧱 Columnas añadidas: {', '.join(added)}")
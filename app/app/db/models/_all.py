@@ -14,6 +14,13 @@ from app.db.models.constructor import Constructor
 from app.db.models.driver import Driver
 from app.db.models.bingo import BingoSelection
 from app.db.models.bingo import BingoTile
+from app.db.models.bingo import BingoTileStats, BingoUserCounter
 from app.db.models.avatar import Avatar
 from app.db.models.achievement import Achievement, UserAchievement
-from app.db.models.user_stats import UserStats
\ No newline at end of file
+from app.db.models.user_stats import UserStats
+from app.db.models.ranking_snapshot import RankingSnapshot
+from app.db.models.achievements_rebuild import RebuildJob, UserStatsRebuild, UserGpStatsRebuild, UserAchievementRebuild
+from app.db.models.bootstrap_run import BootstrapRun
+from app.db.models.data_version import DataVersion
+from app.db.models.user_radar_metrics import UserRadarMetrics
+from app.db.models.publication_job import PublicationJob
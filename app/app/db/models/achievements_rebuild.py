@@ -0,0 +1,45 @@
+# app/db/models/achievements_rebuild.py
+from datetime import datetime
+from sqlalchemy import Integer, String, DateTime, JSON
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.session import Base
+from app.db.models.user_stats import UserStats, UserGpStats
+from app.db.models.achievement import UserAchievement
+
+class RebuildJob(Base):
+    """
+    Reconstrucción total de logros/estadísticas lanzada desde la Zona de Pánico.
+    Guarda la lista de GPs a reprocesar y un checkpoint tras cada uno para poder reanudar.
+    """
+    __tablename__ = "rebuild_jobs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    # "pending", "running", "done" o "failed"
+    status: Mapped[str] = mapped_column(String, default="pending", nullable=False)
+
+    # GPs con resultado en orden cronológico, fijados al reclamar el job por primera vez
+    gp_ids: Mapped[list] = mapped_column(JSON, default=list)
+    processed_gps: Mapped[int] = mapped_column(Integer, default=0)
+    last_gp_id: Mapped[int] = mapped_column(Integer, nullable=True)
+
+    error: Mapped[str] = mapped_column(String, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    started_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    # Latido tras cada GP: un job "running" sin latido reciente es de un worker caído y se puede reclamar
+    heartbeat_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+
+
+# --- TABLAS DE STAGING ---
+# Copia exacta de las tablas vivas. La reconstrucción escribe aquí y solo al terminar
+# se vuelca todo a user_stats / user_gp_stats / user_achievements en una transacción.
+
+class UserStatsRebuild(Base):
+    __table__ = UserStats.__table__.to_metadata(Base.metadata, name="user_stats_rebuild")
+
+class UserGpStatsRebuild(Base):
+    __table__ = UserGpStats.__table__.to_metadata(Base.metadata, name="user_gp_stats_rebuild")
+
+class UserAchievementRebuild(Base):
+    __table__ = UserAchievement.__table__.to_metadata(Base.metadata, name="user_achievements_rebuild")
@@ -42,4 +42,30 @@ class BingoSelection(Base):
 
     # Relaciones
     user: Mapped["User"] = relationship("User", back_populates="bingo_selections")
-    tile: Mapped["BingoTile"] = relationship("BingoTile", back_populates="selections")
\ No newline at end of file
+    tile: Mapped["BingoTile"] = relationship("BingoTile", back_populates="selections")
+
+class BingoTileStats(Base):
+    """
+    Contadores materializados de cada casilla (services/bingo_stats.py): cuánta gente la ha
+    elegido y su valor por rareza con los participantes actuales. Se actualiza en cada toggle,
+    así el tablero y la clasificación no recorren todas las selecciones de la temporada.
+    """
+    __tablename__ = "bingo_tile_stats"
+
+    tile_id: Mapped[int] = mapped_column(ForeignKey("bingo_tiles.id", ondelete="CASCADE"), primary_key=True)
+    season_id: Mapped[int] = mapped_column(ForeignKey("seasons.id", ondelete="CASCADE"), index=True, nullable=False)
+    selection_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # Valor de la casilla ahora mismo (calculate_tile_value); 100 si nadie la ha elegido
+    current_value: Mapped[int] = mapped_column(Integer, default=100, nullable=False)
+
+class BingoUserCounter(Base):
+    """
+    Casillas elegidas por cada usuario en una temporada. El toggle reserva hueco con un UPDATE
+    condicional (selections < MAX_SELECTIONS): el límite se cumple aunque lleguen muchos a la vez.
+    Un usuario participa en el bingo de la temporada mientras selections > 0.
+    """
+    __tablename__ = "bingo_user_counters"
+
+    season_id: Mapped[int] = mapped_column(ForeignKey("seasons.id", ondelete="CASCADE"), primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    selections: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
@@ -0,0 +1,18 @@
+# app/db/models/bootstrap_run.py
+from datetime import datetime
+from sqlalchemy import String, DateTime, JSON
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.session import Base
+
+class BootstrapRun(Base):
+    """
+    Marca de "arranque hecho" por despliegue: el primer worker que arranca con un DEPLOYMENT_ID
+    hace el bootstrap (tablas, secuencias, avatares, logros) y el resto lo salta.
+    """
+    __tablename__ = "bootstrap_runs"
+
+    deployment_id: Mapped[str] = mapped_column(String, primary_key=True)
+    finished_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    # Segundos por fase, tal y como los devuelve GET /admin/startup
+    phases: Mapped[dict] = mapped_column(JSON, default=dict)
@@ -0,0 +1,16 @@
+# app/db/models/data_version.py
+from sqlalchemy import Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.session import Base
+
+class DataVersion(Base):
+    """
+    Contador de versión de los datos que ven los endpoints cacheados (ETag/304).
+    scope: "season:<id>" (resultados, GPs, equipos, bingo... de esa temporada),
+    "global" (sube con cualquier temporada), "users" (nombres/avatares) o "stats"
+    (estadísticas de perfil, al publicar resultados).
+    """
+    __tablename__ = "data_versions"
+
+    scope: Mapped[str] = mapped_column(String, primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
@@ -0,0 +1,32 @@
+# app/db/models/publication_job.py
+from datetime import datetime
+from sqlalchemy import Integer, String, DateTime, JSON, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.session import Base
+
+class PublicationJob(Base):
+    """
+    Publicación de un resultado (admin o sincronización con FastF1) procesada en segundo plano.
+    `stages` guarda por etapa su estado y duración: {"score": {"status": "done", "ms": 12.3}, ...}
+    """
+    __tablename__ = "publication_jobs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    gp_id: Mapped[int] = mapped_column(Integer, ForeignKey("grand_prix.id", ondelete="CASCADE"), nullable=False)
+
+    # "manual" (resultado introducido por un admin) o "fastf1" (descarga y análisis de la carrera)
+    source: Mapped[str] = mapped_column(String, nullable=False)
+    # Posiciones y eventos del resultado manual; para FastF1, {"refresh": true} si se fuerza la descarga
+    payload: Mapped[dict] = mapped_column(JSON, nullable=True)
+
+    # "pending", "running", "done" o "failed"
+    status: Mapped[str] = mapped_column(String, default="pending", nullable=False)
+    stages: Mapped[dict] = mapped_column(JSON, default=dict)
+    logs: Mapped[list] = mapped_column(JSON, default=list)
+
+    error: Mapped[str] = mapped_column(String, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    started_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    # Se actualiza al terminar cada etapa: un job "running" sin latido lleva a un worker caído
+    heartbeat_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
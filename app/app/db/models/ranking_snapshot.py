@@ -0,0 +1,34 @@
+# app/db/models/ranking_snapshot.py
+from sqlalchemy import Integer, String, Float, Boolean, ForeignKey, UniqueConstraint, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.session import Base
+
+class RankingSnapshot(Base):
+    """
+    Foto materializada de la clasificación de una temporada tras cada GP con resultados.
+    Una fila por (GP, entidad, modo). Se regenera al puntuar un GP, de forma que
+    /stats/ranking y /stats/evolution sólo tienen que leerla.
+    """
+    __tablename__ = "ranking_snapshots"
+    __table_args__ = (
+        UniqueConstraint("gp_id", "entity_type", "entity_id", "mode", name="uq_ranking_snapshot"),
+        Index("ix_ranking_snapshot_lookup", "season_id", "entity_type", "mode", "rank"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    season_id: Mapped[int] = mapped_column(Integer, ForeignKey("seasons.id"), nullable=False)
+    gp_id: Mapped[int] = mapped_column(Integer, ForeignKey("grand_prix.id"), nullable=False)
+
+    # "users" o "teams". entity_id apunta a users.id o teams.id según el tipo (sin FK por ser polimórfico)
+    entity_type: Mapped[str] = mapped_column(String, nullable=False)
+    entity_id: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    # "base", "total" o "multiplier"
+    mode: Mapped[str] = mapped_column(String, nullable=False)
+
+    gp_points: Mapped[float] = mapped_column(Float, default=0.0)
+    accumulated: Mapped[float] = mapped_column(Float, default=0.0)
+    rank: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    # True si la entidad tiene alguna predicción en este GP (para /stats/evolution)
+    played: Mapped[bool] = mapped_column(Boolean, default=False)
@@ -0,0 +1,49 @@
+# app/db/models/user_radar_metrics.py
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import Integer, Float, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.session import Base
+
+# Fila con los mínimos/máximos de todas las métricas (los ids de usuario empiezan en 1)
+GLOBAL_ROW_ID = 0
+
+class UserRadarMetrics(Base):
+    """
+    Métricas del perfil de /stats materializadas tras cada publicación de resultados.
+    Una fila por usuario con GPs jugados (métricas raw del radar, trofeos, mejor carrera y racha)
+    y la fila GLOBAL_ROW_ID, que guarda el mínimo de cada métrica en su columna y el máximo en
+    la columna *_max, más lo que tardó el recálculo. /stats/user/{id} lee estas dos filas.
+    """
+    __tablename__ = "user_radar_metrics"
+
+    # Sin FK: la fila global no corresponde a ningún usuario
+    user_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+
+    # Radar raw (None si el usuario no tiene GPs en user_gp_stats)
+    regularity: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    commitment: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    anticipation: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    podium: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    vidente: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+
+    # Solo fila global
+    regularity_max: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    commitment_max: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    anticipation_max: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    podium_max: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    vidente_max: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    users_count: Mapped[int] = mapped_column(Integer, default=0)
+    compute_ms: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    computed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+    # Perfil (solo filas de usuario)
+    total_points: Mapped[float] = mapped_column(Float, default=0.0)
+    races_played: Mapped[int] = mapped_column(Integer, default=0)
+    gold: Mapped[int] = mapped_column(Integer, default=0)
+    silver: Mapped[int] = mapped_column(Integer, default=0)
+    bronze: Mapped[int] = mapped_column(Integer, default=0)
+    best_gp_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    best_points: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    best_percentile: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    momentum: Mapped[int] = mapped_column(Integer, default=0)
@@ -41,6 +41,15 @@ class UserStats(Base):
 
     # --- SEASON STATS ACTUALES ---
     current_season_points = Column(Float, default=0.0)
+
+    # --- AGREGADOS EN STREAMING (Welford, ver services/running_stats.py) ---
+    # Media y varianza de los puntos por GP y de la antelación de las predicciones sin releer el historial
+    points_count = Column(Integer, default=0)
+    points_mean = Column(Float, default=0.0)
+    points_m2 = Column(Float, default=0.0)
+    lead_count = Column(Integer, default=0)
+    lead_mean = Column(Float, default=0.0)
+    lead_m2 = Column(Float, default=0.0)
     
     user = relationship("User", backref="stats")
 
@@ -62,4 +71,6 @@ class UserGpStats(Base):
     fastest_lap_hit = Column(Boolean, default=False)
     safety_car_hit = Column(Boolean, default=False)
     dnf_count_hit = Column(Boolean, default=False)
-    dnf_driver_hit = Column(Boolean, default=False)
\ No newline at end of file
+    dnf_driver_hit = Column(Boolean, default=False)
+    # Segundos de antelación de la predicción (para poder restarla de lead_* al re-puntuar)
+    lead_seconds = Column(Float, nullable=True)
\ No newline at end of file
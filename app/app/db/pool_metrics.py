@@ -0,0 +1,146 @@
+import contextvars
+import threading
+import time
+from collections import defaultdict, deque
+
+from sqlalchemy import event, exc
+from sqlalchemy.orm import Session
+
+from app.db.session import engine, async_engine
+
+class PoolMetrics:
+    """
+    Métricas del pool de conexiones que alimenta get_db:
+    - espera: lo que tarda cada checkout de una sesión de petición en conseguir conexión del pool
+    - retención: cuánto tiempo tiene esa sesión la conexión (hasta el commit/rollback/cierre)
+    Guarda agregados por ruta y una ventana de muestras recientes para percentiles.
+    """
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._wait = deque(maxlen=window)
+        self._hold = deque(maxlen=window)
+        self._routes = defaultdict(lambda: {"requests": 0, "wait_total": 0.0, "hold_total": 0.0, "hold_max": 0.0})
+        self.requests = 0
+        self.timeouts = 0
+        self.in_use = 0
+
+    def acquired(self):
+        with self._lock:
+            self.in_use += 1
+
+    def record(self, route: str, wait: float, hold: float):
+        with self._lock:
+            self.in_use -= 1
+            self.requests += 1
+            self._wait.append(wait)
+            self._hold.append(hold)
+            r = self._routes[route]
+            r["requests"] += 1
+            r["wait_total"] += wait
+            r["hold_total"] += hold
+            r["hold_max"] = max(r["hold_max"], hold)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def reset(self):
+        with self._lock:
+            self._wait.clear()
+            self._hold.clear()
+            self._routes.clear()
+            self.requests = self.timeouts = 0
+
+    @staticmethod
+    def _summary(samples) -> dict:
+        """Resumen en milisegundos de una ventana de muestras (en segundos)."""
+        if not samples:
+            return {"samples": 0, "avg_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        ordered = sorted(samples)
+        pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+        return {
+            "samples": len(ordered),
+            "avg_ms": round(1000 * sum(ordered) / len(ordered), 2),
+            "p50_ms": round(1000 * pick(0.50), 2),
+            "p95_ms": round(1000 * pick(0.95), 2),
+            "max_ms": round(1000 * ordered[-1], 2),
+        }
+
+    @staticmethod
+    def _pool_gauges(pool) -> dict:
+        # Los pools sin cola (SQLite en memoria, NullPool...) no tienen todos los contadores
+        gauge = lambda name: getattr(pool, name)() if hasattr(pool, name) else None
+        return {
+            "class": type(pool).__name__,
+            "size": gauge("size"),
+            "checked_out": gauge("checkedout"),
+            "checked_in": gauge("checkedin"),
+            "overflow": gauge("overflow"),
+            "max_overflow": getattr(pool, "_max_overflow", None),
+            "timeout_s": gauge("timeout"),
+        }
+
+    def snapshot(self, pool, async_pool=None) -> dict:
+        with self._lock:
+            routes = {
+                path: {
+                    "requests": r["requests"],
+                    "avg_wait_ms": round(1000 * r["wait_total"] / r["requests"], 2),
+                    "avg_hold_ms": round(1000 * r["hold_total"] / r["requests"], 2),
+                    "max_hold_ms": round(1000 * r["hold_max"], 2),
+                }
+                for path, r in self._routes.items()
+            }
+            return {
+                "pool": self._pool_gauges(pool),
+                "async_pool": self._pool_gauges(async_pool) if async_pool is not None else None,
+                "sessions_in_use": self.in_use,
+                "requests": self.requests,
+                "timeouts": self.timeouts,
+                "wait": self._summary(self._wait),
+                "hold": self._summary(self._hold),
+                "routes": dict(sorted(routes.items(), key=lambda kv: kv[1]["avg_hold_ms"], reverse=True)),
+            }
+
+pool_metrics = PoolMetrics()
+
+# --- INSTRUMENTACIÓN ---
+# Se mide cuando la sesión pide de verdad una conexión (primera query), no al abrirla: un
+# endpoint que no toca la BD o sale antes no saca conexión del pool solo para medirla.
+# - pool.connect envuelto: espera de cada checkout (y timeouts del pool)
+# - after_begin / after_transaction_end de la sesión: retención hasta que la devuelve
+# Solo cuentan las sesiones marcadas con info["route"] (get_db / get_async_db).
+
+# Espera del último checkout en este hilo/greenlet: after_begin la lee justo después
+_last_wait = contextvars.ContextVar("pool_last_wait", default=0.0)
+
+def instrument_pool(pool):
+    connect = pool.connect
+
+    def timed_connect():
+        start = time.perf_counter()
+        try:
+            connection = connect()
+        except exc.TimeoutError:
+            pool_metrics.record_timeout()
+            raise
+        _last_wait.set(time.perf_counter() - start)
+        return connection
+
+    pool.connect = timed_connect
+
+@event.listens_for(Session, "after_begin")
+def _session_checkout(session, transaction, connection):
+    if "route" in session.info and "pool_checkout" not in session.info:
+        session.info["pool_checkout"] = (time.perf_counter(), _last_wait.get())
+        pool_metrics.acquired()
+
+@event.listens_for(Session, "after_transaction_end")
+def _session_checkin(session, transaction):
+    if transaction.parent is None and "pool_checkout" in session.info:
+        acquired, wait = session.info.pop("pool_checkout")
+        pool_metrics.record(session.info["route"], wait=wait, hold=time.perf_counter() - acquired)
+
+instrument_pool(engine.pool)
+instrument_pool(async_engine.sync_engine.pool)
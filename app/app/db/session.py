@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 import os
 from dotenv import load_dotenv
@@ -21,13 +23,24 @@ engine_kwargs = {
 # Ampliamos los límites y tiempos de espera para las conexiones a PostgreSQL
 # Esto evita el error de Timeout en QueuePool cuando el servidor se despierta
 # y recibe muchas peticiones de golpe (por ejemplo en el login)
+# El motor síncrono y el asíncrono tienen pools separados: entre los dos se reparten las 50
+# conexiones por worker de antes (15+25 síncronas, 5+5 asíncronas) para no duplicar el total.
+async_engine_kwargs = dict(engine_kwargs)
 if DATABASE_URL.startswith("postgresql"):
     engine_kwargs.update({
-        "pool_size": 20,         # Tamaño base del pool (número de conexiones activas concurrentes)
-        "max_overflow": 30,      # Conexiones extra por encima del pool_size en alta carga
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "15")),          # Tamaño base del pool (número de conexiones activas concurrentes)
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "25")),    # Conexiones extra por encima del pool_size en alta carga
         "pool_timeout": 60,      # Segundos que espera una petición para conseguir una conexión antes de fallar
         "pool_recycle": 1800     # Reciclamos las conexiones para evitar timeouts en el lado del servidor/nube
     })
+    # Las rutas async sueltan la conexión en cuanto termina la consulta (sin hilos esperando),
+    # así que les basta un pool pequeño
+    async_engine_kwargs.update({
+        "pool_size": int(os.getenv("DB_ASYNC_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_ASYNC_MAX_OVERFLOW", "5")),
+        "pool_timeout": 60,
+        "pool_recycle": 1800
+    })
 
 engine = create_engine(
     DATABASE_URL,
@@ -37,5 +50,31 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(bind=engine)
 
+# --- MOTOR ASÍNCRONO (endpoints de solo lectura con mucho tráfico) ---
+# Misma base de datos con driver asyncio: aiosqlite para SQLite y asyncpg para PostgreSQL.
+# Las peticiones esperan a la BD en el event loop en vez de ocupar un hilo del threadpool.
+def _async_url(url: str):
+    async_url = make_url(url)
+    if async_url.drivername.startswith("sqlite"):
+        return async_url.set(drivername="sqlite+aiosqlite")
+
+    # asyncpg no entiende los parámetros de libpq (sslmode, channel_binding) que traen Neon/Supabase
+    query = dict(async_url.query)
+    sslmode = query.pop("sslmode", None)
+    query.pop("channel_binding", None)
+    if sslmode and sslmode != "disable":
+        query["ssl"] = sslmode
+    return async_url.set(drivername="postgresql+asyncpg", query=query)
+
+ASYNC_DATABASE_URL = _async_url(DATABASE_URL)
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    **async_engine_kwargs
+)
+
+# expire_on_commit=False: en asyncio no se puede recargar un atributo caducado de forma implícita
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
 class Base(DeclarativeBase):
     pass
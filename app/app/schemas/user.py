@@ -31,6 +31,7 @@ class AvatarSchema(BaseModel):
     id: int
     filename: str
     url: str # Calcularemos la URL completa para facilitar al front
+    thumb_url: str | None = None # Miniatura 128px (None mientras se genera)
 
     class Config:
         from_attributes = True
\ No newline at end of file
@@ -0,0 +1,116 @@
+"""
+Benchmark: extracción de una carrera fila a fila (la de f1_sync antes: iterrows, str.contains
+sobre todas las vueltas y Laps.pick_fastest) vs la extracción vectorizada de services/f1_extract.py.
+
+Usa las carreras de una temporada grabadas en la caché de FastF1 (FASTF1_CACHE_DIR), en modo
+offline: no hay red. Para grabarlas una vez, con red:
+    python -m app.scripts.benchmark_f1_extract 2024 --record
+
+Uso (desde app/):
+    python -m app.scripts.benchmark_f1_extract 2024
+    python -m app.scripts.benchmark_f1_extract 2024 --repeat 20
+
+Comprueba que ambos caminos dan las mismas posiciones, DNF/DNS/DSQ, vuelta rápida y SC.
+"""
+import argparse
+import os
+import time
+
+from app.services.f1_extract import extract, prune, RESULT_COLUMNS, LAP_COLUMNS
+from app.services.f1_ingest import FASTF1_CACHE_DIR
+
+def legacy_extract(results, laps) -> dict:
+    """Copia de la lógica que tenía sync_race_data_manual (sin la parte de BD)."""
+    positions, dnf, dns, dsq = [], [], [], []
+    for _, row in results.iterrows():
+        acronym = row["Abbreviation"]
+        raw_pos = str(row["ClassifiedPosition"])
+        raw_status = str(row["Status"]).lower()
+        position = int(raw_pos) if raw_pos.isnumeric() else 20
+        if raw_status in ["finished"] or raw_status.startswith("+"):
+            pass
+        elif raw_status in ["did not start", "withdrew", "did not qualify"]:
+            dns.append(acronym)
+        elif "disqualified" in raw_status:
+            dsq.append(acronym)
+        elif not raw_pos.isnumeric():
+            dnf.append(acronym)
+        positions.append((acronym, position))
+
+    try:
+        fastest = laps.pick_fastest()["Driver"]
+    except Exception:
+        fastest = None
+    try:
+        has_sc = bool(laps["TrackStatus"].astype(str).str.contains("4").any())
+    except Exception:
+        has_sc = None
+    return {"positions": positions, "dnf": dnf, "dns": dns, "dsq": dsq, "fastest": fastest, "sc": has_sc}
+
+def summary(data: dict) -> dict:
+    rows = data["results"]
+    return {
+        "positions": [(r["Abbreviation"], r["position"]) for r in rows],
+        **{k: [r["Abbreviation"] for r in rows if r["kind"] == k] for k in ("dnf", "dns", "dsq")},
+        "fastest": data["fastest_lap_driver"],
+        "sc": data["safety_car"],
+    }
+
+def load_season(year: int, record: bool) -> list:
+    import fastf1
+    os.makedirs(FASTF1_CACHE_DIR, exist_ok=True)
+    fastf1.Cache.enable_cache(FASTF1_CACHE_DIR)
+    if not record:
+        fastf1.Cache.offline_mode(True)
+
+    schedule = fastf1.get_event_schedule(year, include_testing=False)
+    races = []
+    for round_number in schedule["RoundNumber"]:
+        try:
+            session = fastf1.get_session(year, int(round_number), "R")
+            session.load(telemetry=False, weather=False, messages=False)
+            races.append((session.event["EventName"], session.results, session.laps))
+        except Exception as e:
+            print(f"⚠️ Ronda {round_number}: no disponible ({e})")
+    return races
+
+def best_of(fn, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("year", type=int)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--record", action="store_true", help="Descargar a la caché de FastF1 (con red)")
+    args = parser.parse_args()
+
+    races = load_season(args.year, args.record)
+    if not races:
+        print("❌ No hay carreras grabadas: lanzar antes con --record")
+        return
+
+    laps_total = sum(len(laps) for _, _, laps in races)
+    print(f"🏁 {len(races)} carreras de {args.year}, {laps_total:,} vueltas")
+
+    t_legacy, legacy = best_of(lambda: [legacy_extract(r, l) for _, r, l in races], args.repeat)
+    t_new, new = best_of(lambda: [extract(r, l) for _, r, l in races], args.repeat)
+    # Lo que cuesta quedarse solo con las columnas necesarias, incluido en t_new
+    t_prune, _ = best_of(lambda: [(prune(r, RESULT_COLUMNS), prune(l, LAP_COLUMNS)) for _, r, l in races], args.repeat)
+
+    for (name, _, _), a, b in zip(races, legacy, new):
+        assert a == summary(b), (name, a, summary(b))
+
+    extra = sum(1 for b in new if b["vsc_periods"] or b["red_flags"] or b["first_sc_lap"])
+    print(
+        f"fila a fila: {t_legacy * 1000:8.1f} ms | vectorizada: {t_new * 1000:8.1f} ms "
+        f"(poda de columnas {t_prune * 1000:.1f} ms) | x{t_legacy / t_new:.1f}"
+    )
+    print(f"✅ Resultados idénticos. {extra} carreras con SC/VSC/bandera roja detallados.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark: puntuación predicción a predicción (calculate_prediction_score) vs
+puntuación en lote de todo el GP (score_gp_batch).
+
+Uso (desde app/):
+    python -m app.scripts.benchmark_scoring
+    python -m app.scripts.benchmark_scoring 10000 50000 100000
+
+No toca la base de datos: genera predicciones sintéticas en memoria y comprueba
+que ambos caminos devuelven exactamente los mismos points / points_base / multiplier.
+"""
+import random
+import sys
+import time
+
+from app.services.scoring import calculate_prediction_score, score_gp_batch
+
+DRIVERS = [
+    "VER", "LAW", "HAM", "LEC", "NOR", "PIA", "RUS", "ANT", "ALO", "STR", "SAI",
+    "ALB", "GAS", "OCO", "TSU", "COL", "HUL", "BEA", "BOT", "ZHO",
+]
+
+MULTIPLIERS = [
+    ("FASTEST_LAP", 1.5), ("SAFETY_CAR", 1.2), ("DNFS", 1.5),
+    ("DNF_DRIVER", 3.0), ("PODIUM_PARTIAL", 1.25), ("PODIUM_TOTAL", 1.5),
+]
+
+class MockObj:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+def random_events():
+    return {
+        "FASTEST_LAP": random.choice(DRIVERS),
+        "SAFETY_CAR": random.choice(["Yes", "No"]),
+        "DNFS": str(random.randint(0, 3)),
+        "DNF_DRIVER": random.choice(DRIVERS),
+    }
+
+def build_race():
+    positions = random.sample(DRIVERS, 10)
+    events = random_events()
+    events["DNF_DRIVER"] = ", ".join(random.sample(DRIVERS, int(events["DNFS"])))
+    return MockObj(
+        positions=[MockObj(position=i + 1, driver_name=d) for i, d in enumerate(positions)],
+        events=[MockObj(event_type=k, value=v) for k, v in events.items()],
+    )
+
+def build_predictions(n, race):
+    real_podium = [p.driver_name for p in race.positions[:3]]
+    preds = []
+    for _ in range(n):
+        positions = random.sample(DRIVERS, 10)
+        # Una parte acierta el podio (exacto o desordenado) para ejercitar los multiplicadores
+        if random.random() < 0.2:
+            positions[0:3] = random.sample(real_podium, 3)
+        preds.append(MockObj(
+            positions=[MockObj(position=i + 1, driver_name=d) for i, d in enumerate(positions)],
+            events=[MockObj(event_type=k, value=v) for k, v in random_events().items()],
+        ))
+    return preds
+
+def best_of(fn, repeat=3):
+    """Mejor tiempo de `repeat` ejecuciones (reduce el ruido del GC con muchos objetos)."""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+def run(n):
+    race = build_race()
+    preds = build_predictions(n, race)
+    multipliers = [MockObj(event_type=t, multiplier=m) for t, m in MULTIPLIERS]
+
+    t_loop, loop_scores = best_of(lambda: [calculate_prediction_score(p, race, multipliers) for p in preds])
+    t_batch, batch_scores = best_of(lambda: score_gp_batch(race, preds, multipliers))
+
+    for a, b in zip(loop_scores, batch_scores):
+        assert (a["base_points"], a["multiplier"], a["final_points"]) == \
+               (b["base_points"], b["multiplier"], b["final_points"]), (a, b)
+
+    print(
+        f"{n:>8} preds | bucle: {t_loop:7.3f}s ({n / t_loop:>10,.0f}/s) | "
+        f"lote: {t_batch:7.3f}s ({n / t_batch:>10,.0f}/s) | x{t_loop / t_batch:.1f}"
+    )
+
+def main():
+    random.seed(2026)
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 50_000, 100_000]
+    print("🏁 Benchmark de puntuación por GP (resultados idénticos verificados)")
+    for n in sizes:
+        run(n)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Prueba de carga: pico de tráfico al empezar una carrera.
+
+Simula N usuarios concurrentes que abren la app a la vez y piden lo mismo que pinta
+el frontend en ese momento: predicciones de todos para el GP, ranking, evolución,
+sus estadísticas y el tablero de bingo. Sirve para comparar los endpoints síncronos
+(threadpool) con los asíncronos (event loop + driver asyncio) contra un servidor real.
+
+Uso (desde app/, con el servidor arrancado):
+    python -m app.scripts.load_test_race_start --url http://127.0.0.1:8000 --gp 1 --season 1
+    python -m app.scripts.load_test_race_start --users 300 --rounds 3 --identifier ADM --password 123
+
+Para comparar, lanzar el mismo comando contra el servidor de cada versión con la misma BD.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+def _race_start_requests(gp_id: int, season_id: int):
+    return [
+        ("/predictions/{gp}/all", f"/predictions/{gp_id}/all", None),
+        ("/stats/ranking", "/stats/ranking", {"season_id": season_id, "type": "users", "mode": "total"}),
+        ("/stats/evolution", "/stats/evolution", {"season_id": season_id, "type": "users", "mode": "total"}),
+        ("/stats/me", "/stats/me", None),
+        ("/bingo/board", "/bingo/board", {"season_id": season_id}),
+    ]
+
+async def _virtual_user(client, headers, requests, rounds, samples, errors):
+    for _ in range(rounds):
+        for name, path, params in requests:
+            start = time.perf_counter()
+            try:
+                r = await client.get(path, params=params, headers=headers)
+                ok = r.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            elapsed = time.perf_counter() - start
+            if ok:
+                samples.setdefault(name, []).append(elapsed)
+            else:
+                errors[name] = errors.get(name, 0) + 1
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        r = await client.post("/auth/login", json={"identifier": args.identifier, "password": args.password})
+        r.raise_for_status()
+        headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+        requests = _race_start_requests(args.gp, args.season)
+
+        # Calentamiento: fotos de ranking materializadas y caché de usuario llena
+        await _virtual_user(client, headers, requests, 1, {}, {})
+
+        samples, errors = {}, {}
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            _virtual_user(client, headers, requests, args.rounds, samples, errors)
+            for _ in range(args.users)
+        ])
+        wall = time.perf_counter() - start
+
+    total = sum(len(v) for v in samples.values())
+    print(f"\n🏁 {args.users} usuarios x {args.rounds} rondas contra {args.url}")
+    print(f"   {total} peticiones OK, {sum(errors.values())} errores en {wall:.2f}s -> {total / wall:.1f} req/s\n")
+    print(f"   {'endpoint':<24}{'n':>7}{'avg ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'err':>6}")
+    for name, _, _ in requests:
+        ordered = sorted(samples.get(name, [])) or [0.0]
+        print(
+            f"   {name:<24}{len(samples.get(name, [])):>7}"
+            f"{1000 * statistics.mean(ordered):>10.1f}{1000 * _percentile(ordered, 0.5):>10.1f}"
+            f"{1000 * _percentile(ordered, 0.95):>10.1f}{1000 * ordered[-1]:>10.1f}{errors.get(name, 0):>6}"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pico de tráfico al inicio de carrera")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=1)
+    parser.add_argument("--gp", type=int, default=1)
+    parser.add_argument("--season", type=int, default=1)
+    parser.add_argument("--identifier", default="ADM")
+    parser.add_argument("--password", default="123")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,184 @@
+"""
+Prueba de estrés: cientos de toggles de bingo simultáneos (cierre de la pretemporada).
+
+Crea una temporada temporal con sus casillas y usuarios, lanza muchos hilos que marcan y
+desmarcan casillas a la vez (varios hilos por usuario, para que compitan por su límite) contra
+la BD configurada (DATABASE_URL) y comprueba al final que:
+- ningún usuario supera MAX_SELECTIONS,
+- bingo_user_counters y bingo_tile_stats cuadran con las selecciones reales,
+- el valor guardado de cada casilla es el que da calculate_tile_value (aviso, no fallo: con
+  toggles simultáneos que cambian los participantes puede quedar alguno desfasado hasta el
+  siguiente cambio),
+- la latencia máxima de un toggle no pasa de --max-latency.
+
+Uso (desde app/):
+    python -m app.scripts.stress_bingo_toggle
+    python -m app.scripts.stress_bingo_toggle --threads 400 --users 50 --toggles 40 --max-latency 2
+"""
+import argparse
+import random
+import statistics
+import sys
+import threading
+import time
+
+from sqlalchemy import select, func, delete
+
+from app.db.session import SessionLocal, engine, Base
+from app.db.models import _all
+from app.db.models.user import User
+from app.db.models.season import Season
+from app.db.models.bingo import BingoTile, BingoSelection, BingoTileStats, BingoUserCounter
+from app.services.bingo_stats import (
+    MAX_SELECTIONS, SelectionLimitReached, toggle_tile, add_tile_stats, calculate_tile_value, season_participants
+)
+
+def setup(n_users: int, n_tiles: int, tag: str):
+    db = SessionLocal()
+    try:
+        season = Season(year=1900, name=f"Stress {tag}", is_active=False)
+        db.add(season)
+        db.flush()
+        tiles = [BingoTile(season_id=season.id, description=f"Casilla {i}") for i in range(n_tiles)]
+        users = [
+            User(email=f"{tag}_{i}@stress.local", username=f"{tag}_{i}", hashed_password="x", role="user")
+            for i in range(n_users)
+        ]
+        db.add_all(tiles + users)
+        db.flush()
+        add_tile_stats(db, tiles)
+        db.commit()
+        return season.id, [t.id for t in tiles], [u.id for u in users]
+    finally:
+        db.close()
+
+def cleanup(season_id: int, tile_ids: list, user_ids: list):
+    db = SessionLocal()
+    try:
+        db.execute(delete(BingoSelection).where(BingoSelection.bingo_tile_id.in_(tile_ids)))
+        db.execute(delete(BingoUserCounter).where(BingoUserCounter.season_id == season_id))
+        db.execute(delete(BingoTileStats).where(BingoTileStats.season_id == season_id))
+        db.execute(delete(BingoTile).where(BingoTile.season_id == season_id))
+        db.execute(delete(User).where(User.id.in_(user_ids)))
+        db.execute(delete(Season).where(Season.id == season_id))
+        db.commit()
+    finally:
+        db.close()
+
+def worker(user_id: int, tile_ids: list, toggles: int, start: threading.Barrier, samples: list, outcome: dict, lock):
+    rng = random.Random(user_id * 7919 + threading.get_ident())
+    start.wait()
+    for _ in range(toggles):
+        db = SessionLocal()
+        t0 = time.perf_counter()
+        try:
+            tile = db.get(BingoTile, rng.choice(tile_ids))
+            result = toggle_tile(db, user_id, tile)
+            key = result["status"]
+        except SelectionLimitReached:
+            key = "limit"
+        except Exception as e:
+            db.rollback()
+            key = f"error: {type(e).__name__}"
+        finally:
+            db.close()
+        elapsed = time.perf_counter() - t0
+        with lock:
+            samples.append(elapsed)
+            outcome[key] = outcome.get(key, 0) + 1
+
+def check(season_id: int, tile_ids: list) -> tuple:
+    db = SessionLocal()
+    problems, warnings = [], []
+    try:
+        per_user = dict(db.execute(
+            select(BingoSelection.user_id, func.count())
+            .where(BingoSelection.bingo_tile_id.in_(tile_ids))
+            .group_by(BingoSelection.user_id)
+        ).all())
+        counters = dict(db.execute(
+            select(BingoUserCounter.user_id, BingoUserCounter.selections)
+            .where(BingoUserCounter.season_id == season_id)
+        ).all())
+        for uid in set(per_user) | set(counters):
+            n = per_user.get(uid, 0)
+            if n > MAX_SELECTIONS:
+                problems.append(f"usuario {uid}: {n} selecciones (> {MAX_SELECTIONS})")
+            if counters.get(uid, 0) != n:
+                problems.append(f"usuario {uid}: contador {counters.get(uid)} != {n} selecciones")
+
+        per_tile = dict(db.execute(
+            select(BingoSelection.bingo_tile_id, func.count())
+            .where(BingoSelection.bingo_tile_id.in_(tile_ids))
+            .group_by(BingoSelection.bingo_tile_id)
+        ).all())
+        participants = season_participants(db, season_id)
+        for tid, count, value in db.execute(
+            select(BingoTileStats.tile_id, BingoTileStats.selection_count, BingoTileStats.current_value)
+            .where(BingoTileStats.season_id == season_id)
+        ).all():
+            if count != per_tile.get(tid, 0):
+                problems.append(f"casilla {tid}: contador {count} != {per_tile.get(tid, 0)} selecciones")
+            if value != calculate_tile_value(participants, count):
+                warnings.append(f"casilla {tid}: valor {value} != {calculate_tile_value(participants, count)}")
+        print(f"📊 {sum(per_user.values())} selecciones de {len(per_user)} usuarios, máximo por usuario {max(per_user.values(), default=0)}")
+    finally:
+        db.close()
+    return problems, warnings
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=300)
+    parser.add_argument("--users", type=int, default=30, help="Usuarios (varios hilos por usuario)")
+    parser.add_argument("--tiles", type=int, default=50)
+    parser.add_argument("--toggles", type=int, default=30, help="Toggles por hilo")
+    parser.add_argument("--max-latency", type=float, default=5.0, help="Segundos máximos por toggle")
+    parser.add_argument("--keep", action="store_true", help="No borrar los datos de prueba")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(engine)
+    tag = f"stress{int(time.time())}"
+    season_id, tile_ids, user_ids = setup(args.users, args.tiles, tag)
+    print(f"🧪 {args.threads} hilos, {args.users} usuarios, {args.tiles} casillas, {args.toggles} toggles por hilo ({engine.dialect.name})")
+
+    samples, outcome, lock = [], {}, threading.Lock()
+    start = threading.Barrier(args.threads)
+    threads = [
+        threading.Thread(target=worker, args=(user_ids[i % len(user_ids)], tile_ids, args.toggles, start, samples, outcome, lock))
+        for i in range(args.threads)
+    ]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+
+    try:
+        problems, warnings = check(season_id, tile_ids)
+    finally:
+        if not args.keep:
+            cleanup(season_id, tile_ids, user_ids)
+
+    ordered = sorted(samples)
+    p = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    print(f"⏱️  {len(samples)} toggles en {wall:.1f}s ({len(samples) / wall:,.0f}/s) | "
+          f"p50 {statistics.median(ordered) * 1000:.0f} ms | p95 {p(0.95) * 1000:.0f} ms | "
+          f"p99 {p(0.99) * 1000:.0f} ms | máx {ordered[-1] * 1000:.0f} ms")
+    print(f"   Resultados: {outcome}")
+
+    for line in warnings[:10]:
+        print(f"⚠️ {line}")
+    if ordered[-1] > args.max_latency:
+        problems.append(f"latencia máxima {ordered[-1]:.2f}s > {args.max_latency}s")
+    if any(k.startswith("error") for k in outcome):
+        problems.append("hubo toggles con error")
+    if problems:
+        print("❌ Invariantes rotos:")
+        for line in problems[:20]:
+            print(f"   - {line}")
+        sys.exit(1)
+    print("✅ Límite respetado y contadores consistentes.")
+
+if __name__ == "__main__":
+    main()
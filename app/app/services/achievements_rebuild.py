@@ -0,0 +1,252 @@
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Optional
+
+from sqlalchemy import insert, select, update, exists, or_, and_, text
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.core.response_cache import bump_data_version
+from app.services.radar_metrics import refresh_radar_metrics
+from app.db.models.grand_prix import GrandPrix
+from app.db.models.race_result import RaceResult
+from app.db.models.season import Season
+from app.db.models.user_stats import UserStats, UserGpStats
+from app.db.models.achievement import UserAchievement
+from app.db.models.publication_job import PublicationJob
+from app.db.models.achievements_rebuild import (
+    RebuildJob, UserStatsRebuild, UserGpStatsRebuild, UserAchievementRebuild
+)
+from app.services.achievements_service import evaluate_race_achievements, evaluate_season_finale_achievements
+
+STAGING_TABLES = SimpleNamespace(
+    stats=UserStatsRebuild, gp_stats=UserGpStatsRebuild, achievements=UserAchievementRebuild
+)
+
+# (tabla viva, tabla staging, ¿copiar id?). user_achievements genera ids nuevos para no
+# desincronizar su secuencia en PostgreSQL.
+_SWAP_PAIRS = (
+    (UserStats, UserStatsRebuild, True),
+    (UserGpStats, UserGpStatsRebuild, True),
+    (UserAchievement, UserAchievementRebuild, False),
+)
+
+# Un job "running" sin latido durante este tiempo quedó a medias (worker caído, reinicio)
+# y otro worker puede reclamarlo y reanudarlo desde su checkpoint.
+STALE_AFTER = timedelta(seconds=int(os.getenv("REBUILD_STALE_SECONDS", "300")))
+
+# Clave del advisory lock de PostgreSQL que serializa los claims entre workers
+_CLAIM_LOCK_KEY = 0x72656275 # "rebu"
+
+def job_to_dict(job: RebuildJob) -> dict:
+    total = len(job.gp_ids or [])
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "processed_gps": job.processed_gps,
+        "total_gps": total,
+        "progress": round(100 * job.processed_gps / total, 1) if total else 100.0,
+        "last_gp_id": job.last_gp_id,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+def _clear_staging(db: Session):
+    for _, staging, _ in _SWAP_PAIRS:
+        db.query(staging).delete(synchronize_session=False)
+
+def _completed_gp_ids(db: Session) -> list:
+    """GPs pasados con resultado, en orden cronológico."""
+    return [
+        gp_id for (gp_id,) in db.query(GrandPrix.id).join(RaceResult)
+        .filter(GrandPrix.race_datetime <= datetime.utcnow())
+        .order_by(GrandPrix.race_datetime.asc())
+        .all()
+    ]
+
+def _alive(now: datetime):
+    return and_(RebuildJob.status == "running", RebuildJob.heartbeat_at >= now - STALE_AFTER)
+
+def _claim(db: Session, job_id: int) -> bool:
+    """
+    Marca el job como propio de este worker con un UPDATE atómico (como el _claim de las
+    publicaciones). Falla si ese job u otro está "running" con latido reciente: las tablas
+    *_rebuild son compartidas, solo puede haber una reconstrucción a la vez.
+    """
+    now = datetime.utcnow()
+    if db.get_bind().dialect.name == "postgresql":
+        # Dos claims simultáneos de jobs distintos no se verían entre sí en READ COMMITTED.
+        # SQLite ya serializa las escrituras.
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _CLAIM_LOCK_KEY})
+    other_alive = exists().where(RebuildJob.id != job_id, _alive(now))
+    claimed = db.execute(
+        update(RebuildJob)
+        .where(RebuildJob.id == job_id)
+        .where(or_(
+            RebuildJob.status.in_(("pending", "failed")),
+            and_(RebuildJob.status == "running", RebuildJob.heartbeat_at < now - STALE_AFTER),
+        ))
+        .where(~other_alive)
+        .values(status="running", heartbeat_at=now, error=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return claimed == 1
+
+def start_rebuild_job(db: Session, fresh: bool = False) -> Optional[RebuildJob]:
+    """
+    Reclama el último job sin terminar (o crea uno nuevo si no hay, o si fresh=True) para este
+    worker. Devuelve None si ya hay una reconstrucción en marcha en cualquier worker.
+    """
+    job = db.query(RebuildJob).order_by(RebuildJob.id.desc()).first()
+    created = not job or job.status == "done" or fresh
+    if created:
+        job = RebuildJob(status="pending", gp_ids=[], processed_gps=0)
+        db.add(job)
+        db.commit()
+
+    if not _claim(db, job.id):
+        if created:
+            # Sin staging propio: no debe quedar como "último job" reanudable
+            db.delete(job)
+            db.commit()
+        return None
+
+    db.refresh(job)
+    if created:
+        # Solo con el job ya reclamado: vaciar el staging antes pisaría el de otro worker
+        _clear_staging(db)
+        job.gp_ids = _completed_gp_ids(db)
+        job.started_at = datetime.utcnow() # Lo publicado después de aquí se vuelve a aplicar antes del swap
+        db.commit()
+    return job
+
+def get_active_job_id(db: Session) -> Optional[int]:
+    """Job "running" con latido reciente (en cualquier worker)."""
+    return db.query(RebuildJob.id).filter(_alive(datetime.utcnow())).order_by(RebuildJob.id.desc()).limit(1).scalar()
+
+def _published_since(db: Session, since: datetime) -> list:
+    """GPs con alguna publicación activa desde `since` (ya hayan pasado o no por la etapa de logros)."""
+    gp_ids = {
+        gp_id for (gp_id,) in db.query(PublicationJob.gp_id)
+        .filter(PublicationJob.heartbeat_at >= since)
+        .all()
+    }
+    if not gp_ids:
+        return []
+    return (
+        db.query(GrandPrix).join(RaceResult)
+        .filter(GrandPrix.id.in_(gp_ids))
+        .order_by(GrandPrix.race_datetime.asc())
+        .all()
+    )
+
+def _close_season_if_finished(db: Session, gp: GrandPrix, season_gps: list):
+    """Logros de final de temporada, solo si la temporada ya no está activa o se han disputado todos sus GPs."""
+    season_obj = db.query(Season).filter(Season.id == gp.season_id).first()
+    if not season_obj: return
+
+    total_scheduled = db.query(GrandPrix).filter(GrandPrix.season_id == gp.season_id).count()
+    if not season_obj.is_active or len(season_gps) >= total_scheduled:
+        print(f"   🏆 Cerrando Temporada {gp.season_id}...")
+        evaluate_season_finale_achievements(db, gp.season_id, tables=STAGING_TABLES)
+    else:
+        print(f"   ⏳ Temporada {gp.season_id} ({season_obj.year}) todavía en curso ({len(season_gps)}/{total_scheduled} GPs). Saltando logros de final de temporada.")
+
+def _publish_staging(db: Session):
+    """Swap atómico: vacía las tablas vivas y copia el staging en una sola transacción."""
+    for live, _, _ in reversed(_SWAP_PAIRS):
+        db.query(live).delete(synchronize_session=False)
+
+    for live, staging, keep_ids in _SWAP_PAIRS:
+        cols = [c.name for c in staging.__table__.columns if keep_ids or c.name != "id"]
+        source = select(*[staging.__table__.c[c] for c in cols])
+        if not keep_ids:
+            source = source.order_by(staging.__table__.c.id)
+        db.execute(insert(live).from_select(cols, source))
+
+    _clear_staging(db)
+
+def run_rebuild_job(job_id: int):
+    """
+    ⚠️ DANGER ZONE: Recalcula TODO desde cero (Stats + Achievements) en segundo plano.
+    1. Reprocesa cronológicamente los GPs pendientes del job sobre las tablas de staging,
+       cerrando cada temporada terminada con evaluate_season_finale_achievements.
+    2. Guarda un checkpoint tras cada GP para poder reanudar.
+    3. Al terminar publica el staging en user_stats / user_gp_stats / user_achievements de golpe.
+    Abre su propia sesión: está pensado para BackgroundTasks tras start_rebuild_job.
+    """
+    db = SessionLocal()
+    try:
+        job = db.get(RebuildJob, job_id)
+        job.started_at = job.started_at or datetime.utcnow()
+        job.heartbeat_at = datetime.utcnow()
+        db.commit()
+        print(f"🔥 RECONSTRUCCIÓN DE LOGROS (job {job_id}): GP {job.processed_gps + 1}/{len(job.gp_ids)}...")
+
+        gps = {gp.id: gp for gp in db.query(GrandPrix).filter(GrandPrix.id.in_(job.gp_ids)).all()}
+        gps_by_season = defaultdict(list)
+        for gp_id in job.gp_ids:
+            if gp_id in gps:
+                gps_by_season[gps[gp_id].season_id].append(gp_id)
+
+        for gp_id in job.gp_ids[job.processed_gps:]:
+            gp = gps.get(gp_id)
+            if gp:  # Puede haberse borrado desde que se creó el job
+                print(f"   ⟳ Procesando GP: {gp.name} (Season {gp.season_id})...")
+                evaluate_race_achievements(db, gp.id, tables=STAGING_TABLES)
+
+                season_gps = gps_by_season[gp.season_id]
+                if season_gps[-1] == gp.id:
+                    _close_season_if_finished(db, gp, season_gps)
+
+            # Checkpoint. Si el proceso cae antes de este commit, al reanudar se repite el GP:
+            # evaluate_race_achievements es idempotente (modo corrección).
+            job.processed_gps += 1
+            job.last_gp_id = gp_id
+            job.heartbeat_at = datetime.utcnow()
+            db.commit()
+
+        # Resultados publicados mientras corría el job: el staging no los tiene (GP nuevo) o tiene
+        # la versión anterior (GP corregido). El swap borraría lo que su publicación escribió.
+        checked_at = datetime.utcnow()
+        for gp in _published_since(db, job.started_at):
+            print(f"   ⟳ Reaplicando GP publicado durante la reconstrucción: {gp.name}...")
+            evaluate_race_achievements(db, gp.id, tables=STAGING_TABLES)
+
+        _publish_staging(db)
+        job.status = "done"
+        job.finished_at = datetime.utcnow()
+        db.commit()
+
+        # Una publicación que terminó su etapa de logros entre la comprobación y el swap escribió
+        # en las tablas que el swap acaba de reemplazar: se repite sobre las vivas (idempotente)
+        for gp in _published_since(db, checked_at):
+            evaluate_race_achievements(db, gp.id, refresh_profiles=False)
+        refresh_radar_metrics(db)
+        bump_data_version(db, stats=True)
+        print(f"✅ RECONSTRUCCIÓN COMPLETADA (job {job_id}).")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error en la reconstrucción (job {job_id}): {e}")
+        job = db.get(RebuildJob, job_id)
+        if job:
+            job.status = "failed"
+            job.error = str(e)
+            db.commit()
+    finally:
+        db.close()
+
+def rebuild_all_achievements(db: Session):
+    """Reconstrucción completa síncrona (scripts/consola) con el mismo pipeline de staging."""
+    job = start_rebuild_job(db, fresh=True)
+    if job is None:
+        raise RuntimeError("Ya hay una reconstrucción en curso.")
+    run_rebuild_job(job.id)
+    db.refresh(job)
+    if job.status != "done":
+        raise RuntimeError(f"La reconstrucción ha fallado: {job.error}")
@@ -1,7 +1,8 @@
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, desc, and_, or_
+from sqlalchemy import func, desc, and_, or_, insert, update
 from typing import Set, List, Optional
 from collections import defaultdict
+from types import SimpleNamespace
 
 # Modelos
 from app.db.models.achievement import Achievement, UserAchievement, AchievementType
@@ -12,12 +13,15 @@ from app.db.models.race_result import RaceResult
 from app.db.models.race_position import RacePosition
 from app.db.models.race_event import RaceEvent
 from app.db.models.grand_prix import GrandPrix
-from app.db.models.season import Season
 from app.db.models.user import User
 from app.db.models.driver import Driver
-from app.db.models.constructor import Constructor
 from app.db.models.user_stats import UserStats, UserGpStats # <--- IMPORTANTE
 from app.db.models.team_member import TeamMember
+from app.core.response_cache import bump_data_version
+from app.services.radar_metrics import refresh_radar_metrics
+from app.services.running_stats import (
+    RUNNING_FIELDS, RUNNING_PREFIXES, running_add, running_remove, prediction_lead_seconds, rebuild_running
+)
 
 # ==============================================================================
 # 0. CONFIGURACIÓN
@@ -50,6 +54,10 @@ def get_dynamic_slugs() -> Set[str]:
         "event_david_goliath", "event_el_optimista", "event_la_escoba", "event_maldonado"
     }
 
+# Tablas donde se escriben stats y logros. Una reconstrucción usa sus tablas de staging
+# (ver app.db.models.achievements_rebuild) con las mismas columnas.
+LIVE_TABLES = SimpleNamespace(stats=UserStats, gp_stats=UserGpStats, achievements=UserAchievement)
+
 # ==============================================================================
 # 1. GESTIÓN DE ESTADÍSTICAS (INCREMENTAL ROBUSTO + CACHÉ)
 # ==============================================================================
@@ -61,6 +69,7 @@ def calculate_gp_metrics(prediction: Prediction, result: RaceResult) -> dict:
     """
     metrics = {
         "points": prediction.points or 0,
+        "lead_seconds": prediction_lead_seconds(prediction, result.grand_prix if result else None),
         "exact_positions": 0,
         "exact_podium_hit": False,
         "exact_top5_hit": False, # Nuevo
@@ -117,6 +126,64 @@ def calculate_gp_metrics(prediction: Prediction, result: RaceResult) -> dict:
     return metrics
 
 
+# Métricas por GP que se guardan en UserGpStats (caché para poder revertir)
+GP_METRIC_FIELDS = (
+    "points", "lead_seconds", "exact_positions", "exact_podium_hit", "fastest_lap_hit",
+    "safety_car_hit", "dnf_count_hit", "dnf_driver_hit",
+)
+
+# Acierto del GP -> contador acumulado en UserStats
+HIT_COUNTERS = (
+    ("exact_podium_hit", "exact_podiums_count"),
+    ("fastest_lap_hit", "fastest_lap_hits"),
+    ("safety_car_hit", "safety_car_hits"),
+    ("dnf_count_hit", "dnf_count_hits"),
+    ("dnf_driver_hit", "dnf_driver_hits"),
+)
+
+# Columnas de UserStats que mantiene el cálculo incremental
+STATS_FIELDS = (
+    "total_points", "current_season_points", "total_gps_played", "exact_positions_count",
+    "exact_podiums_count", "fastest_lap_hits", "safety_car_hits", "dnf_count_hits", "dnf_driver_hits",
+    "last_gp_played_id", "last_gp_played_date",
+) + RUNNING_FIELDS
+
+
+def apply_gp_metrics(stats, gp: GrandPrix, old, new: dict):
+    """
+    Resta las métricas guardadas del GP (si existían) y suma las nuevas sobre `stats`.
+    Lógica pura: sirve para un UserStats y para su copia en memoria del batch.
+    """
+    if old is not None:
+        # --- MODO CORRECCIÓN: RESTAR LO VIEJO ---
+        stats.total_points -= old.points
+        stats.current_season_points -= old.points
+        stats.exact_positions_count -= old.exact_positions
+        for hit, counter in HIT_COUNTERS:
+            if getattr(old, hit): setattr(stats, counter, getattr(stats, counter) - 1)
+        running_remove(stats, "points", old.points)
+        if old.lead_seconds is not None:
+            running_remove(stats, "lead", old.lead_seconds)
+    else:
+        # --- MODO NUEVO ---
+        stats.total_gps_played += 1
+
+    # --- APLICAR: SUMAR LO NUEVO ---
+    stats.total_points += new["points"]
+    stats.current_season_points += new["points"]
+    stats.exact_positions_count += new["exact_positions"]
+    for hit, counter in HIT_COUNTERS:
+        if new[hit]: setattr(stats, counter, getattr(stats, counter) + 1)
+    running_add(stats, "points", new["points"])
+    if new["lead_seconds"] is not None:
+        running_add(stats, "lead", new["lead_seconds"])
+
+    # Actualizar metadatos de "último jugado"
+    if not stats.last_gp_played_id or gp.id >= stats.last_gp_played_id:
+        stats.last_gp_played_id = gp.id
+        stats.last_gp_played_date = gp.race_datetime
+
+
 def update_stats_incremental(db: Session, user_id: int, gp: GrandPrix) -> UserStats:
     """
     Actualiza UserStats usando UserGpStats como caché intermedia.
@@ -143,58 +210,66 @@ def update_stats_incremental(db: Session, user_id: int, gp: GrandPrix) -> UserSt
     # 4. Calcular Métricas ACTUALES de este GP (En memoria)
     new = calculate_gp_metrics(pred, gp.race_result)
 
-    # 5. Buscar si ya existían métricas guardadas para este GP (La "Caché")
+    # 5. Buscar si ya existían métricas guardadas para este GP (La "Caché") y aplicar el delta
     gp_stats = db.query(UserGpStats).filter(UserGpStats.user_id == user_id, UserGpStats.gp_id == gp.id).first()
+    apply_gp_metrics(stats, gp, gp_stats, new)
 
-    if gp_stats:
-        # --- MODO CORRECCIÓN: RESTAR LO VIEJO ---
-        stats.total_points -= gp_stats.points
-        
-        # Asumimos que estamos corrigiendo la temporada actual
-        if gp.season_id == gp.season_id: 
-            stats.current_season_points -= gp_stats.points
-        
-        stats.exact_positions_count -= gp_stats.exact_positions
-        if gp_stats.exact_podium_hit: stats.exact_podiums_count -= 1
-        if gp_stats.fastest_lap_hit: stats.fastest_lap_hits -= 1
-        if gp_stats.safety_car_hit: stats.safety_car_hits -= 1
-        if gp_stats.dnf_count_hit: stats.dnf_count_hits -= 1
-        if gp_stats.dnf_driver_hit: stats.dnf_driver_hits -= 1
-        
-    else:
-        # --- MODO NUEVO: CREAR CACHÉ ---
+    if not gp_stats:
         gp_stats = UserGpStats(user_id=user_id, gp_id=gp.id)
-        stats.total_gps_played += 1
         db.add(gp_stats)
 
-    # 6. --- APLICAR: SUMAR LO NUEVO ---
-    stats.total_points += new["points"]
-    stats.current_season_points += new["points"]
-    
-    stats.exact_positions_count += new["exact_positions"]
-    if new["exact_podium_hit"]: stats.exact_podiums_count += 1
-    if new["fastest_lap_hit"]: stats.fastest_lap_hits += 1
-    if new["safety_car_hit"]: stats.safety_car_hits += 1
-    if new["dnf_count_hit"]: stats.dnf_count_hits += 1
-    if new["dnf_driver_hit"]: stats.dnf_driver_hits += 1
-
-    # Actualizar metadatos de "último jugado"
-    if not stats.last_gp_played_id or gp.id >= stats.last_gp_played_id:
-        stats.last_gp_played_id = gp.id
-        stats.last_gp_played_date = gp.race_datetime
-
-    # 7. Actualizar la "Caché" con los nuevos valores para el futuro
-    gp_stats.points = new["points"]
-    gp_stats.exact_positions = new["exact_positions"]
-    gp_stats.exact_podium_hit = new["exact_podium_hit"]
-    gp_stats.fastest_lap_hit = new["fastest_lap_hit"]
-    gp_stats.safety_car_hit = new["safety_car_hit"]
-    gp_stats.dnf_count_hit = new["dnf_count_hit"]
-    gp_stats.dnf_driver_hit = new["dnf_driver_hit"]
+    # 6. Actualizar la "Caché" con los nuevos valores para el futuro
+    for field in GP_METRIC_FIELDS:
+        setattr(gp_stats, field, new[field])
 
     # db.commit() <- REMOVIDO PARA BATCH
     return stats
 
+def backfill_running_stats(db: Session):
+    """
+    Pone al día los agregados Welford de UserStats (fase de arranque, una vez por despliegue).
+    Solo toca lo que falta: filas de UserGpStats sin antelación y usuarios cuyos contadores
+    no cuadran con su historial (p.ej. puntuados antes de existir las columnas).
+    """
+    # 1. Antelación de las filas antiguas (la predicción y la fecha del GP siguen en la BD)
+    missing = (
+        db.query(UserGpStats.user_id, UserGpStats.gp_id, Prediction.updated_at, GrandPrix.race_datetime)
+        .join(Prediction, and_(Prediction.user_id == UserGpStats.user_id, Prediction.gp_id == UserGpStats.gp_id))
+        .join(GrandPrix, GrandPrix.id == UserGpStats.gp_id)
+        .filter(UserGpStats.lead_seconds.is_(None))
+        .all()
+    )
+    lead_updates = []
+    for uid, gp_id, updated_at, race_datetime in missing:
+        lead = prediction_lead_seconds(SimpleNamespace(updated_at=updated_at), SimpleNamespace(race_datetime=race_datetime))
+        if lead is not None:
+            lead_updates.append({"user_id": uid, "gp_id": gp_id, "lead_seconds": lead})
+    if lead_updates:
+        db.execute(update(UserGpStats), lead_updates)
+
+    # 2. Usuarios cuyos agregados no cuadran con el número de filas del historial
+    counts = (
+        db.query(UserGpStats.user_id, func.count(UserGpStats.gp_id), func.count(UserGpStats.lead_seconds))
+        .group_by(UserGpStats.user_id)
+        .all()
+    )
+    stats_map = {s.user_id: s for s in db.query(UserStats).all()}
+    stale = [
+        uid for uid, n_points, n_lead in counts
+        if uid in stats_map and ((stats_map[uid].points_count or 0) != n_points or (stats_map[uid].lead_count or 0) != n_lead)
+    ]
+    if stale:
+        history = defaultdict(list)
+        for uid, points, lead in db.query(UserGpStats.user_id, UserGpStats.points, UserGpStats.lead_seconds)\
+                .filter(UserGpStats.user_id.in_(stale)).order_by(UserGpStats.gp_id).all():
+            history[uid].append((points, lead))
+        for uid in stale:
+            rows = history[uid]
+            rebuild_running(stats_map[uid], [p for p, _ in rows], [l for _, l in rows])
+
+    db.commit()
+    print(f"📈 Agregados Welford: {len(lead_updates)} antelaciones y {len(stale)} usuarios recalculados.")
+
 # ==============================================================================
 # 2. CALCULADORA DE LOGROS (CHECKERS)
 # ==============================================================================
@@ -204,15 +279,19 @@ def check_event_achievements(
     user_id: int, 
     gp: GrandPrix, 
     prediction: Optional[Prediction] = None,
-    context: Optional[dict] = None
+    context: Optional[dict] = None,
+    metrics: Optional[dict] = None
 ) -> Set[str]:
-    """Verifica logros tipo EVENT basándose ÚNICAMENTE en el GP actual."""
+    """
+    Verifica logros tipo EVENT basándose ÚNICAMENTE en el GP actual.
+    Con `context` (batch) no lanza queries: pilotos, equipos y puntos del GP vienen precargados.
+    """
     unlocks = set()
     
     pred = prediction or db.query(Prediction).filter(Prediction.user_id == user_id, Prediction.gp_id == gp.id).first()
     if not pred or not gp.race_result: return unlocks
     
-    m = calculate_gp_metrics(pred, gp.race_result)
+    m = metrics or calculate_gp_metrics(pred, gp.race_result)
     points = m["points"]
     if points > 0: unlocks.add("event_first")
     if points > 25: unlocks.add("event_25pts")
@@ -309,8 +388,8 @@ def check_event_achievements(
     # --- CIVIL WAR (1-2 Compañeros) ---
     p1, p2 = u_pos.get(1), u_pos.get(2)
     if p1 and p2 and p1 == r_pos.get(1) and p2 == r_pos.get(2):
-        d1 = db.query(Driver).filter_by(code=p1).first()
-        d2 = db.query(Driver).filter_by(code=p2).first()
+        d1 = _get_driver(db, p1, context)
+        d2 = _get_driver(db, p2, context)
         if d1 and d2 and d1.constructor_id == d2.constructor_id:
             unlocks.add("event_civil_war")
     
@@ -324,20 +403,31 @@ def check_event_achievements(
         db_drv = u_pos.get(i+1)
         # Ambos acertados
         if da == r_pos.get(i) and db_drv == r_pos.get(i+1):
-            driver_a = db.query(Driver).filter_by(code=da).first()
-            driver_b = db.query(Driver).filter_by(code=db_drv).first()
+            driver_a = _get_driver(db, da, context)
+            driver_b = _get_driver(db, db_drv, context)
             if driver_a and driver_b and driver_a.constructor_id == driver_b.constructor_id:
                 found_wall = True
                 break
     if found_wall: unlocks.add("event_el_muro") # Nuevo
 
     # --- JOIN TEAM ---
-    has_team = db.query(TeamMember).filter(TeamMember.user_id == user_id, TeamMember.season_id == gp.season_id).first()
+    if context:
+        has_team = context["team_members"].get(user_id)
+    else:
+        has_team = db.query(TeamMember).filter(TeamMember.user_id == user_id, TeamMember.season_id == gp.season_id).first()
     if has_team: unlocks.add("event_join_team")
 
     # --- LOBO SOLITARIO & DAVID vs GOLIATH (Globales) ---
     # Requieren contexto de OTROS usuarios.
-    
+    if context:
+        # Batch: máximo del GP y puntos del líder (clasificación previa a este GP) ya calculados
+        if points == context["max_gp_points"] and not has_team:
+            unlocks.add("event_lobo_solitario")
+        leader_gp_points = context["leader_gp_points"]
+        if points >= (leader_gp_points * 2) and leader_gp_points > 0:
+            unlocks.add("event_david_goliath")
+        return unlocks
+
     # 1. Obtener puntos de todos en este GP
     all_preds = db.query(Prediction.user_id, Prediction.points).filter(Prediction.gp_id == gp.id).all()
     if all_preds:
@@ -364,6 +454,12 @@ def check_event_achievements(
 
     return unlocks
 
+def _get_driver(db: Session, code: str, context: Optional[dict] = None) -> Optional[Driver]:
+    """Piloto por código: del contexto precargado en batch o con query individual."""
+    if context:
+        return context["drivers"].get(code)
+    return db.query(Driver).filter_by(code=code).first()
+
 def check_career_season_achievements(db: Session, user_id: int, stats: UserStats) -> Set[str]:
     """Verifica logros CAREER y SEASON contra los Stats Acumulados."""
     unlocks = set()
@@ -426,30 +522,37 @@ def check_season_finale_achievements(db: Session, user_id: int, season_id: int,
 # 3. VERIFICACIÓN HISTÓRICA
 # ==============================================================================
 
+# Criterio de cada logro EVENT dinámico sobre una fila de UserGpStats
+HISTORICAL_GP_CHECKS = {
+    "event_first": lambda g: True,
+    "event_25pts": lambda g: g.points > 25,
+    "event_50pts": lambda g: g.points > 50,
+    "event_diamante": lambda g: g.points > 75,
+    "event_maldonado": lambda g: g.points == 0,
+    "event_nostradamus": lambda g: g.exact_podium_hit,
+    "event_high_five": lambda g: g.exact_positions >= 5,
+    "event_la_decima": lambda g: g.exact_positions >= 10,
+    "event_mc": lambda g: g.fastest_lap_hit and g.safety_car_hit and g.dnf_count_hit and g.dnf_driver_hit,
+    "event_el_narrador": lambda g: g.fastest_lap_hit and g.safety_car_hit and g.dnf_count_hit and g.dnf_driver_hit,
+}
+
+def is_historically_valid(slug: str, gp_stats_rows) -> bool:
+    """Versión en memoria: ¿alguna de las filas UserGpStats del usuario cumple el criterio?"""
+    check = HISTORICAL_GP_CHECKS.get(slug)
+    if check is None:
+        # Para logros complejos (Civil War, Wall, etc) no hay caché por GP: se conservan
+        return True
+    return any(check(g) for g in gp_stats_rows)
+
 def verify_historical_validity(db: Session, user_id: int, slug: str) -> bool:
     """Verifica si el usuario CUMPLE el criterio en CUALQUIER GP pasado usando UserGpStats."""
     if slug == "event_join_team":
         return db.query(TeamMember).filter(TeamMember.user_id == user_id).first() is not None
-    if slug == "event_first":
-        return db.query(UserGpStats).filter(UserGpStats.user_id == user_id).first() is not None
-
-    query = db.query(UserGpStats).filter(UserGpStats.user_id == user_id)
-    if slug == "event_25pts": query = query.filter(UserGpStats.points > 25)
-    elif slug == "event_50pts": query = query.filter(UserGpStats.points > 50)
-    elif slug == "event_diamante": query = query.filter(UserGpStats.points > 75)
-    elif slug == "event_maldonado": query = query.filter(UserGpStats.points == 0)
-    elif slug == "event_nostradamus": query = query.filter(UserGpStats.exact_podium_hit == True)
-    elif slug == "event_high_five": query = query.filter(UserGpStats.exact_positions >= 5)
-    elif slug == "event_la_decima": query = query.filter(UserGpStats.exact_positions >= 10)
-    elif slug == "event_mc" or slug == "event_el_narrador":
-        query = query.filter(UserGpStats.fastest_lap_hit == True, UserGpStats.safety_car_hit == True, 
-                             UserGpStats.dnf_count_hit == True, UserGpStats.dnf_driver_hit == True)
-    else:
-        # Para logros complejos (Civil War, Wall, etc), recurrimos a la lógica antigua solo si es necesario
-        # pero por ahora, la mayoría de dynamic slugs 'EVENT' son capturables en UserGpStats o son 'SEASON/CAREER'
-        return True 
+    if slug not in HISTORICAL_GP_CHECKS:
+        return True
 
-    return query.first() is not None
+    rows = db.query(UserGpStats).filter(UserGpStats.user_id == user_id).all()
+    return is_historically_valid(slug, rows)
 
 # ==============================================================================
 # 4. ORQUESTADOR PRINCIPAL
@@ -461,8 +564,10 @@ def grant_achievements(
     slugs: List[str], 
     season_id: int = None, 
     gp_id: int = None,
-    context: Optional[dict] = None
+    context: Optional[dict] = None,
+    tables: SimpleNamespace = None
 ):
+    tables = tables or LIVE_TABLES
     new_achs = []
     # Usar contexto para batch o query individual para normal/legacy
     if context:
@@ -473,10 +578,10 @@ def grant_achievements(
             
             print(f"🏆 DESBLOQUEADO: {slug}")
             save_gp = gp_id if ach.type in [AchievementType.EVENT, AchievementType.CAREER] else None
-            db.add(UserAchievement(user_id=user_id, achievement_id=ach.id, season_id=season_id, gp_id=save_gp))
+            db.add(tables.achievements(user_id=user_id, achievement_id=ach.id, season_id=season_id, gp_id=save_gp))
             user_existing.add(ach.id)
     else:
-        existing_rows = db.query(UserAchievement).filter(UserAchievement.user_id == user_id).all()
+        existing_rows = db.query(tables.achievements).filter(tables.achievements.user_id == user_id).all()
         already_has_ids = {r.achievement_id for r in existing_rows}
         for slug in slugs:
             ach = db.query(Achievement).filter_by(slug=slug).first()
@@ -484,7 +589,7 @@ def grant_achievements(
             
             print(f"🏆 DESBLOQUEADO (individual): {slug}")
             save_gp = gp_id if ach.type in [AchievementType.EVENT, AchievementType.CAREER] else None
-            db.add(UserAchievement(user_id=user_id, achievement_id=ach.id, season_id=season_id, gp_id=save_gp))
+            db.add(tables.achievements(user_id=user_id, achievement_id=ach.id, season_id=season_id, gp_id=save_gp))
             already_has_ids.add(ach.id)
         db.commit()
 
@@ -535,83 +640,163 @@ def sync_achievements(db: Session, user_id: int, current_gp: GrandPrix):
     db.commit()
 
 # Entry Points
-def evaluate_race_achievements(db: Session, gp_id: int):
-    """Orquestador BATCH: Procesa todos los usuarios de un GP en una sola transacción."""
+def _empty_stats(user_id: int) -> SimpleNamespace:
+    """UserStats en memoria con los valores por defecto del modelo."""
+    stats = SimpleNamespace(user_id=user_id, **{f: 0 for f in STATS_FIELDS})
+    stats.total_points = stats.current_season_points = 0.0
+    for prefix in RUNNING_PREFIXES:
+        setattr(stats, f"{prefix}_mean", 0.0)
+        setattr(stats, f"{prefix}_m2", 0.0)
+    stats.last_gp_played_id = stats.last_gp_played_date = None
+    return stats
+
+def evaluate_race_achievements(db: Session, gp_id: int, tables: SimpleNamespace = None, refresh_profiles: bool = True):
+    """
+    Orquestador BATCH: Procesa todos los usuarios de un GP en una sola transacción.
+    Cada tabla se lee una vez; los deltas de stats y los logros a conceder/revocar se calculan
+    en memoria y se escriben con INSERT/UPDATE/DELETE masivos (nº de queries fijo por GP).
+    `tables` permite escribir en las tablas de staging durante una reconstrucción.
+    Con refresh_profiles=False no recalcula user_radar_metrics (el pipeline de publicación lo hace en su etapa).
+    """
+    tables = tables or LIVE_TABLES
     gp = db.query(GrandPrix).options(
         joinedload(GrandPrix.race_result).joinedload(RaceResult.positions),
         joinedload(GrandPrix.race_result).joinedload(RaceResult.events)
     ).get(gp_id)
     if not gp: return
+    result = gp.race_result
 
     preds = db.query(Prediction).options(joinedload(Prediction.positions), joinedload(Prediction.events))\
         .filter(Prediction.gp_id == gp_id).all()
     uids = [p.user_id for p in preds]
-    
-    # 1. Cargas masivas iniciales
-    ach_defs = {a.slug: a for a in db.query(Achievement).all()}
-    stats_map = {s.user_id: s for s in db.query(UserStats).filter(UserStats.user_id.in_(uids)).all()}
-    for uid in uids:
-        if uid not in stats_map:
-            stats_map[uid] = UserStats(user_id=uid); db.add(stats_map[uid])
-
-    user_ach_rows = db.query(UserAchievement).options(joinedload(UserAchievement.achievement))\
-        .filter(UserAchievement.user_id.in_(uids)).all()
-    user_ach_map = defaultdict(set)
-    for row in user_ach_rows: user_ach_map[row.user_id].add(row.achievement_id)
 
-    # 2. Contexto global
-    max_gp_points = max((p.points for p in preds), default=0)
-    leader_stat = db.query(UserStats).order_by(desc(UserStats.current_season_points)).first()
-    leader_gp_points = 0
-    if leader_stat:
-        lp = next((p for p in preds if p.user_id == leader_stat.user_id), None)
-        leader_gp_points = lp.points if lp else 0
+    # 1. Cargas masivas iniciales (una query por tabla)
+    ach_defs = {a.slug: a for a in db.query(Achievement).all()}
+    ach_by_id = {a.id: a for a in ach_defs.values()}
 
+    # Stats de TODOS los usuarios: el líder del mundial puede no haber jugado este GP
+    stats_map = {
+        row.user_id: SimpleNamespace(**row._asdict())
+        for row in db.query(tables.stats.user_id, *[getattr(tables.stats, f) for f in STATS_FIELDS]).order_by(tables.stats.user_id).all()
+    }
+    gp_stats_map = {
+        row.user_id: row
+        for row in db.query(tables.gp_stats.user_id, *[getattr(tables.gp_stats, f) for f in GP_METRIC_FIELDS])
+        .filter(tables.gp_stats.gp_id == gp_id, tables.gp_stats.user_id.in_(uids)).all()
+    }
+    user_ach_map = defaultdict(list)
+    for ua_id, uid, ach_id in db.query(tables.achievements.id, tables.achievements.user_id, tables.achievements.achievement_id)\
+            .filter(tables.achievements.user_id.in_(uids)).all():
+        user_ach_map[uid].append((ua_id, ach_by_id[ach_id]))
+
+    # Líder del mundial antes de aplicar este GP (David vs Goliath compara contra la clasificación previa)
+    leader = max(stats_map.values(), key=lambda s: s.current_season_points or 0, default=None)
+    leader_uid = leader.user_id if leader else None
+
+    # 2. Deltas de stats en memoria
+    new_stats_uids, touched_uids = [], []
+    metrics_map, gp_stats_rows = {}, {}
+    for pred in preds:
+        uid = pred.user_id
+        stats = stats_map.get(uid)
+        if stats is None:
+            stats = stats_map[uid] = _empty_stats(uid)
+            new_stats_uids.append(uid)
+        if not result:
+            continue
+
+        new = metrics_map[uid] = calculate_gp_metrics(pred, result)
+        # Protección de orden cronológico (igual que update_stats_incremental)
+        if stats.last_gp_played_id and gp.id < stats.last_gp_played_id:
+            continue
+
+        apply_gp_metrics(stats, gp, gp_stats_map.get(uid), new)
+        touched_uids.append(uid)
+        gp_stats_rows[uid] = {"user_id": uid, "gp_id": gp.id, **{f: new[f] for f in GP_METRIC_FIELDS}}
+
+    # 3. Contexto global
+    points_by_user = {p.user_id: p.points for p in preds}
     ctx = {
-        "achievements": ach_defs,
-        "user_achievements": user_ach_map,
-        "drivers": {d.code: d for d in db.query(Driver).all()},
+        # Todos los pilotos; con códigos repetidos gana el de menor id (como filter_by().first())
+        "drivers": {d.code: d for d in db.query(Driver).order_by(Driver.id.desc()).all()},
         "team_members": {tm.user_id: tm for tm in db.query(TeamMember).filter(TeamMember.user_id.in_(uids), TeamMember.season_id == gp.season_id).all()},
-        "max_gp_points": max_gp_points,
-        "leader_gp_points": leader_gp_points
+        "max_gp_points": max((p.points for p in preds), default=0),
+        "leader_gp_points": points_by_user.get(leader_uid) or 0,
     }
 
-    # 3. Procesar Usuarios
+    # 4. Conjuntos de logros a conceder y candidatos a revocar
+    dynamic_slugs = get_dynamic_slugs()
+    grants, revoke_candidates = [], []
     for pred in preds:
         uid = pred.user_id
-        stats = update_stats_incremental(db, uid, gp)
-        
-        should_have = check_career_season_achievements(db, uid, stats)
-        should_have.update(check_event_achievements(db, uid, gp, prediction=pred, context=ctx))
-        
+        should_have = check_career_season_achievements(db, uid, stats_map[uid])
+        should_have.update(check_event_achievements(db, uid, gp, prediction=pred, context=ctx, metrics=metrics_map.get(uid)))
+
         # Grant
-        grant_achievements(db, uid, list(should_have), season_id=gp.season_id, gp_id=gp.id, context=ctx)
-        
-        # Revoke (Simplified batch)
-        # Solo verificamos revocación si el logro es dinámico
-        dynamic_slugs = get_dynamic_slugs()
-        user_rows = [r for r in user_ach_rows if r.user_id == uid]
-        for ua in user_rows:
-            ach = ach_defs.get(ua.achievement.slug) if hasattr(ua, 'achievement') else db.query(Achievement).get(ua.achievement_id)
-            slug = ach.slug
-            if slug not in dynamic_slugs: continue
-            if slug not in should_have:
-                if ach.type == AchievementType.EVENT:
-                    if not verify_historical_validity(db, uid, slug):
-                        db.delete(ua)
-                else:
-                    db.delete(ua)
+        owned_ids = {ach.id for _, ach in user_ach_map[uid]}
+        for slug in should_have:
+            ach = ach_defs.get(slug)
+            if not ach or ach.id in owned_ids: continue
+            print(f"🏆 DESBLOQUEADO: {slug}")
+            save_gp = gp.id if ach.type in [AchievementType.EVENT, AchievementType.CAREER] else None
+            grants.append({"user_id": uid, "achievement_id": ach.id, "season_id": gp.season_id, "gp_id": save_gp})
+            owned_ids.add(ach.id)
+
+        # Revoke (Simplified batch): solo logros dinámicos que ya no se cumplen
+        for ua_id, ach in user_ach_map[uid]:
+            if ach.slug in dynamic_slugs and ach.slug not in should_have:
+                revoke_candidates.append((uid, ua_id, ach))
+
+    # Los EVENT solo se revocan si no se cumplen en NINGÚN GP: historial de UserGpStats en una query
+    history = defaultdict(dict)
+    event_uids = {uid for uid, _, ach in revoke_candidates if ach.type == AchievementType.EVENT}
+    if event_uids:
+        for row in db.query(tables.gp_stats.user_id, tables.gp_stats.gp_id, *[getattr(tables.gp_stats, f) for f in GP_METRIC_FIELDS])\
+                .filter(tables.gp_stats.user_id.in_(event_uids)).all():
+            history[row.user_id][row.gp_id] = row
+        for uid in event_uids & gp_stats_rows.keys():
+            history[uid][gp.id] = SimpleNamespace(**gp_stats_rows[uid])
+
+    revoke_ids = [
+        ua_id for uid, ua_id, ach in revoke_candidates
+        if ach.type != AchievementType.EVENT or not is_historically_valid(ach.slug, history[uid].values())
+    ]
+
+    # 5. Escritura masiva
+    if new_stats_uids:
+        db.execute(insert(tables.stats), [vars(stats_map[uid]) for uid in new_stats_uids])
+    inserted = set(new_stats_uids)
+    stats_updates = [vars(stats_map[uid]) for uid in touched_uids if uid not in inserted]
+    if stats_updates:
+        db.execute(update(tables.stats), stats_updates)
+
+    gp_stats_inserts = [row for uid, row in gp_stats_rows.items() if uid not in gp_stats_map]
+    gp_stats_updates = [row for uid, row in gp_stats_rows.items() if uid in gp_stats_map]
+    if gp_stats_inserts:
+        db.execute(insert(tables.gp_stats), gp_stats_inserts)
+    if gp_stats_updates:
+        db.execute(update(tables.gp_stats), gp_stats_updates)
+
+    if revoke_ids:
+        db.query(tables.achievements).filter(tables.achievements.id.in_(revoke_ids)).delete(synchronize_session=False)
+    if grants:
+        db.execute(insert(tables.achievements), grants)
 
     db.commit()
-    print(f"✅ Proceso batch completado para GP {gp_id}")
+    if tables is LIVE_TABLES and refresh_profiles:
+        # Publicación de resultados: se recalculan las métricas de perfil y caduca lo cacheado
+        refresh_radar_metrics(db)
+        bump_data_version(db, stats=True)
+    print(f"✅ Proceso batch completado para GP {gp_id} ({len(grants)} concedidos, {len(revoke_ids)} revocados)")
 
-def evaluate_season_finale_achievements(db: Session, season_id: int):
+def evaluate_season_finale_achievements(db: Session, season_id: int, tables: SimpleNamespace = None):
     """
     Evalúa premios finales aplicando lógica WIPE & ASSIGN.
     1. Borra todos los logros de final de temporada existentes para esa season_id.
     2. Recalcula quién los merece ahora (basado en los stats ya corregidos).
     3. Los otorga de nuevo.
     """
+    tables = tables or LIVE_TABLES
     print(f"🏆 Evaluando Premios Finales Temporada {season_id} (Modo Wipe & Assign)...")
     
     # --- 0. WIPE (LIMPIEZA DE PREMIOS ANTERIORES) ---
@@ -629,9 +814,9 @@ def evaluate_season_finale_achievements(db: Session, season_id: int):
     target_ids = [t[0] for t in target_achs]
     
     if target_ids:
-        deleted_count = db.query(UserAchievement).filter(
-            UserAchievement.season_id == season_id,
-            UserAchievement.achievement_id.in_(target_ids)
+        deleted_count = db.query(tables.achievements).filter(
+            tables.achievements.season_id == season_id,
+            tables.achievements.achievement_id.in_(target_ids)
         ).delete(synchronize_session=False)
         
         db.commit()
@@ -646,94 +831,23 @@ def evaluate_season_finale_achievements(db: Session, season_id: int):
     ach_defs = {a.slug: a for a in db.query(Achievement).all()}
     
     # Pre-cargar logros actuales para el context
-    user_ach_rows = db.query(UserAchievement).filter(UserAchievement.user_id.in_(uids)).all()
+    user_ach_rows = db.query(tables.achievements).filter(tables.achievements.user_id.in_(uids)).all()
     user_ach_map = defaultdict(set)
     for row in user_ach_rows: user_ach_map[row.user_id].add(row.achievement_id)
 
     ctx = {"achievements": ach_defs, "user_achievements": user_ach_map}
 
     # Cargar y ordenar stats una sola vez para el check de finale
-    stats_all = db.query(UserStats)\
-        .filter(UserStats.last_gp_played_id.isnot(None))\
-        .order_by(desc(UserStats.current_season_points))\
+    stats_all = db.query(tables.stats)\
+        .filter(tables.stats.last_gp_played_id.isnot(None))\
+        .order_by(desc(tables.stats.current_season_points))\
         .all()
 
     for user in all_users:
         slugs = check_season_finale_achievements(db, user.id, season_id, stats_all)
         if slugs: 
-            grant_achievements(db, user.id, list(slugs), season_id=season_id, gp_id=None, context=ctx)
+            grant_achievements(db, user.id, list(slugs), season_id=season_id, gp_id=None, context=ctx, tables=tables)
 
     db.commit()
 
     print(f"✅ Evaluación de temporada {season_id} completada.")
-    
-def rebuild_all_achievements(db: Session):
-    """
-    ⚠️ DANGER ZONE: Recalcula TODO desde cero (Stats + Achievements).
-    1. Borra user_stats, user_gp_stats, user_achievements.
-    2. Recorre GPs pasados y ejecuta sync_achievements.
-    3. Al final de cada temporada, ejecuta evaluate_season_finale_achievements.
-    """
-    print("🔥 INICIANDO RECONSTRUCCIÓN TOTAL DE LOGROS Y ESTADÍSTICAS...")
-    
-    # 1. Resetear Tablas
-    db.query(UserAchievement).delete()
-    db.query(UserStats).delete()
-    db.query(UserGpStats).delete()
-    db.commit()
-
-    # 2. Obtener todos los GPs pasados ordenados por fecha
-    from datetime import datetime
-    past_gps = db.query(GrandPrix)\
-        .filter(GrandPrix.race_datetime <= datetime.utcnow())\
-        .order_by(GrandPrix.race_datetime.asc())\
-        .all()
-
-    users = db.query(User).all()
-    user_ids = [u.id for u in users]
-    
-    # Agrupar GPs por temporada para saber cuándo cerrar temporada
-    from collections import defaultdict
-    gps_by_season = defaultdict(list)
-    for gp in past_gps:
-        if gp.race_result: # Solo procesar si tiene resultados
-            gps_by_season[gp.season_id].append(gp)
-
-    # 3. Re-procesar uno a uno cronológicamente
-    # Pero cuidado, si iteramos por seasons separadas podríamos perder orden cronológico inter-season (raro pero posible).
-    # Mejor iterar la lista plana y detectar fin de season.
-    
-    processed_seasons = set()
-    
-    for gp in past_gps:
-        if not gp.race_result: continue
-        
-        print(f"   ⟳ Procesando GP: {gp.name} (Season {gp.season_id})...")
-        
-        # Sincronizar (Stats + Event Achievements)
-        evaluate_race_achievements(db, gp.id)
-            
-        # Check if this is the last GP of the season (that has happened so far)
-        # O si es la última carrera programada de la temporada.
-        # Si la temporada ya acabó, deberíamos cerrar.
-        # Simplificación: Al final de procesar un GP, miramos si era el último de esa season en nuestra lista de 'past_gps'.
-        season_gps = gps_by_season[gp.season_id]
-        if season_gps[-1].id == gp.id:
-            # ¿Ha terminado la temporada?
-            # 1. Obtenemos la temporada
-            season_obj = db.query(Season).filter(Season.id == gp.season_id).first()
-            if not season_obj: continue
-            
-            # 2. Contamos cuántos GPs hay programados en total para esta temporada
-            total_scheduled = db.query(GrandPrix).filter(GrandPrix.season_id == gp.season_id).count()
-            
-            # 3. Solo evaluamos final de temporada si:
-            #    - La temporada ya no está activa (is_active=False)
-            #    - O si ya se han disputado todos los GPs programados
-            if not season_obj.is_active or len(season_gps) >= total_scheduled:
-                print(f"   🏆 Cerrando Temporada {gp.season_id}...")
-                evaluate_season_finale_achievements(db, gp.season_id)
-            else:
-                print(f"   ⏳ Temporada {gp.season_id} ({season_obj.year}) todavía en curso ({len(season_gps)}/{total_scheduled} GPs). Saltando logros de final de temporada.")
-
-    print("✅ RECONSTRUCCIÓN COMPLETADA.")
\ No newline at end of file
@@ -0,0 +1,144 @@
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+
+# Miniaturas cuadradas en WebP, nombradas por el hash del contenido del original:
+# si la imagen cambia cambia la URL, así que se pueden servir como inmutables.
+AVATAR_DIR = "app/static/avatars"
+THUMB_DIR = "app/static/thumbs"
+THUMB_SIZES = (64, 128, 256)
+
+# Pillow suelta el GIL al redimensionar/codificar: bastan unos hilos dedicados
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("AVATAR_THUMB_WORKERS", "2")),
+    thread_name_prefix="thumbs",
+)
+
+# filename -> (mtime_ns, tamaño, hash). Evita releer el archivo en cada ranking.
+_digests = {}
+# hash -> "pending" (en el pool), "ready" (miniaturas en disco) o "failed" (Pillow no pudo).
+# Mientras está pendiente se devuelve None sin volver a leer el original ni encolar otra vez.
+_states = {}
+_lock = threading.Lock()
+
+def content_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:20]
+
+def thumb_name(digest: str, size: int) -> str:
+    return f"{digest}_{size}.webp"
+
+def validate_image(data: bytes):
+    """Lanza ValueError si los bytes no son una imagen que Pillow sepa abrir."""
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.verify()
+    except Exception as e:
+        raise ValueError(f"Imagen no válida: {e}")
+
+def _mark_ready(digest: str):
+    with _lock:
+        _states[digest] = "ready"
+
+def _render(data: bytes, digest: str):
+    """Genera las miniaturas que falten. Idempotente: si ya existen no hace nada."""
+    os.makedirs(THUMB_DIR, exist_ok=True)
+    pending = [s for s in THUMB_SIZES if not os.path.exists(os.path.join(THUMB_DIR, thumb_name(digest, s)))]
+    if not pending:
+        _mark_ready(digest)
+        return digest
+
+    with Image.open(io.BytesIO(data)) as img:
+        img = ImageOps.exif_transpose(img).convert("RGBA")
+        for size in pending:
+            thumb = ImageOps.fit(img, (size, size), Image.LANCZOS)
+            final = os.path.join(THUMB_DIR, thumb_name(digest, size))
+            # Escritura atómica: nunca se sirve una miniatura a medias
+            tmp = f"{final}.{threading.get_ident()}.tmp"
+            thumb.save(tmp, "WEBP", quality=85, method=6)
+            os.replace(tmp, final)
+    # Antes de resolver el Future: quien espera su resultado (la subida) ya ve la miniatura
+    _mark_ready(digest)
+    return digest
+
+def _finished(digest: str, future):
+    if future.exception():
+        with _lock:
+            _states[digest] = "failed"
+
+def submit_thumbnails(data: bytes, digest: str = None):
+    """Encola la generación en el pool. Devuelve el Future (su resultado es el hash)."""
+    digest = digest or content_digest(data)
+    with _lock:
+        _states[digest] = "pending"
+    future = _executor.submit(_render, data, digest)
+    future.add_done_callback(lambda f: _finished(digest, f))
+    return future
+
+def _ensure_thumbnails(data: bytes, digest: str):
+    """Encola las miniaturas si no están ya hechas o en camino (un fallo se reintenta al releer)."""
+    with _lock:
+        if _states.get(digest) in ("pending", "ready"):
+            return
+    if all(os.path.exists(os.path.join(THUMB_DIR, thumb_name(digest, s))) for s in THUMB_SIZES):
+        _mark_ready(digest)
+        return
+    submit_thumbnails(data, digest)
+
+def _file_digest(filename: str):
+    path = os.path.join(AVATAR_DIR, filename)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+
+    with _lock:
+        cached = _digests.get(filename)
+    if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2]
+
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = content_digest(data)
+    with _lock:
+        _digests[filename] = (st.st_mtime_ns, st.st_size, digest)
+    _ensure_thumbnails(data, digest)
+    return digest
+
+def remember(filename: str, digest: str):
+    """Registra el hash de un avatar recién subido (ya tenemos los bytes, no hace falta releerlo)."""
+    path = os.path.join(AVATAR_DIR, filename)
+    st = os.stat(path)
+    with _lock:
+        _digests[filename] = (st.st_mtime_ns, st.st_size, digest)
+
+def forget(filename: str):
+    with _lock:
+        _digests.pop(filename, None)
+
+def warm(filenames):
+    """Calcula hashes y encola miniaturas de los avatares dados (tras sincronizar con disco)."""
+    for filename in filenames:
+        _file_digest(filename)
+
+def thumbnail_url(filename: str, size: int = 64):
+    """
+    Ruta (/static/thumbs/...) de la miniatura de un avatar, o None si todavía no existe
+    (el frontend usa entonces el original). Si falta, se encola su generación una sola vez.
+    """
+    digest = _file_digest(filename or "default.png")
+    if not digest:
+        return None
+    with _lock:
+        ready = _states.get(digest) == "ready"
+    return f"/static/thumbs/{thumb_name(digest, size)}" if ready else None
+
+def thumbnail_urls(filenames, size: int = 64) -> dict:
+    """
+    {filename: thumbnail_url} resolviendo una sola vez cada avatar distinto. Toca disco (stat):
+    desde un endpoint async, llamarla con run_in_threadpool.
+    """
+    return {filename: thumbnail_url(filename, size) for filename in set(filenames)}
@@ -0,0 +1,403 @@
+from sqlalchemy import select, func, case, update, delete, insert, literal, or_, and_
+from sqlalchemy.orm import Session
+
+from app.db.models.user import User
+from app.db.models.bingo import BingoTile, BingoSelection, BingoTileStats, BingoUserCounter
+
+# Contadores del bingo materializados en bingo_tile_stats. El tablero y la clasificación leen
+# una fila por casilla en lugar de contar todas las selecciones de la temporada en cada petición.
+
+MAX_SELECTIONS = 20  # Límite duro del backend para evitar trampas
+
+class SelectionLimitReached(Exception):
+    """El usuario ya tiene MAX_SELECTIONS casillas en la temporada."""
+
+def calculate_tile_value(total_participants: int, selections_count: int) -> int:
+    """
+    Calcula el valor basado en la rareza (Porcentaje).
+    Escala de 10 a 100 puntos independiente del número de usuarios.
+
+    Fórmula:
+    - Ratio = Selecciones / Total
+    - Puntos = 10 + (90 * (1 - Ratio))
+    """
+    if total_participants == 0: return 10
+
+    # Si nadie la ha cogido aún, es una oportunidad de oro (Máximo valor)
+    if selections_count == 0: return 100
+
+    ratio = selections_count / total_participants
+
+    # Invertimos el ratio: cuanto MENOS gente (ratio bajo), MÁS puntos.
+    # (1 - ratio) va de 0.0 (todos la tienen) a 1.0 (nadie la tiene).
+    # Multiplicamos por 90 y sumamos 10 base.
+    # Rango final: [10 ... 100]
+    points = 10 + int(90 * (1 - ratio))
+
+    return points
+
+def season_participants(db: Session, season_id: int) -> int:
+    """Usuarios con alguna casilla elegida en la temporada (mínimo 1, como el cálculo original)."""
+    total = db.scalar(
+        select(func.count()).select_from(BingoUserCounter)
+        .where(BingoUserCounter.season_id == season_id, BingoUserCounter.selections > 0)
+    )
+    return total or 1
+
+def refresh_tile_values(db: Session, season_id: int) -> dict:
+    """
+    Recalcula current_value de las casillas de la temporada (cambia con los participantes).
+    O(casillas): solo escribe las filas cuyo valor cambia. Devuelve {tile_id: (count, value)}.
+    No hace commit.
+    """
+    participants = season_participants(db, season_id)
+    rows = db.execute(
+        select(BingoTileStats.tile_id, BingoTileStats.selection_count, BingoTileStats.current_value)
+        .where(BingoTileStats.season_id == season_id)
+        .order_by(BingoTileStats.tile_id) # Bloqueos siempre en el mismo orden
+    ).all()
+
+    out, changed = {}, []
+    for tile_id, count, value in rows:
+        new_value = calculate_tile_value(participants, count)
+        out[tile_id] = (count, new_value)
+        if new_value != value:
+            changed.append({"tile_id": tile_id, "current_value": new_value})
+    if changed:
+        db.execute(update(BingoTileStats), changed)
+    return out
+
+def add_tile_stats(db: Session, tiles: list):
+    """Fila de contadores a cero para casillas recién creadas (ya con id). No hace commit."""
+    if tiles:
+        db.execute(insert(BingoTileStats), [
+            {"tile_id": t.id, "season_id": t.season_id, "selection_count": 0, "current_value": 100}
+            for t in tiles
+        ])
+
+# --- TOGGLE ATÓMICO ---
+# Orden de bloqueos: contador del usuario -> selección -> contador de la casilla. El contador del
+# usuario serializa los toggles de una misma persona; los de personas distintas solo coinciden
+# en la fila de la casilla, que se toca al final y se suelta con el commit.
+
+def _dialect_insert(db: Session):
+    """insert() con ON CONFLICT del dialecto de la BD (PostgreSQL o SQLite)."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert
+
+def _lock_counter(db: Session, season_id: int, user_id: int) -> int:
+    """
+    Bloquea (FOR UPDATE) el contador del usuario, creándolo a partir de sus selecciones si aún
+    no existe (INSERT ... SELECT ... ON CONFLICT DO NOTHING). Devuelve sus selecciones.
+    """
+    query = (
+        select(BingoUserCounter.selections)
+        .where(BingoUserCounter.season_id == season_id, BingoUserCounter.user_id == user_id)
+        .with_for_update()
+    )
+    selections = db.scalar(query)
+    if selections is None:
+        current = (
+            select(literal(season_id), literal(user_id), func.count())
+            .select_from(BingoSelection)
+            .join(BingoTile)
+            .where(BingoSelection.user_id == user_id, BingoTile.season_id == season_id)
+        )
+        db.execute(
+            _dialect_insert(db)(BingoUserCounter)
+            .from_select(["season_id", "user_id", "selections"], current)
+            .on_conflict_do_nothing()
+        )
+        selections = db.scalar(query)
+    return selections
+
+def _bump_counter(db: Session, season_id: int, user_id: int, delta: int):
+    """
+    selections += delta en un solo UPDATE. Al sumar solo actualiza si queda hueco
+    (selections < MAX_SELECTIONS): devuelve el nuevo valor o None si no lo había.
+    """
+    stmt = (
+        update(BingoUserCounter)
+        .where(BingoUserCounter.season_id == season_id, BingoUserCounter.user_id == user_id)
+        .values(selections=BingoUserCounter.selections + delta)
+        .returning(BingoUserCounter.selections)
+        .execution_options(synchronize_session=False)
+    )
+    if delta > 0:
+        stmt = stmt.where(BingoUserCounter.selections < MAX_SELECTIONS)
+    return db.scalar(stmt)
+
+def _bump_tile(db: Session, tile: BingoTile, delta: int) -> int:
+    """selection_count += delta de la casilla en un solo UPDATE. Devuelve el nuevo contador."""
+    count = db.scalar(
+        update(BingoTileStats)
+        .where(BingoTileStats.tile_id == tile.id)
+        .values(selection_count=BingoTileStats.selection_count + delta)
+        .returning(BingoTileStats.selection_count)
+        .execution_options(synchronize_session=False)
+    )
+    if count is None:
+        # Casilla sin fila (creada antes de existir la tabla): se cuenta desde las selecciones
+        count = db.scalar(select(func.count()).select_from(BingoSelection).where(BingoSelection.bingo_tile_id == tile.id))
+        db.execute(
+            _dialect_insert(db)(BingoTileStats)
+            .values(tile_id=tile.id, season_id=tile.season_id, selection_count=count)
+            .on_conflict_do_nothing()
+        )
+    return count
+
+def toggle_tile(db: Session, user_id: int, tile: BingoTile) -> dict:
+    """
+    Marca o desmarca la casilla en una transacción: DELETE ... RETURNING de la selección y, si no
+    existía, reserva de hueco con el UPDATE condicional del contador + INSERT ... ON CONFLICT DO
+    NOTHING. Devuelve el estado nuevo de la casilla (contador y valor) y el del usuario.
+    Lanza SelectionLimitReached si no quedan huecos.
+    """
+    season_id = tile.season_id
+    _lock_counter(db, season_id, user_id)
+
+    removed = db.execute(
+        delete(BingoSelection)
+        .where(BingoSelection.user_id == user_id, BingoSelection.bingo_tile_id == tile.id)
+        .returning(BingoSelection.bingo_tile_id)
+        .execution_options(synchronize_session=False)
+    ).first()
+
+    if removed:
+        status, delta = "removed", -1
+        selections = _bump_counter(db, season_id, user_id, -1)
+        participants_changed = selections == 0
+    else:
+        status, delta = "added", +1
+        selections = _bump_counter(db, season_id, user_id, +1)
+        if selections is None:
+            db.rollback()
+            raise SelectionLimitReached()
+        inserted = db.execute(
+            _dialect_insert(db)(BingoSelection)
+            .values(user_id=user_id, bingo_tile_id=tile.id)
+            .on_conflict_do_nothing()
+            .returning(BingoSelection.user_id)
+        ).first()
+        if not inserted:
+            # Ya estaba marcada (otra petición simultánea del mismo usuario): deshacer la reserva
+            db.rollback()
+            count, value = db.execute(
+                select(BingoTileStats.selection_count, BingoTileStats.current_value)
+                .where(BingoTileStats.tile_id == tile.id)
+            ).first() or (0, 100)
+            return {
+                "status": "added", "tile_id": tile.id, "selection_count": count, "current_value": value,
+                "my_selections": selections - 1, "max_selections": MAX_SELECTIONS, "values_changed": False,
+            }
+        participants_changed = selections == 1
+
+    count = _bump_tile(db, tile, delta)
+    value = calculate_tile_value(season_participants(db, season_id), count)
+    db.execute(
+        update(BingoTileStats)
+        .where(BingoTileStats.tile_id == tile.id)
+        .values(current_value=value)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+    if participants_changed:
+        # Entra o sale un participante: cambia el valor de todas las casillas. Va en otra
+        # transacción para que el toggle no retenga los bloqueos de toda la temporada.
+        value = refresh_tile_values(db, season_id).get(tile.id, (count, value))[1]
+        db.commit()
+
+    return {
+        "status": status,
+        "tile_id": tile.id,
+        "selection_count": count,
+        "current_value": value,
+        "my_selections": selections,
+        "max_selections": MAX_SELECTIONS,
+        # El resto de casillas ha cambiado de valor: el cliente debe recargar el tablero
+        "values_changed": participants_changed,
+    }
+
+def rebuild_bingo_stats(db: Session, season_id: int = None):
+    """
+    Recalcula bingo_tile_stats y bingo_user_counters desde las selecciones (arranque, y tras
+    borrados que se llevan selecciones por delante: usuarios, casillas, temporadas).
+    """
+    tiles = select(BingoTile.id, BingoTile.season_id)
+    if season_id is not None:
+        tiles = tiles.where(BingoTile.season_id == season_id)
+    tiles = db.execute(tiles).all()
+
+    counts = select(BingoSelection.bingo_tile_id, func.count()).join(BingoTile).group_by(BingoSelection.bingo_tile_id)
+    if season_id is not None:
+        counts = counts.where(BingoTile.season_id == season_id)
+    counts = dict(db.execute(counts).all())
+
+    per_user = (
+        select(BingoTile.season_id, BingoSelection.user_id, func.count())
+        .join(BingoTile)
+        .group_by(BingoTile.season_id, BingoSelection.user_id)
+    )
+    stale_stats, stale_counters = delete(BingoTileStats), delete(BingoUserCounter)
+    if season_id is not None:
+        per_user = per_user.where(BingoTile.season_id == season_id)
+        stale_stats = stale_stats.where(BingoTileStats.season_id == season_id)
+        stale_counters = stale_counters.where(BingoUserCounter.season_id == season_id)
+    per_user = db.execute(per_user).all()
+
+    db.execute(stale_stats)
+    db.execute(stale_counters)
+    if per_user:
+        db.execute(insert(BingoUserCounter), [
+            {"season_id": sid, "user_id": uid, "selections": n} for sid, uid, n in per_user
+        ])
+    if tiles:
+        db.execute(insert(BingoTileStats), [
+            {"tile_id": tid, "season_id": sid, "selection_count": counts.get(tid, 0), "current_value": 100}
+            for tid, sid in tiles
+        ])
+    for sid in {sid for _, sid in tiles}:
+        refresh_tile_values(db, sid)
+    db.commit()
+
+# --- OPERACIONES EN BLOQUE (ADMIN) ---
+
+def import_tiles(db: Session, season_id: int, rows: list) -> dict:
+    """
+    Alta de casillas en bloque: una transacción y un INSERT multi-fila (más sus filas de
+    bingo_tile_stats). Las descripciones vacías o que ya existen en la temporada se saltan.
+    rows: [{"description": str, "is_completed": bool}, ...]
+    """
+    existing = set(db.scalars(select(BingoTile.description).where(BingoTile.season_id == season_id)))
+    new_rows = []
+    for row in rows:
+        description = row["description"].strip()
+        if not description or description in existing:
+            continue
+        existing.add(description)
+        new_rows.append({"season_id": season_id, "description": description, "is_completed": bool(row.get("is_completed"))})
+
+    if new_rows:
+        created = db.execute(insert(BingoTile).returning(BingoTile.id, BingoTile.season_id), new_rows).all()
+        add_tile_stats(db, created)
+    db.commit()
+    return {"inserted": len(new_rows), "skipped": len(rows) - len(new_rows)}
+
+def set_tiles_completed(db: Session, season_id: int, tile_ids: list, is_completed: bool = True) -> int:
+    """Marca (o desmarca) varias casillas de la temporada en un solo UPDATE. Devuelve las filas tocadas."""
+    if not tile_ids:
+        return 0
+    updated = db.execute(
+        update(BingoTile)
+        .where(BingoTile.season_id == season_id, BingoTile.id.in_(tile_ids))
+        .values(is_completed=is_completed)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return updated
+
+# --- LECTURAS ---
+
+def board_tiles_query(season_id: int):
+    """Casillas de la temporada con su contador y valor: O(casillas), sin tocar las selecciones."""
+    return (
+        select(
+            BingoTile.id,
+            BingoTile.description,
+            BingoTile.is_completed,
+            func.coalesce(BingoTileStats.selection_count, 0),
+            func.coalesce(BingoTileStats.current_value, 100),
+        )
+        .outerjoin(BingoTileStats, BingoTileStats.tile_id == BingoTile.id)
+        .where(BingoTile.season_id == season_id)
+        .order_by(BingoTile.id)
+    )
+
+def board_rows(tiles, selected_ids: set) -> list:
+    return [
+        {
+            "id": tid,
+            "description": description,
+            "is_completed": is_completed,
+            "selection_count": count,
+            "current_value": value,
+            "is_selected_by_me": tid in selected_ids,
+        }
+        for tid, description, is_completed, count, value in tiles
+    ]
+
+STANDINGS_FIELDS = ("rank", "user_id", "username", "acronym", "selections_count", "hits", "missed", "total_points")
+STANDINGS_DEFAULT_FIELDS = ("username", "acronym", "selections_count", "hits", "missed", "total_points")
+
+def bingo_standings(db: Session, season_id: int, fields=STANDINGS_DEFAULT_FIELDS, limit: int = None, after: tuple = None) -> list:
+    """
+    Clasificación agregada en la BD: selecciones, aciertos y puntos (valor actual de las casillas
+    acertadas) por usuario. Todos los usuarios aparecen, con 0 si no han jugado.
+    Orden por puntos y user_id; `after` = (rank, user_id) de la última fila ya vista y `limit`
+    filas como mucho. Cada fila trae siempre "rank" y "user_id" (para el cursor) más `fields`.
+    """
+    completed = case((BingoTile.is_completed == True, 1), else_=0)
+    per_user = (
+        select(
+            BingoSelection.user_id,
+            func.count().label("selections"),
+            func.sum(completed).label("hits"),
+            func.sum(case((BingoTile.is_completed == True, func.coalesce(BingoTileStats.current_value, 100)), else_=0)).label("points"),
+        )
+        .join(BingoTile, BingoTile.id == BingoSelection.bingo_tile_id)
+        .outerjoin(BingoTileStats, BingoTileStats.tile_id == BingoTile.id)
+        .where(BingoTile.season_id == season_id)
+        .group_by(BingoSelection.user_id)
+        .subquery()
+    )
+    total_completed = db.scalar(
+        select(func.count()).select_from(BingoTile)
+        .where(BingoTile.season_id == season_id, BingoTile.is_completed == True)
+    ) if "missed" in fields else 0
+
+    points = func.coalesce(per_user.c.points, 0)
+    columns = {
+        "username": User.username,
+        "acronym": User.acronym,
+        "selections_count": func.coalesce(per_user.c.selections, 0),
+        "hits": func.coalesce(per_user.c.hits, 0),
+    }
+    needed = set(fields) | ({"hits"} if "missed" in fields else set())
+    query = (
+        select(User.id.label("user_id"), points.label("total_points"), *[col.label(f) for f, col in columns.items() if f in needed])
+        .outerjoin(per_user, per_user.c.user_id == User.id)
+        .order_by(points.desc(), User.id)
+    )
+    first_rank = 1
+    if after:
+        rank, user_id = after
+        first_rank = rank + 1
+        after_points = db.scalar(select(points).select_from(User).outerjoin(per_user, per_user.c.user_id == User.id).where(User.id == user_id))
+        if after_points is None:
+            query = query.offset(rank) # Usuario borrado entre páginas: seguimos por posición
+        else:
+            query = query.where(or_(points < after_points, and_(points == after_points, User.id > user_id)))
+    if limit:
+        query = query.limit(limit)
+
+    standings = []
+    for i, row in enumerate(db.execute(query).all()):
+        values = {
+            "rank": first_rank + i,
+            "user_id": row.user_id,
+            "total_points": int(row.total_points),
+            **{f: getattr(row, f) for f in columns if f in needed},
+        }
+        if "hits" in values:
+            values["hits"] = int(values["hits"])
+        if "selections_count" in values:
+            values["selections_count"] = int(values["selections_count"])
+        if "missed" in fields:
+            # Oportunidades perdidas: eventos ocurridos - los que acerté
+            values["missed"] = total_completed - values["hits"]
+        standings.append({"rank": values["rank"], "user_id": values["user_id"], **{f: values[f] for f in fields}})
+    return standings
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+# Extracción de lo que la app usa de una sesión de FastF1, con operaciones vectorizadas sobre
+# las columnas justas (nada de iterrows). La usa el proceso de ingesta (services/f1_ingest.py)
+# y el benchmark app/scripts/benchmark_f1_extract.py.
+
+RESULT_COLUMNS = ["Abbreviation", "ClassifiedPosition", "Status"]
+LAP_COLUMNS = ["Driver", "LapNumber", "LapTime", "TrackStatus", "IsPersonalBest"]
+
+# Posición con la que se guarda quien no tiene posición clasificada (fondo de parrilla)
+UNCLASSIFIED_POSITION = 20
+
+DNS_STATUSES = ["did not start", "withdrew", "did not qualify"]
+
+# Códigos de FastF1 'TrackStatus': '1'=Green, '2'=Yellow, '4'=SC, '5'=Red, '6'=VSC, '7'=VSC End
+TRACK_CODES = {"sc": "4", "red": "5", "vsc": "6"}
+
+def prune(frame, columns: list) -> pd.DataFrame:
+    """Copia con solo las columnas que existan de `columns` (sin el resto de datos de FastF1)."""
+    return pd.DataFrame(frame[[c for c in columns if c in frame.columns]])
+
+def classify_results(results: pd.DataFrame) -> list:
+    """
+    Posición e incidencia de cada piloto: "ok" (terminó o clasificado), "dns", "dsq" o "dnf"
+    (sin posición numérica y no es DNS/DSQ: accidente, mecánico...).
+    """
+    raw_pos = results["ClassifiedPosition"].astype(str) # '1', 'R', 'D', 'N/C'
+    status = results["Status"].astype(str)
+    lower = status.str.lower() # 'collision', 'finished', 'did not start'
+
+    numeric = raw_pos.str.isnumeric()
+    finished = lower.eq("finished") | lower.str.startswith("+")
+    dns = ~finished & lower.isin(DNS_STATUSES)
+    dsq = ~finished & ~dns & lower.str.contains("disqualified", regex=False)
+    dnf = ~finished & ~dns & ~dsq & ~numeric
+
+    kind = np.select([dns.to_numpy(), dsq.to_numpy(), dnf.to_numpy()], ["dns", "dsq", "dnf"], default="ok")
+    position = np.where(numeric, pd.to_numeric(raw_pos.where(numeric), errors="coerce"), UNCLASSIFIED_POSITION)
+
+    return [
+        {"Abbreviation": a, "ClassifiedPosition": p, "Status": s, "position": int(n), "kind": k}
+        for a, p, s, n, k in zip(results["Abbreviation"].astype(str), raw_pos, status, position, kind)
+    ]
+
+def _periods(lap_numbers: np.ndarray) -> list:
+    """Vueltas (ordenadas, sin repetir) agrupadas en tramos consecutivos: [[desde, hasta], ...]."""
+    if lap_numbers.size == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(lap_numbers) > 1)
+    starts = np.concatenate(([lap_numbers[0]], lap_numbers[breaks + 1]))
+    ends = np.concatenate((lap_numbers[breaks], [lap_numbers[-1]]))
+    return [[int(a), int(b)] for a, b in zip(starts, ends)]
+
+def fastest_lap_driver(laps: pd.DataFrame):
+    """Piloto de la vuelta más rápida válida (como Laps.pick_fastest: solo mejores personales)."""
+    if "LapTime" not in laps.columns:
+        return None
+    valid = laps["LapTime"].notna()
+    if "IsPersonalBest" in laps.columns:
+        valid &= laps["IsPersonalBest"].fillna(False).astype(bool)
+    if not valid.any():
+        return None
+    return str(laps.loc[laps.loc[valid, "LapTime"].idxmin(), "Driver"])
+
+def track_events(laps: pd.DataFrame) -> dict:
+    """
+    SC, VSC y banderas rojas a partir del TrackStatus de cada vuelta. Una sola agrupación por
+    número de vuelta da, para cada código, en qué vueltas apareció (en cualquier piloto).
+    """
+    if "TrackStatus" not in laps.columns or "LapNumber" not in laps.columns:
+        return {"safety_car": None, "first_sc_lap": None, "vsc_periods": [], "red_flags": 0}
+
+    status = laps["TrackStatus"].astype(str)
+    flags = pd.DataFrame({name: status.str.contains(code, regex=False) for name, code in TRACK_CODES.items()})
+    flags["LapNumber"] = laps["LapNumber"].to_numpy()
+    by_lap = flags.dropna(subset=["LapNumber"]).groupby("LapNumber", sort=True).any()
+    lap_numbers = by_lap.index.to_numpy()
+
+    sc_laps = lap_numbers[by_lap["sc"].to_numpy()]
+    return {
+        "safety_car": bool(flags["sc"].any()),
+        "first_sc_lap": int(sc_laps[0]) if sc_laps.size else None,
+        "vsc_periods": _periods(lap_numbers[by_lap["vsc"].to_numpy()]),
+        "red_flags": len(_periods(lap_numbers[by_lap["red"].to_numpy()])),
+    }
+
+def extract(results: pd.DataFrame, laps) -> dict:
+    """Resultados clasificados y eventos de pista de una sesión (laps=None si no hay vueltas)."""
+    out = {"results": classify_results(prune(results, RESULT_COLUMNS)), "fastest_lap_driver": None}
+    if laps is None:
+        out.update({"safety_car": None, "first_sc_lap": None, "vsc_periods": [], "red_flags": 0})
+        return out
+    laps = prune(laps, LAP_COLUMNS)
+    out["fastest_lap_driver"] = fastest_lap_driver(laps)
+    out.update(track_events(laps))
+    return out
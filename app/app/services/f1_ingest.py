@@ -0,0 +1,180 @@
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+# Ingesta de sesiones de FastF1: la descarga y el análisis de vueltas (pandas) se hacen en un
+# proceso aparte y solo se guarda lo que usa la app, en un JSON pequeño por (año, evento, sesión).
+# Re-sincronizar o re-puntuar lee ese archivo: no vuelve a pasar por el loader de FastF1.
+# Este módulo se importa también en el proceso hijo: nada de modelos ni BD a nivel de módulo.
+
+FASTF1_CACHE_DIR = os.getenv("FASTF1_CACHE_DIR", "cache")
+SESSIONS_DIR = os.getenv("F1_SESSIONS_DIR", os.path.join(FASTF1_CACHE_DIR, "sessions"))
+
+# F1_OFFLINE=1: nunca se llama a FastF1; solo sirven los archivos ya guardados (o grabados como
+# fixtures en F1_SESSIONS_DIR). Para desarrollo y pruebas sin red.
+OFFLINE = os.getenv("F1_OFFLINE") == "1"
+
+# Prefetch automático de las sesiones del fin de semana (desactivado por defecto)
+PREFETCH_ENABLED = os.getenv("F1_PREFETCH") == "1"
+PREFETCH_INTERVAL = int(os.getenv("F1_PREFETCH_INTERVAL", "900"))
+# Margen tras la hora de salida para que FastF1 tenga los datos publicados
+PREFETCH_DELAY = timedelta(minutes=int(os.getenv("F1_PREFETCH_DELAY_MINUTES", "150")))
+
+# Se sube al cambiar lo que guarda parse_session: los archivos viejos se vuelven a descargar
+FORMAT_VERSION = 2
+
+_executor = None
+_executor_lock = threading.Lock()
+
+class SessionNotAvailable(Exception):
+    """La sesión no está guardada y no se puede (o no se debe) descargar."""
+
+def session_key(year: int, event: str, kind: str) -> str:
+    ascii_name = unicodedata.normalize("NFKD", event).encode("ascii", "ignore").decode()
+    slug = re.sub(r"[^a-z0-9]+", "-", ascii_name.lower()).strip("-")
+    return f"{year}_{slug}_{kind}"
+
+def _path(year: int, event: str, kind: str) -> str:
+    return os.path.join(SESSIONS_DIR, f"{session_key(year, event, kind)}.json")
+
+def parse_session(session) -> dict:
+    """Lo que la app usa de una sesión cargada de FastF1 (ver services/f1_extract.py)."""
+    from app.services.f1_extract import extract
+    try:
+        laps = session.laps
+    except Exception:
+        laps = None # Sesión cargada sin vueltas
+    return {
+        "format": FORMAT_VERSION,
+        **extract(session.results, laps),
+        "fetched_at": datetime.utcnow().isoformat(),
+    }
+
+def _store(year: int, event: str, kind: str, data: dict):
+    os.makedirs(SESSIONS_DIR, exist_ok=True)
+    final = _path(year, event, kind)
+    # Escritura atómica: otro proceso nunca lee un archivo a medias
+    tmp = f"{final}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, final)
+
+def read_stored(year: int, event: str, kind: str):
+    try:
+        with open(_path(year, event, kind), encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data if data.get("format") == FORMAT_VERSION else None
+
+def _fetch_and_store(year: int, event: str, kind: str) -> dict:
+    """Se ejecuta en el proceso de ingesta: descarga, analiza y guarda la sesión."""
+    import fastf1
+    os.makedirs(FASTF1_CACHE_DIR, exist_ok=True)
+    fastf1.Cache.enable_cache(FASTF1_CACHE_DIR)
+
+    session = fastf1.get_session(year, event, kind)
+    if kind == "R":
+        # Telemetry=False para ir rápido, pero las vueltas las necesitamos
+        session.load(telemetry=False, weather=False, messages=False)
+    else:
+        session.load()
+    data = parse_session(session)
+    # Sin resultados (FastF1 aún no los ha publicado) no se guarda: el archivo taparía la sesión
+    # buena y ni el prefetch ni la sincronización volverían a descargarla
+    if data["results"]:
+        _store(year, event, kind, data)
+    return data
+
+def _pool() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: el hijo no hereda los hilos ni las conexiones a BD del servidor
+            _executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+def prefetch(year: int, event: str, kind: str):
+    """Encola la descarga en el proceso de ingesta sin esperar. Devuelve el Future."""
+    if OFFLINE:
+        raise SessionNotAvailable("F1_OFFLINE=1: no se descargan sesiones")
+    return _pool().submit(_fetch_and_store, year, event, kind)
+
+def load_session(year: int, event: str, kind: str, refresh: bool = False) -> dict:
+    """
+    Datos de la sesión: del archivo guardado si existe (salvo refresh) o descargados en el proceso
+    de ingesta, esperando a que termine.
+    """
+    if not refresh:
+        data = read_stored(year, event, kind)
+        if data is not None:
+            return data
+    if OFFLINE:
+        raise SessionNotAvailable(f"Sesión {session_key(year, event, kind)} no guardada y F1_OFFLINE=1")
+    return prefetch(year, event, kind).result()
+
+# --- PREFETCH DEL FIN DE SEMANA ---
+
+def gp_sessions(name: str, race_datetime: datetime, season_year: int) -> list:
+    """(año, evento, sesión) de la clasificación y la carrera de un GP, como las pide f1_sync."""
+    from app.services.f1_sync import DB_TO_API_MAP
+    event = DB_TO_API_MAP.get(name, name)
+    # La qualy va por el año de la temporada y la carrera por su fecha
+    return [(season_year, event, "Q"), (race_datetime.year, event, "R")]
+
+def prefetch_missing(sessions: list) -> list:
+    """Encola las sesiones que aún no están guardadas. Devuelve sus claves."""
+    queued = []
+    for year, event, kind in sessions:
+        if read_stored(year, event, kind) is None:
+            prefetch(year, event, kind)
+            queued.append(session_key(year, event, kind))
+    return queued
+
+def prefetch_due_sessions() -> list:
+    """
+    Encola las sesiones (clasificación y carrera) de los GPs disputados en los últimos días que
+    aún no estén guardadas, para que sincronizar el resultado ya no tenga que descargar nada.
+    """
+    from app.db.session import SessionLocal
+    from app.db.models.grand_prix import GrandPrix
+    from app.db.models.season import Season
+
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        gps = (
+            db.query(GrandPrix.name, GrandPrix.race_datetime, Season.year)
+            .join(Season, Season.id == GrandPrix.season_id)
+            .filter(GrandPrix.race_datetime <= now - PREFETCH_DELAY, GrandPrix.race_datetime >= now - timedelta(days=3))
+            .all()
+        )
+    finally:
+        db.close()
+
+    queued = []
+    for name, race_datetime, season_year in gps:
+        queued += prefetch_missing(gp_sessions(name, race_datetime, season_year))
+    if queued:
+        print(f"📡 Prefetch FastF1: {', '.join(queued)}")
+    return queued
+
+def _prefetch_loop():
+    while True:
+        try:
+            prefetch_due_sessions()
+        except Exception as e:
+            print(f"⚠️ Prefetch FastF1: {e}")
+        time.sleep(PREFETCH_INTERVAL)
+
+def start_prefetcher():
+    """Lanza el hilo que revisa periódicamente qué sesiones descargar (si F1_PREFETCH=1)."""
+    if not PREFETCH_ENABLED or OFFLINE:
+        return
+    threading.Thread(target=_prefetch_loop, name="f1-prefetch", daemon=True).start()
@@ -1,6 +1,3 @@
-import fastf1
-import pandas as pd
-import os
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 
@@ -11,16 +8,12 @@ from app.db.models.race_position import RacePosition
 from app.db.models.race_event import RaceEvent
 from app.db.models.driver import Driver
 from app.db.models.season import Season
-from app.db.models.prediction import Prediction
-from app.db.models.multiplier_config import MultiplierConfig
-from app.services.scoring import calculate_prediction_score
+from app.services.scoring import score_and_save_gp
 from app.services.achievements_service import evaluate_race_achievements
-
-# Configuración caché
-CACHE_DIR = 'cache'
-if not os.path.exists(CACHE_DIR):
-    os.makedirs(CACHE_DIR)
-fastf1.Cache.enable_cache(CACHE_DIR)
+from app.services.ranking_snapshot import refresh_season_ranking
+from app.core.response_cache import bump_data_version
+from app.services.f1_ingest import load_session
+from app.services.live_updates import notify_results
 
 DB_TO_API_MAP = {
     "Gran Premio de España": "Spain",
@@ -54,7 +47,7 @@ DB_TO_API_MAP = {
 }
 
 # --- FUNCIÓN 1: Sincronizar QUALY (La que hicimos antes) ---
-def sync_qualy_results(gp_id: int, db: Session):
+def sync_qualy_results(gp_id: int, db: Session, refresh: bool = False):
     gp = db.query(GrandPrix).filter(GrandPrix.id == gp_id).first()
     if not gp:
         return {"success": False, "error": "GP no encontrado"}
@@ -63,21 +56,24 @@ def sync_qualy_results(gp_id: int, db: Session):
     
     try:
         api_name = DB_TO_API_MAP.get(gp.name, gp.name)
-        session = fastf1.get_session(season.year, api_name, 'Q')
-        session.load()
-        
-        results = session.results
-        qualy_order = results['Abbreviation'].tolist()
+        session = load_session(season.year, api_name, 'Q', refresh=refresh)
+        qualy_order = [row['Abbreviation'] for row in session['results']]
         
         gp.qualy_results = qualy_order
         db.commit()
+        bump_data_version(db, season_id=gp.season_id)
         
         return {"success": True, "data": qualy_order}
     except Exception as e:
         print(f"Error syncing qualy: {e}")
         return {"success": False, "error": str(e)}
 
-def sync_race_data_manual(db: Session, gp_id: int):
+def sync_race_data_manual(db: Session, gp_id: int, publish: bool = True, refresh: bool = False):
+    """
+    Guarda el resultado de la carrera a partir de la sesión de FastF1 (ya guardada por la ingesta
+    o descargada ahora; refresh=True fuerza la descarga). Con publish=False se queda ahí: el
+    pipeline de publicación (services/publication.py) hace puntos, logros y cachés.
+    """
     logs = []
     def log(msg):
         logs.append(msg)
@@ -105,17 +101,12 @@ def sync_race_data_manual(db: Session, gp_id: int):
     log(f"🌍 API Target: '{api_name}' ({year})")
 
     try:
-        # 4. Cargar Sesión (IMPORTANTE: Laps=True por defecto)
-        log("⏳ Descargando tiempos de vuelta y telemetría...")
-        session = fastf1.get_session(year, api_name, 'R')
-        
-        # Cargamos datos. Telemetry=False para ir rápido, pero Laps lo necesitamos
-        session.load(telemetry=False, weather=False, messages=False)
-        
-        results = session.results
-        laps = session.laps
+        # 4. Cargar Sesión (guardada por la ingesta; si no, se descarga en el proceso de ingesta)
+        log("⏳ Cargando resultados y tiempos de vuelta...")
+        session = load_session(year, api_name, 'R', refresh=refresh)
+        results = session['results']
 
-        if results.empty:
+        if not results:
             log("❌ Error: Tabla de resultados vacía.")
             return False, logs
 
@@ -139,37 +130,19 @@ def sync_race_data_manual(db: Session, gp_id: int):
         db_drivers = db.execute(select(Driver)).scalars().all()
         known_codes = {d.code for d in db_drivers}
 
-        for i, row in results.iterrows():
+        for row in results:
             acronym = row['Abbreviation']
-            
-            # Datos crudos de FastF1
-            raw_pos = str(row['ClassifiedPosition']) # '1', 'R', 'D', 'N/C'
-            raw_status = str(row['Status']).lower()  # 'collision', 'finished', 'did not start'
-            
-            # --- LÓGICA DE POSICIÓN ---
-            if raw_pos.isnumeric():
-                position = int(raw_pos)
-            else:
-                position = 20 # Fondo de parrilla para ordenar visualmente
-            
-            # --- LÓGICA DE ESTADO (DNF vs DNS vs DSQ) ---
-            # Caso 1: Terminó (o clasificado a +vueltas)
-            if raw_status in ['finished'] or raw_status.startswith('+'):
-                pass # Todo bien, no es incidencia
-            
-            # Caso 2: DNS - No empezó
-            elif raw_status in ['did not start', 'withdrew', 'did not qualify']:
+            # position y kind ya vienen calculados por la ingesta (services/f1_extract.py):
+            # sin posición numérica -> fondo de parrilla; kind: ok / dns / dsq / dnf
+            position = row['position']
+
+            if row['kind'] == 'dns':
                 dns_drivers.append(acronym)
                 log(f"⚠️ {acronym} -> DNS (No empezó)")
-                
-            # Caso 3: DSQ - Descalificado
-            elif 'disqualified' in raw_status:
+            elif row['kind'] == 'dsq':
                 dsq_drivers.append(acronym)
                 log(f"🚫 {acronym} -> DSQ (Descalificado)")
-                
-            # Caso 4: DNF Real (Accidente, Motor, etc.)
-            # Si NO tiene posición numérica y NO es DNS/DSQ, asumimos DNF de carrera
-            elif not raw_pos.isnumeric():
+            elif row['kind'] == 'dnf':
                 dnf_drivers.append(acronym)
                 # Mostramos la razón específica en el log (ej: "Collision")
                 log(f"💥 {acronym} -> DNF ({row['Status']})")
@@ -191,27 +164,20 @@ def sync_race_data_manual(db: Session, gp_id: int):
         events_to_add = []
 
         # 1. VUELTA RÁPIDA
-        try:
-            # pick_fastest devuelve la vuelta más rápida de toda la sesión
-            fastest_lap = laps.pick_fastest()
-            fl_driver = fastest_lap['Driver']
-            
+        fl_driver = session['fastest_lap_driver']
+        if fl_driver:
             events_to_add.append(RaceEvent(
                 race_result_id=new_race_result.id,
                 event_type="FASTEST_LAP",
                 value=fl_driver
             ))
             log(f"🏎️ Vuelta Rápida: {fl_driver}")
-        except Exception:
+        else:
             log("⚠️ No se pudo determinar la vuelta rápida.")
 
-        # 2. SAFETY CAR (SC)
-        try:
-            # FastF1 'TrackStatus': '1'=Green, '2'=Yellow, '4'=SC, '5'=Red, '6'=VSC, '7'=VSC End
-            # Convertimos la columna a string y buscamos el código '4'
-            track_status = laps['TrackStatus'].astype(str)
-            has_sc = track_status.str.contains('4').any()
-            
+        # 2. SAFETY CAR (SC): algún '4' en el TrackStatus de las vueltas
+        has_sc = session['safety_car']
+        if has_sc is not None:
             sc_value = "Yes" if has_sc else "No"
             
             events_to_add.append(RaceEvent(
@@ -220,8 +186,21 @@ def sync_race_data_manual(db: Session, gp_id: int):
                 value=sc_value
             ))
             log(f"⚠️ Safety Car: {sc_value}")
-        except Exception:
-             log("⚠️ No se pudo determinar el Safety Car.")
+        else:
+            log("⚠️ No se pudo determinar el Safety Car.")
+
+        # Detalle de pista (informativo, no puntúa): "SC vuelta 12 | VSC: 20-22, 41-41 | Banderas rojas: 1"
+        track_info = []
+        if session['first_sc_lap']: track_info.append(f"SC vuelta {session['first_sc_lap']}")
+        if session['vsc_periods']: track_info.append("VSC: " + ", ".join(f"{a}-{b}" for a, b in session['vsc_periods']))
+        if session['red_flags']: track_info.append(f"Banderas rojas: {session['red_flags']}")
+        if track_info:
+            events_to_add.append(RaceEvent(
+                race_result_id=new_race_result.id,
+                event_type="TRACK_INFO",
+                value=" | ".join(track_info)
+            ))
+            log(f"🚩 Pista: {' | '.join(track_info)}")
 
         # 3. DNFs (SOLO contamos los abandonos reales en carrera)
         events_to_add.append(RaceEvent(
@@ -261,30 +240,31 @@ def sync_race_data_manual(db: Session, gp_id: int):
         db.add_all(events_to_add)
         db.commit()
 
+        if not publish:
+            log("💾 Resultado guardado.")
+            return True, logs
+
         # ==========================================
         # PARTE C: CÁLCULOS FINALES
         # ==========================================
         log("🏆 Recalculando puntos y logros de usuarios...")
         try:
             # 1. Puntos de Predicciones
-            predictions = db.query(Prediction).filter(Prediction.gp_id == gp.id).all()
-            multipliers = db.query(MultiplierConfig).filter(MultiplierConfig.season_id == gp.season_id).all()
-            
-            for p in predictions:
-                res_score = calculate_prediction_score(p, new_race_result, multipliers)
-                p.points = res_score["final_points"]
-                p.points_base = res_score["base_points"]
-                p.multiplier = res_score["multiplier"]
-            
-            db.commit()
-            log(f"✅ Puntos recalculados para {len(predictions)} predicciones.")
+            scored = score_and_save_gp(db, gp.id, new_race_result, gp.season_id)
+            log(f"✅ Puntos recalculados para {scored} predicciones.")
+
+            refresh_season_ranking(db, gp.season_id)
+            log("✅ Clasificación de la temporada actualizada.")
 
             # 2. Logros
             evaluate_race_achievements(db, gp.id)
             log("✅ Logros actualizados.")
         except Exception as e:
+            db.rollback()
             log(f"⚠️ Error en cálculos finales (puntos/logros): {e}")
 
+        bump_data_version(db, season_id=gp.season_id)
+        notify_results(db, gp)
         log("🎉 Sincronización COMPLETA.")
         return True, logs
 
@@ -0,0 +1,79 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import or_, and_
+from sqlalchemy.orm import Session
+
+from app.db.models.grand_prix import GrandPrix
+from app.db.models.ranking_snapshot import RankingSnapshot
+from app.db.models.achievement import Achievement, UserAchievement
+from app.core.event_hub import publish_season_event
+
+# Diffs compactos que se publican en el canal de la temporada (core/event_hub.py).
+
+def results_diff(db: Session, gp: GrandPrix, since: Optional[datetime] = None) -> dict:
+    """
+    Lo que cambia al publicar el resultado de un GP: posición y puntos de cada usuario en la foto
+    de clasificación de ese GP frente al anterior (solo quien sube, baja o puntúa) y los logros
+    desbloqueados (los del GP y, si se da `since`, los de temporada desde ese momento).
+    """
+    prev_gp_id = (
+        db.query(GrandPrix.id)
+        .filter(GrandPrix.season_id == gp.season_id, GrandPrix.race_datetime < gp.race_datetime)
+        .order_by(GrandPrix.race_datetime.desc())
+        .limit(1)
+        .scalar()
+    )
+    rows = (
+        db.query(RankingSnapshot.gp_id, RankingSnapshot.entity_id, RankingSnapshot.rank,
+                 RankingSnapshot.gp_points, RankingSnapshot.accumulated, RankingSnapshot.played)
+        .filter(
+            RankingSnapshot.season_id == gp.season_id,
+            RankingSnapshot.gp_id.in_([gp.id, prev_gp_id] if prev_gp_id else [gp.id]),
+            RankingSnapshot.entity_type == "users",
+            RankingSnapshot.mode == "total",
+        )
+        .all()
+    )
+    prev_rank = {uid: rank for gp_id, uid, rank, *_ in rows if gp_id == prev_gp_id}
+    ranking = []
+    for gp_id, uid, rank, gp_points, accumulated, played in rows:
+        if gp_id != gp.id:
+            continue
+        before = prev_rank.get(uid)
+        if played or before != rank:
+            ranking.append({"user_id": uid, "rank": rank, "prev_rank": before, "points": int(gp_points), "total": int(accumulated)})
+    ranking.sort(key=lambda r: r["rank"])
+
+    unlocked_filter = UserAchievement.gp_id == gp.id
+    if since is not None:
+        unlocked_filter = or_(unlocked_filter, and_(UserAchievement.season_id == gp.season_id, UserAchievement.unlocked_at >= since))
+    achievements = [
+        {"user_id": uid, "slug": slug, "name": name}
+        for uid, slug, name in (
+            db.query(UserAchievement.user_id, Achievement.slug, Achievement.name)
+            .join(Achievement, Achievement.id == UserAchievement.achievement_id)
+            .filter(unlocked_filter)
+            .all()
+        )
+    ]
+    return {"gp_id": gp.id, "ranking": ranking, "achievements": achievements}
+
+def notify_results(db: Session, gp: GrandPrix, since: Optional[datetime] = None):
+    publish_season_event(gp.season_id, "results", **results_diff(db, gp, since))
+
+def notify_bingo_tiles(season_id: int, tiles: list):
+    """Casillas cambiadas por un admin: [{"id", "is_completed", "description"}, ...]."""
+    publish_season_event(season_id, "bingo_tiles", tiles=tiles)
+
+def notify_bingo_toggle(season_id: int, result: dict):
+    """Nuevo contador y valor de una casilla. reload: cambiaron los valores de todas."""
+    publish_season_event(
+        season_id, "bingo_tile",
+        tile={"id": result["tile_id"], "selection_count": result["selection_count"], "current_value": result["current_value"]},
+        reload=result["values_changed"],
+    )
+
+def notify_bingo_reload(season_id: int):
+    """Altas o bajas de casillas: el tablero entero cambia."""
+    publish_season_event(season_id, "bingo_reload")
@@ -0,0 +1,284 @@
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import update, or_, and_
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.db.models.grand_prix import GrandPrix
+from app.db.models.race_result import RaceResult
+from app.db.models.race_position import RacePosition
+from app.db.models.race_event import RaceEvent
+from app.db.models.publication_job import PublicationJob
+from app.services.scoring import score_and_save_gp
+from app.services.achievements_service import evaluate_race_achievements
+from app.services.radar_metrics import refresh_radar_metrics
+from app.services.ranking_snapshot import refresh_season_ranking
+from app.services.f1_sync import sync_race_data_manual
+from app.services.live_updates import notify_results
+from app.core.response_cache import bump_data_version
+
+# Un job "running" sin latido durante este tiempo se da por huérfano (worker caído) y se reanuda
+STALE_AFTER = timedelta(seconds=int(os.getenv("PUBLICATION_STALE_SECONDS", "900")))
+
+def save_race_result(db: Session, gp_id: int, positions: dict, events: dict) -> RaceResult:
+    """Crea o reemplaza el resultado de un GP (posiciones y eventos). Idempotente."""
+    result = db.query(RaceResult).filter(RaceResult.gp_id == gp_id).first()
+    if not result:
+        result = RaceResult(gp_id=gp_id)
+        db.add(result)
+        db.flush()
+
+    # Borrar posiciones y eventos anteriores
+    db.query(RacePosition).filter(RacePosition.race_result_id == result.id).delete()
+    db.query(RaceEvent).filter(RaceEvent.race_result_id == result.id).delete()
+
+    # En el payload JSON las posiciones llegan como claves de texto
+    for pos, driver in positions.items():
+        db.add(RacePosition(race_result_id=result.id, position=int(pos), driver_name=driver))
+    for event_type, value in events.items():
+        db.add(RaceEvent(race_result_id=result.id, event_type=event_type, value=value))
+
+    db.commit()
+    return result
+
+# --- ETAPAS ---
+# Todas idempotentes: reintentar un job repite sin efectos de más las etapas que no terminaron.
+
+def _persist(db: Session, job: PublicationJob, gp: GrandPrix):
+    if job.source == "fastf1":
+        refresh = bool((job.payload or {}).get("refresh"))
+        success, logs = sync_race_data_manual(db, gp.id, publish=False, refresh=refresh)
+        job.logs = (job.logs or []) + logs
+        if not success:
+            raise RuntimeError(logs[-1] if logs else "Sincronización fallida")
+    else:
+        save_race_result(db, gp.id, job.payload["positions"], job.payload["events"])
+
+def _score(db: Session, job: PublicationJob, gp: GrandPrix):
+    result = db.query(RaceResult).filter(RaceResult.gp_id == gp.id).first()
+    if not result:
+        raise RuntimeError("El GP no tiene resultado")
+    scored = score_and_save_gp(db, gp.id, result, gp.season_id)
+    job.logs = (job.logs or []) + [f"✅ Puntos recalculados para {scored} predicciones."]
+
+def _achievements(db: Session, job: PublicationJob, gp: GrandPrix):
+    # UserStats, UserGpStats y logros van juntos en la misma transacción del batch
+    evaluate_race_achievements(db, gp.id, refresh_profiles=False)
+    job.logs = (job.logs or []) + ["✅ Estadísticas y logros actualizados."]
+
+def _stats(db: Session, job: PublicationJob, gp: GrandPrix):
+    refresh_radar_metrics(db)
+
+def _ranking(db: Session, job: PublicationJob, gp: GrandPrix):
+    refresh_season_ranking(db, gp.season_id)
+    job.logs = (job.logs or []) + ["✅ Clasificación de la temporada actualizada."]
+
+def _cache(db: Session, job: PublicationJob, gp: GrandPrix):
+    # La última: invalidar antes de tener la foto nueva dejaría cachear la vieja con la versión nueva
+    bump_data_version(db, season_id=gp.season_id, stats=True)
+
+def _notify(db: Session, job: PublicationJob, gp: GrandPrix):
+    # Diff en vivo a los clientes conectados al canal de la temporada (GET /events/season/{id})
+    notify_results(db, gp, since=job.started_at)
+
+STAGES = (
+    ("persist", _persist),
+    ("score", _score),
+    ("achievements", _achievements),
+    ("stats", _stats),
+    ("ranking", _ranking),
+    ("cache", _cache),
+    ("notify", _notify),
+)
+
+def job_to_dict(job: PublicationJob) -> dict:
+    stages = job.stages or {}
+    return {
+        "job_id": job.id,
+        "gp_id": job.gp_id,
+        "source": job.source,
+        "status": job.status,
+        "stages": [{"name": name, "status": "pending", **stages.get(name, {})} for name, _ in STAGES],
+        "logs": job.logs or [],
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+def _set_stage(job: PublicationJob, name: str, **values):
+    # Reasignar el dict: SQLAlchemy no detecta cambios dentro de una columna JSON
+    stages = dict(job.stages or {})
+    stages[name] = values
+    job.stages = stages
+    job.heartbeat_at = datetime.utcnow()
+
+class _Heartbeat:
+    """
+    Mantiene vivo el latido mientras corre una etapa. _set_stage solo lo escribe al cambiar de
+    etapa, y una etapa larga (sincronizar FastF1, recalcular la temporada) puede pasar de
+    STALE_AFTER: otro worker vería el job huérfano y lo reclamaría a medias.
+    Sesión propia: la del job tiene la transacción de la etapa abierta.
+    """
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+        self.interval = STALE_AFTER.total_seconds() / 3
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, name=f"publication-heartbeat-{job_id}", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _beat(self):
+        while not self._stop.wait(self.interval):
+            db = SessionLocal()
+            try:
+                db.execute(
+                    update(PublicationJob)
+                    .where(PublicationJob.id == self.job_id, PublicationJob.status == "running")
+                    .values(heartbeat_at=datetime.utcnow())
+                )
+                db.commit()
+            except Exception as e:
+                # Un latido perdido no es grave: el siguiente llega antes de STALE_AFTER
+                db.rollback()
+                print(f"⚠️ Latido de la publicación {self.job_id}: {e}")
+            finally:
+                db.close()
+
+def _claim(db: Session, job_id: int) -> bool:
+    """Marca el job como propio de este worker. Falla si otro proceso lo tiene y sigue vivo."""
+    now = datetime.utcnow()
+    claimed = db.execute(
+        update(PublicationJob)
+        .where(PublicationJob.id == job_id)
+        .where(or_(
+            PublicationJob.status == "pending",
+            and_(PublicationJob.status == "running", PublicationJob.heartbeat_at < now - STALE_AFTER),
+        ))
+        .values(status="running", heartbeat_at=now, error=None)
+    ).rowcount
+    db.commit()
+    return claimed == 1
+
+def run_publication_job(job_id: int):
+    """Ejecuta las etapas pendientes de un job en orden; se para en la primera que falle."""
+    db = SessionLocal()
+    try:
+        if not _claim(db, job_id):
+            return
+        job = db.get(PublicationJob, job_id)
+        job.started_at = job.started_at or datetime.utcnow()
+        gp = db.get(GrandPrix, job.gp_id)
+        if not gp:
+            job.status, job.error, job.finished_at = "failed", "GP no encontrado", datetime.utcnow()
+            db.commit()
+            return
+
+        for name, stage in STAGES:
+            if (job.stages or {}).get(name, {}).get("status") == "done":
+                continue
+            _set_stage(job, name, status="running")
+            db.commit()
+
+            t0 = time.perf_counter()
+            try:
+                with _Heartbeat(job_id):
+                    stage(db, job, gp)
+            except Exception as e:
+                logs = list(job.logs or []) # El rollback descartaría los logs de la etapa
+                db.rollback()
+                job = db.get(PublicationJob, job_id)
+                _set_stage(job, name, status="failed", ms=round((time.perf_counter() - t0) * 1000, 1), error=str(e))
+                job.status, job.error, job.finished_at = "failed", f"{name}: {e}", datetime.utcnow()
+                job.logs = logs + [f"❌ Error en la etapa '{name}': {e}"]
+                db.commit()
+                print(f"❌ Publicación {job_id} (GP {job.gp_id}) falló en '{name}': {e}")
+                return
+
+            _set_stage(job, name, status="done", ms=round((time.perf_counter() - t0) * 1000, 1))
+            db.commit()
+
+        job.status, job.finished_at = "done", datetime.utcnow()
+        job.logs = (job.logs or []) + ["🎉 Publicación COMPLETA."]
+        db.commit()
+        print(f"✅ Publicación {job_id} (GP {job.gp_id}) completada.")
+    finally:
+        db.close()
+
+# --- WORKER ---
+# Un hilo por proceso que procesa los jobs de uno en uno: dos publicaciones a la vez
+# recalcularían las mismas estadísticas globales.
+_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+def _work():
+    while True:
+        job_id = _queue.get()
+        try:
+            run_publication_job(job_id)
+        except Exception as e:
+            print(f"❌ Worker de publicación: {e}")
+        finally:
+            _queue.task_done()
+
+def _ensure_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_work, name="publication-worker", daemon=True)
+            _worker.start()
+
+def enqueue(job_id: int):
+    _ensure_worker()
+    _queue.put(job_id)
+
+def queue_depth() -> int:
+    return _queue.qsize()
+
+def publish_result(db: Session, gp_id: int, source: str, payload: Optional[dict] = None) -> PublicationJob:
+    """Crea el job de publicación y lo encola. La petición HTTP vuelve en cuanto está creado."""
+    job = PublicationJob(gp_id=gp_id, source=source, payload=payload, status="pending", stages={}, logs=[])
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    enqueue(job.id)
+    return job
+
+def retry_job(db: Session, job: PublicationJob) -> PublicationJob:
+    """Vuelve a encolar un job fallido: las etapas ya terminadas se saltan."""
+    job.status, job.error, job.finished_at = "pending", None, None
+    db.commit()
+    enqueue(job.id)
+    return job
+
+def resume_pending_jobs():
+    """Al arrancar: reencola los jobs pendientes o huérfanos (el claim evita repetirlos entre workers)."""
+    db = SessionLocal()
+    try:
+        ids = [
+            job_id for (job_id,) in db.query(PublicationJob.id)
+            .filter(or_(
+                PublicationJob.status == "pending",
+                and_(PublicationJob.status == "running", PublicationJob.heartbeat_at < datetime.utcnow() - STALE_AFTER),
+            ))
+            .order_by(PublicationJob.id)
+            .all()
+        ]
+    finally:
+        db.close()
+    for job_id in ids:
+        enqueue(job_id)
+    if ids:
+        print(f"📬 Reanudando {len(ids)} publicaciones pendientes.")
@@ -0,0 +1,174 @@
+import statistics
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, func
+from sqlalchemy.orm import Session
+
+from app.db.models.user import User
+from app.db.models.grand_prix import GrandPrix
+from app.db.models.race_result import RaceResult
+from app.db.models.race_event import RaceEvent
+from app.db.models.user_stats import UserStats, UserGpStats
+from app.db.models.user_radar_metrics import UserRadarMetrics, GLOBAL_ROW_ID
+from app.services.running_stats import running_mean, running_variance
+
+RADAR_COLUMNS = ("regularity", "commitment", "anticipation", "podium", "vidente")
+ROW_DEFAULTS = {"total_points": 0.0, "races_played": 0, "gold": 0, "silver": 0, "bronze": 0, "momentum": 0, "users_count": 0}
+
+# Índice de rangos por GP: puntos ordenados, así "cuántos sacaron más/menos" es un bisect
+def better_than(sorted_pts: list, pts) -> int:
+    return len(sorted_pts) - bisect_right(sorted_pts, pts)
+
+def worse_than(sorted_pts: list, pts) -> int:
+    return bisect_left(sorted_pts, pts)
+
+def _compute_rows(db: Session) -> list:
+    """Métricas de todos los usuarios en una pasada (misma lógica matemática que tenía /stats/user)."""
+    # 1. DATOS PRELIMINARES GLOBALES (Lectura super rápida)
+    all_users = db.query(User.id, User.created_at).all()
+    user_created_map = {u.id: u.created_at.replace(tzinfo=timezone.utc) if u.created_at else datetime.min.replace(tzinfo=timezone.utc) for u in all_users}
+
+    gps_dates = {
+        gp_id: d.replace(tzinfo=timezone.utc) if d.tzinfo is None else d
+        for gp_id, d in db.query(GrandPrix.id, GrandPrix.race_datetime).all()
+    }
+
+    # Participación por GP para ponderación
+    part_counts = db.query(UserGpStats.gp_id, func.count(UserGpStats.user_id)).group_by(UserGpStats.gp_id).all()
+    gp_participation_map = {gp_id: count for gp_id, count in part_counts}
+
+    # Resultados oficiales (solo necesitamos contar cuántos hubo por carrera para "Vidente")
+    # Vidente = (Aciertos de posiciones + Aciertos de eventos) / (Posibles posiciones + Posibles eventos)
+    # Por defecto, en cada carrera hay 10 posiciones. Los eventos varían, los contamos rápido:
+    race_ev_counts = db.query(RaceResult.gp_id, func.count(RaceEvent.id)).join(RaceEvent, RaceResult.id == RaceEvent.race_result_id).group_by(RaceResult.gp_id).all()
+    gp_events_count = {gp_id: count for gp_id, count in race_ev_counts}
+
+    # 2. Tuplas para lógica rápida
+    # A) UserGpStats para Regularidad, Calidad y Trofeos
+    user_gp_stats = db.query(UserGpStats.user_id, UserGpStats.gp_id, UserGpStats.points, UserGpStats.lead_seconds).all()
+    user_pts_map = {}
+    gp_pts_map = {}
+    for uid, gpid, pts, lead in user_gp_stats:
+        user_pts_map.setdefault(uid, []).append({'gp_id': gpid, 'points': pts, 'lead': lead})
+        gp_pts_map.setdefault(gpid, []).append(pts)
+    for pts_list in gp_pts_map.values():
+        pts_list.sort()
+    # Fechas de los GPs puntuados, ordenadas para contar los posteriores al alta con un bisect
+    scored_dates = sorted(d for gpid, d in gps_dates.items() if gpid in gp_pts_map)
+
+    # B) Regularidad, Anticipación, Vidente y totales: UserStats ya tiene los agregados y los hits
+    user_stats_map = {s.user_id: s for s in db.query(UserStats).all()}
+
+    rows = []
+    for uid, u_created_at in user_created_map.items():
+        u_gps = user_pts_map.get(uid, [])
+        st = user_stats_map.get(uid)
+        if not u_gps and not (st and st.total_gps_played):
+            continue
+        row = {"user_id": uid}
+
+        # 3. RADAR RAW
+        if u_gps:
+            # Regularidad: varianza (Welford en UserStats; sin UserStats, desde el historial)
+            if len(u_gps) < 3:
+                row["regularity"] = 999999
+            elif st:
+                row["regularity"] = running_variance(st, "points")
+            else:
+                row["regularity"] = statistics.variance([x['points'] for x in u_gps])
+
+            # Compromiso: ratio
+            relevant_gps = len(scored_dates) - bisect_right(scored_dates, u_created_at)
+            row["commitment"] = 1.0 if relevant_gps == 0 else len(u_gps) / relevant_gps
+
+            # Anticipación: media de la antelación guardada al puntuar cada GP
+            if st:
+                row["anticipation"] = running_mean(st, "lead")
+            else:
+                deltas = [x['lead'] for x in u_gps if x['lead'] is not None]
+                row["anticipation"] = statistics.mean(deltas) if deltas else 0
+
+            # Calidad: Ponderada por participación
+            pod_scores = []
+            for x in u_gps:
+                total_in_race = gp_participation_map.get(x['gp_id'], 1)
+                rank = better_than(gp_pts_map.get(x['gp_id'], []), x['points']) + 1
+                if total_in_race > 0:
+                    pos_equiv = (rank / total_in_race) * 100
+                    pod_scores.append(100 - pos_equiv)
+                else:
+                    pod_scores.append(0)
+            row["podium"] = statistics.mean(pod_scores) if pod_scores else 0
+
+            # Vidente: Aciertos caché
+            vidente_raw = 0
+            if st:
+                hits = st.exact_positions_count + st.fastest_lap_hits + st.safety_car_hits + st.dnf_count_hits + st.dnf_driver_hits
+                possible = sum((10 + gp_events_count.get(x['gp_id'], 5)) for x in u_gps)
+                vidente_raw = hits / possible if possible > 0 else 0
+            row["vidente"] = vidente_raw
+
+        # 4. PERFIL (solo usuarios con GPs jugados en UserStats, como antes)
+        if st and st.total_gps_played:
+            total_points, races_played = st.total_points, st.total_gps_played
+            avg_points = round(total_points / races_played, 2)
+            row.update(total_points=total_points, races_played=races_played, gold=0, silver=0, bronze=0, momentum=0)
+
+            for x in u_gps:
+                better = better_than(gp_pts_map.get(x['gp_id'], []), x['points'])
+                if better == 0: row["gold"] += 1
+                elif better == 1: row["silver"] += 1
+                elif better == 2: row["bronze"] += 1
+
+            # Mejor carrera
+            best_x = max(u_gps, key=lambda x: x['points']) if u_gps else None
+            if best_x:
+                total_in_race = gp_participation_map.get(best_x['gp_id'], 1)
+                worse = worse_than(gp_pts_map.get(best_x['gp_id'], []), best_x['points'])
+                perc = 100
+                if total_in_race > 1:
+                    perc = 100 - int((worse / (total_in_race - 1)) * 100)
+                row.update(best_gp_id=best_x['gp_id'], best_points=best_x['points'], best_percentile=max(1, perc))
+
+            # Racha
+            for x in reversed(sorted(u_gps, key=lambda x: gps_dates.get(x['gp_id'], datetime.min))):
+                if x['points'] >= avg_points: row["momentum"] += 1
+                else: break
+
+        rows.append(row)
+    return rows
+
+def refresh_radar_metrics(db: Session) -> dict:
+    """
+    Recalcula user_radar_metrics entera (filas de usuario + fila global de mín/máx).
+    Se llama en la etapa "stats" de la publicación de un resultado y tras publicar una reconstrucción.
+    Devuelve lo que tardó para poder seguirlo a medida que crece el número de usuarios.
+    """
+    start = time.perf_counter()
+    rows = _compute_rows(db)
+
+    radar_rows = [r for r in rows if "regularity" in r]
+    global_row = {"user_id": GLOBAL_ROW_ID, "users_count": len(rows)}
+    if radar_rows:
+        for col in RADAR_COLUMNS:
+            values = [r[col] for r in radar_rows]
+            global_row[col] = min(values)
+            global_row[f"{col}_max"] = max(values)
+    compute_ms = round((time.perf_counter() - start) * 1000, 1)
+    global_row.update(compute_ms=compute_ms, computed_at=datetime.utcnow())
+
+    db.query(UserRadarMetrics).delete(synchronize_session=False)
+    # Mismas claves en todas las filas para el INSERT masivo (las que faltan, a NULL o su valor por defecto)
+    keys = {k for r in rows for k in r} | set(global_row) | set(ROW_DEFAULTS)
+    db.execute(insert(UserRadarMetrics), [{k: r.get(k, ROW_DEFAULTS.get(k)) for k in keys} for r in rows + [global_row]])
+    db.commit()
+    print(f"🕸️ Métricas de radar: {len(rows)} usuarios en {compute_ms} ms.")
+    return {"users": len(rows), "compute_ms": compute_ms}
+
+def ensure_radar_metrics(db: Session):
+    """Construye la tabla si todavía no existe la fila global (p.ej. primer arranque tras crearla)."""
+    exists = db.query(UserRadarMetrics.user_id).filter(UserRadarMetrics.user_id == GLOBAL_ROW_ID).first()
+    if not exists:
+        refresh_radar_metrics(db)
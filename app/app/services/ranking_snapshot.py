@@ -0,0 +1,149 @@
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.db.models.grand_prix import GrandPrix
+from app.db.models.race_result import RaceResult
+from app.db.models.prediction import Prediction
+from app.db.models.user import User
+from app.db.models.team import Team
+from app.db.models.team_member import TeamMember
+from app.db.models.ranking_snapshot import RankingSnapshot
+
+RANKING_MODES = ("base", "total", "multiplier")
+
+def neutral_value(mode: str):
+    """Valor de partida de un acumulado (y de un GP sin predicción) según el modo."""
+    return 1.0 if mode == "multiplier" else 0
+
+def as_mode_number(mode: str, value):
+    """Los modos base/total son enteros; la columna Float los devuelve como 5.0."""
+    return value if mode == "multiplier" else int(value)
+
+def _gp_value(mode: str, preds) -> float:
+    """Puntos de una entidad en un GP a partir de sus predicciones (1 para usuarios, N para equipos)."""
+    if mode == "multiplier":
+        value = 1.0
+        for p in preds:
+            value *= p.multiplier
+        return value
+    if mode == "base":
+        return sum(p.points_base for p in preds)
+    return sum(p.points for p in preds)
+
+def _build_rows(season_id, entity_type, entity_ids, gp_ids, preds_of):
+    """
+    Recorre los GPs en orden cronológico acumulando como hacía /stats/ranking.
+    preds_of(entity_id, gp_id) -> lista de predicciones de esa entidad en ese GP.
+    """
+    rows = []
+    for mode in RANKING_MODES:
+        acc = {e: neutral_value(mode) for e in entity_ids}
+
+        for gp_id in gp_ids:
+            gp_entries = []
+            for e in entity_ids:
+                preds = preds_of(e, gp_id)
+                gp_points = neutral_value(mode)
+                if preds:
+                    gp_points = _gp_value(mode, preds)
+                    if mode == "multiplier":
+                        acc[e] *= gp_points
+                    else:
+                        acc[e] += gp_points
+                gp_entries.append((e, gp_points, bool(preds)))
+
+            # Orden estable: empates en el orden de entity_ids (igual que el sort original)
+            gp_entries.sort(key=lambda x: round(acc[x[0]], 4), reverse=True)
+            for rank, (e, gp_points, played) in enumerate(gp_entries, start=1):
+                rows.append({
+                    "season_id": season_id,
+                    "gp_id": gp_id,
+                    "entity_type": entity_type,
+                    "entity_id": e,
+                    "mode": mode,
+                    "gp_points": gp_points,
+                    "accumulated": acc[e],
+                    "rank": rank,
+                    "played": played,
+                })
+    return rows
+
+def refresh_season_ranking(db: Session, season_id: int, entity_types=("users", "teams")):
+    """
+    Regenera la foto de clasificación de toda la temporada (usuarios y equipos, los 3 modos).
+    Se llama una vez cada vez que se puntúa un GP: un GP corregido cambia los acumulados
+    de todos los posteriores, así que se reescribe la temporada entera con un número fijo de queries.
+    Tras un cambio de plantilla basta con entity_types=("teams",): los puntos de un equipo salen
+    de sus miembros actuales.
+    """
+    gp_ids = [
+        gp_id for (gp_id,) in db.query(GrandPrix.id)
+        .filter(GrandPrix.season_id == season_id)
+        .order_by(GrandPrix.race_datetime)
+        .all()
+    ]
+    completed = {
+        gp_id for (gp_id,) in db.query(RaceResult.gp_id).filter(RaceResult.gp_id.in_(gp_ids)).all()
+    } if gp_ids else set()
+    completed_gp_ids = [gp_id for gp_id in gp_ids if gp_id in completed]
+
+    preds_map = {}
+    if completed_gp_ids:
+        preds = (
+            db.query(Prediction.user_id, Prediction.gp_id, Prediction.points_base, Prediction.points, Prediction.multiplier)
+            .filter(Prediction.gp_id.in_(completed_gp_ids))
+            .all()
+        )
+        for p in preds:
+            preds_map[(p.user_id, p.gp_id)] = p
+
+    rows = []
+    if "users" in entity_types:
+        user_ids = [uid for (uid,) in db.query(User.id).order_by(User.id).all()]
+
+        def user_preds(uid, gp_id):
+            p = preds_map.get((uid, gp_id))
+            return [p] if p else []
+
+        rows += _build_rows(season_id, "users", user_ids, completed_gp_ids, user_preds)
+
+    if "teams" in entity_types:
+        team_ids = [tid for (tid,) in db.query(Team.id).filter(Team.season_id == season_id).order_by(Team.id).all()]
+        team_members = {}
+        for team_id, user_id in db.query(TeamMember.team_id, TeamMember.user_id).filter(TeamMember.team_id.in_(team_ids)).all():
+            team_members.setdefault(team_id, []).append(user_id)
+
+        def team_preds(team_id, gp_id):
+            return [preds_map[(uid, gp_id)] for uid in team_members.get(team_id, []) if (uid, gp_id) in preds_map]
+
+        rows += _build_rows(season_id, "teams", team_ids, completed_gp_ids, team_preds)
+
+    db.query(RankingSnapshot).filter(
+        RankingSnapshot.season_id == season_id,
+        RankingSnapshot.entity_type.in_(entity_types),
+    ).delete(synchronize_session=False)
+    if rows:
+        db.execute(insert(RankingSnapshot), rows)
+    db.commit()
+    print(f"📸 Ranking snapshot temporada {season_id}: {len(completed_gp_ids)} GPs, {len(rows)} filas.")
+
+def refresh_all_rankings(db: Session):
+    """Regenera la foto de todas las temporadas que la tienen (p.ej. tras borrar un usuario)."""
+    for (season_id,) in db.query(RankingSnapshot.season_id).distinct().all():
+        refresh_season_ranking(db, season_id)
+
+def build_missing_rankings(db: Session):
+    """
+    Arranque: construye la foto de las temporadas con GPs puntuados que aún no la tienen (p.ej.
+    puntuadas antes de existir la tabla). Las lecturas nunca la construyen: sin GPs puntuados la
+    foto está vacía y /stats/ranking lo resuelve sin escribir.
+    """
+    built = {season_id for (season_id,) in db.query(RankingSnapshot.season_id).distinct().all()}
+    scored = {
+        season_id for (season_id,) in db.query(GrandPrix.season_id)
+        .join(RaceResult, RaceResult.gp_id == GrandPrix.id)
+        .distinct()
+        .all()
+    }
+    for season_id in sorted(scored - built):
+        refresh_season_ranking(db, season_id)
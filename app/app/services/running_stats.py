@@ -0,0 +1,68 @@
+from datetime import timezone
+
+# Agregados en streaming (Welford) que UserStats mantiene por prefijo:
+# <prefijo>_count, <prefijo>_mean y <prefijo>_m2 (suma de cuadrados de las desviaciones).
+# "points": puntos por GP (Regularidad) y "lead": antelación de la predicción en segundos (Anticipación).
+RUNNING_PREFIXES = ("points", "lead")
+RUNNING_FIELDS = tuple(f"{p}_{s}" for p in RUNNING_PREFIXES for s in ("count", "mean", "m2"))
+
+def _get(stats, prefix: str):
+    # Un UserStats recién creado no tiene los defaults del modelo hasta el flush
+    return (
+        getattr(stats, f"{prefix}_count") or 0,
+        getattr(stats, f"{prefix}_mean") or 0.0,
+        getattr(stats, f"{prefix}_m2") or 0.0,
+    )
+
+def _set(stats, prefix: str, count: int, mean: float, m2: float):
+    setattr(stats, f"{prefix}_count", count)
+    setattr(stats, f"{prefix}_mean", mean)
+    setattr(stats, f"{prefix}_m2", m2)
+
+def running_add(stats, prefix: str, x: float):
+    count, mean, m2 = _get(stats, prefix)
+    count += 1
+    delta = x - mean
+    mean += delta / count
+    m2 += delta * (x - mean)
+    _set(stats, prefix, count, mean, m2)
+
+def running_remove(stats, prefix: str, x: float):
+    """Deshace un running_add(x) anterior (re-puntuar un GP resta su valor viejo)."""
+    count, mean, m2 = _get(stats, prefix)
+    if count <= 1:
+        _set(stats, prefix, 0, 0.0, 0.0)
+        return
+    count -= 1
+    delta = x - mean
+    mean -= delta / count
+    # Los errores de redondeo no pueden dejar una suma de cuadrados negativa
+    m2 = max(0.0, m2 - delta * (x - mean))
+    _set(stats, prefix, count, mean, m2)
+
+def running_mean(stats, prefix: str) -> float:
+    count, mean, _ = _get(stats, prefix)
+    return mean if count else 0
+
+def running_variance(stats, prefix: str) -> float:
+    """Varianza muestral (n - 1), como statistics.variance."""
+    count, _, m2 = _get(stats, prefix)
+    return m2 / (count - 1) if count >= 2 else 0.0
+
+def prediction_lead_seconds(prediction, gp):
+    """Segundos entre la última edición de la predicción y la salida (0 si se editó después)."""
+    if not gp or not gp.race_datetime or not prediction.updated_at:
+        return None
+    gp_date = gp.race_datetime.replace(tzinfo=timezone.utc) if gp.race_datetime.tzinfo is None else gp.race_datetime
+    p_date = prediction.updated_at.replace(tzinfo=timezone.utc) if prediction.updated_at.tzinfo is None else prediction.updated_at
+    return max(0, (gp_date - p_date).total_seconds())
+
+def rebuild_running(stats, points: list, leads: list):
+    """Recalcula los agregados desde cero a partir del historial (backfill)."""
+    for prefix in RUNNING_PREFIXES:
+        _set(stats, prefix, 0, 0.0, 0.0)
+    for x in points:
+        running_add(stats, "points", x)
+    for x in leads:
+        if x is not None:
+            running_add(stats, "lead", x)
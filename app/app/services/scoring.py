@@ -1,3 +1,10 @@
+import numpy as np
+from sqlalchemy import update, values, column, Integer, Float
+from sqlalchemy.orm import Session, selectinload
+
+from app.db.models.prediction import Prediction
+from app.db.models.multiplier_config import MultiplierConfig
+
 def get_podium_drivers(positions_list):
     """
     Extrae los pilotos en las posiciones 1, 2 y 3.
@@ -142,3 +149,190 @@ def calculate_prediction_score(
         "final_points": final_points,
         "correct_events": correct_events
     }
+
+
+# ==============================================================================
+# PUNTUACIÓN EN LOTE (TODO UN GP DE GOLPE)
+# ==============================================================================
+
+def _accepted_event_values(race_events):
+    """
+    Precalcula, por tipo de evento, qué valores de predicción cuentan como acierto.
+    Misma lógica que get_correct_events, pero hecha una sola vez por GP.
+    """
+    real_events = build_event_map(race_events)
+    accepted = {}
+
+    real_dnf_list = [x.strip() for x in str(real_events.get("DNF_DRIVER", "")).split(",")]
+    real_dnf_list = [x for x in real_dnf_list if x]
+    # Realidad vacía -> solo acierta la predicción vacía
+    accepted["DNF_DRIVER"] = set(real_dnf_list) if real_dnf_list else {""}
+
+    for event_type, value in real_events.items():
+        if event_type != "DNF_DRIVER":
+            accepted[event_type] = {str(value)}
+
+    return accepted
+
+def score_gp_batch(race_result, predictions, multiplier_configs):
+    """
+    Puntúa todas las predicciones de un GP a la vez.
+    El resultado real (mapa de posiciones, eventos, lista de DNFs, podio) se precalcula una vez
+    y las predicciones se evalúan con arrays de NumPy (una fila por posición/evento predicho).
+    Devuelve una lista alineada con `predictions` con los mismos valores que calculate_prediction_score.
+    """
+    n = len(predictions)
+    if n == 0:
+        return []
+
+    # --- 1. Resultado real (una sola vez) ---
+    # Índice 0 reservado para None (posición sin piloto): nunca puntúa ni completa podio
+    driver_index = {None: 0}
+    real_map = build_real_positions_map(race_result.positions)
+    for driver in real_map:
+        driver_index.setdefault(driver, len(driver_index))
+    real_podium = [driver_index[d] if d is not None else -1 for d in get_podium_drivers(race_result.positions)]
+    accepted = _accepted_event_values(race_result.events)
+
+    config_cols = {}
+    for mc in multiplier_configs:
+        config_cols.setdefault(mc.event_type, len(config_cols))
+
+    # --- 2. Aplanar predicciones (una fila por posición / evento predicho) ---
+    pos_lists = [p.positions for p in predictions]
+    flat_pos = [pp for plist in pos_lists for pp in plist]
+    pos_pred = np.repeat(np.arange(n), np.fromiter(map(len, pos_lists), dtype=np.int64, count=n))
+    pos_value = np.fromiter((pp.position for pp in flat_pos), dtype=np.int64, count=len(flat_pos))
+    names = [pp.driver_name for pp in flat_pos]
+    for name in set(names):
+        driver_index.setdefault(name, len(driver_index))
+    pos_driver = np.fromiter(map(driver_index.__getitem__, names), dtype=np.int64, count=len(names))
+
+    ev_lists = [p.events for p in predictions]
+    ev_pred = np.repeat(np.arange(n), np.fromiter(map(len, ev_lists), dtype=np.int64, count=n))
+    ev_values = [
+        (pe.event_type, str(pe.value) if pe.value is not None else "")
+        for elist in ev_lists for pe in elist
+    ]
+    pair_index = {pair: i for i, pair in enumerate(set(ev_values))}
+    ev_pair = np.fromiter(map(pair_index.__getitem__, ev_values), dtype=np.int64, count=len(ev_values))
+
+    # --- 3. Puntos base: |posición predicha - real| ---
+    # real_pos[d] = posición real del piloto d (0 = no está en el resultado, se ignora)
+    real_pos = np.zeros(len(driver_index), dtype=np.int64)
+    for driver, position in real_map.items():
+        if position:
+            real_pos[driver_index[driver]] = position
+
+    real = real_pos[pos_driver]
+    diff = np.abs(pos_value - real)
+    pts = np.where(real != 0, np.where(diff == 0, 3, np.where(diff == 1, 1, 0)), 0)
+    base_points = np.bincount(pos_pred, weights=pts, minlength=n).astype(np.int64)
+
+    # --- 4. Eventos acertados: matriz predicción × evento configurado ---
+    hits = np.zeros((n, len(config_cols)), dtype=bool)
+    if len(ev_pair) and config_cols:
+        pairs = list(pair_index)
+        pair_hit = np.array([value in accepted.get(event_type, ()) for event_type, value in pairs], dtype=bool)
+        pair_col = np.array([config_cols.get(event_type, -1) for event_type, _ in pairs], dtype=np.int64)
+        mask = pair_hit[ev_pair] & (pair_col[ev_pair] >= 0)
+        hits[ev_pred[mask], pair_col[ev_pair][mask]] = True
+
+    # --- 5. Podio automático: matriz predicción × [P1, P2, P3] ---
+    pred_podium = np.full((n, 3), -1, dtype=np.int64)
+    on_podium = (pos_value >= 1) & (pos_value <= 3)
+    pred_podium[pos_pred[on_podium], pos_value[on_podium] - 1] = pos_driver[on_podium]
+    pred_podium[pred_podium == 0] = -1
+
+    complete = (pred_podium >= 0).all(axis=1) & (-1 not in real_podium)
+    podium_total = complete & (pred_podium == np.asarray(real_podium)).all(axis=1)
+    real_set = set(real_podium)
+    podium_partial = complete & np.isin(pred_podium, list(real_set)).all(axis=1)
+    for d in real_set:
+        podium_partial &= (pred_podium == d).any(axis=1)
+
+    if "PODIUM_TOTAL" in config_cols:
+        hits[:, config_cols["PODIUM_TOTAL"]] |= podium_total
+    if "PODIUM_PARTIAL" in config_cols:
+        hits[:, config_cols["PODIUM_PARTIAL"]] |= podium_partial & ~podium_total
+
+    # --- 6. Multiplicador (mismo orden de productos que calculate_multiplier) ---
+    multiplier = np.ones(n, dtype=np.float64)
+    for mc in multiplier_configs:
+        col = hits[:, config_cols[mc.event_type]]
+        multiplier = np.where(col, multiplier * mc.multiplier, multiplier)
+
+    final_points = (base_points * multiplier).astype(np.int64)
+
+    return [
+        {"base_points": b, "multiplier": m, "final_points": f}
+        for b, m, f in zip(base_points.tolist(), multiplier.tolist(), final_points.tolist())
+    ]
+
+
+# ==============================================================================
+# PERSISTENCIA DE PUNTUACIONES (UPDATE MASIVO)
+# ==============================================================================
+
+# Filas por sentencia en el UPDATE ... FROM (VALUES ...) de PostgreSQL
+BULK_UPDATE_CHUNK = 10000
+
+def bulk_update_prediction_scores(db: Session, rows: list[dict]):
+    """
+    Escribe points / points_base / multiplier de muchas predicciones a la vez.
+    - PostgreSQL: un único UPDATE ... FROM (VALUES ...) por bloque de BULK_UPDATE_CHUNK filas.
+    - Resto (SQLite): UPDATE por clave primaria con executemany.
+    No hace commit.
+    """
+    if not rows:
+        return
+
+    if db.bind.dialect.name == "postgresql":
+        for start in range(0, len(rows), BULK_UPDATE_CHUNK):
+            chunk = rows[start:start + BULK_UPDATE_CHUNK]
+            scores = values(
+                column("id", Integer),
+                column("points", Integer),
+                column("points_base", Integer),
+                column("multiplier", Float),
+                name="scores"
+            ).data([(r["id"], r["points"], r["points_base"], r["multiplier"]) for r in chunk])
+
+            db.execute(
+                update(Prediction)
+                .where(Prediction.id == scores.c.id)
+                .values(points=scores.c.points, points_base=scores.c.points_base, multiplier=scores.c.multiplier)
+                .execution_options(synchronize_session=False)
+            )
+    else:
+        db.execute(update(Prediction), rows)
+
+def score_and_save_gp(db: Session, gp_id: int, race_result, season_id: int) -> int:
+    """
+    Paso común de puntuación de un GP (admin, FastF1 y /scoring):
+    carga las predicciones del GP, las puntúa en lote y las guarda con un UPDATE masivo.
+    Devuelve el número de predicciones puntuadas.
+    """
+    predictions = (
+        db.query(Prediction)
+        # selectinload: un JOIN con dos colecciones devolvería posiciones × eventos filas por predicción
+        .options(selectinload(Prediction.positions), selectinload(Prediction.events))
+        .filter(Prediction.gp_id == gp_id)
+        .all()
+    )
+    multipliers = db.query(MultiplierConfig).filter(MultiplierConfig.season_id == season_id).all()
+
+    scores = score_gp_batch(race_result, predictions, multipliers)
+    rows = [
+        {
+            "id": prediction.id,
+            "points": score["final_points"],
+            "points_base": score["base_points"],
+            "multiplier": score["multiplier"]
+        }
+        for prediction, score in zip(predictions, scores)
+    ]
+
+    bulk_update_prediction_scores(db, rows)
+    db.commit()
+    return len(rows)
@@ -1,14 +1,17 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
 
-# IMPORTANTE: Importar Base y Engine para que funcione la creación de tablas
-from app.db.session import engine, Base, SessionLocal 
-from app.api.avatars import sync_avatars_from_disk
-
 # Importar modelos para que SQLAlchemy los "vea" antes de crear las tablas
 from app.db.models import _all 
+from app.core.bootstrap import run_bootstrap
+from app.core.static_files import ImmutableStaticFiles
+from app.core.response_cache import ResponseCacheMiddleware
+from app.services.publication import resume_pending_jobs
+from app.services.f1_ingest import start_prefetcher
 
 # Importar las rutas (los routers)
 from app.api.auth import router as auth_router
@@ -22,35 +25,35 @@ from app.api.teams import router as teams_router
 from app.api.bingo import router as bingo_router
 from app.api.avatars import router as avatars_router
 from app.api.achievements import router as achievements_router
+from app.api.events import router as events_router
+
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Tablas, secuencias, avatares y logros: una vez por despliegue y fuera del import
+    # (ver app/core/bootstrap.py). Se ejecuta en un hilo para no bloquear el event loop.
+    await run_in_threadpool(run_bootstrap)
+    # Publicaciones de resultados que quedaron a medias (reinicio o worker caído)
+    await run_in_threadpool(resume_pending_jobs)
+    # Descarga anticipada de las sesiones de FastF1 del fin de semana (F1_PREFETCH=1)
+    start_prefetcher()
+    yield
 
 app = FastAPI(
     title="Mundial de Porras F1",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # 👇 CREAR CARPETAS SI NO EXISTEN
 os.makedirs("app/static/avatars", exist_ok=True)
+os.makedirs("app/static/thumbs", exist_ok=True)
 
 # 👇 MONTAR LA CARPETA ESTÁTICA
+# Las miniaturas van por hash de contenido: caché inmutable (se monta antes que /static)
+app.mount("/static/thumbs", ImmutableStaticFiles(directory="app/static/thumbs"), name="thumbs")
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
-# Creamos las tablas en la base de datos
-Base.metadata.create_all(bind=engine)
-
-# 👇 SINCRONIZAR AVATARES Y LOGROS DESDE DISCO AL INICIO
-from app.api.achievements import seed_achievements
-from app.api.avatars import sync_avatars_from_disk
-from app.db.db_utils import sync_all_sequences
-
-db = SessionLocal()
-try:
-    sync_all_sequences(db)
-    sync_avatars_from_disk(db)
-    seed_achievements(db)
-finally:
-    db.close()
-
 # Conectamos las piezas (routers)
 app.include_router(auth_router)
 app.include_router(grand_prix_router)
@@ -63,7 +66,11 @@ app.include_router(teams_router)
 app.include_router(bingo_router)
 app.include_router(avatars_router)
 app.include_router(achievements_router)
+app.include_router(events_router)
+
 
+# ETag/304 y caché de respuestas de las lecturas por temporada (dentro de CORS: se añade antes)
+app.add_middleware(ResponseCacheMiddleware)
 
 # Configuramos el permiso para que React pueda hablar con Python
 app.add_middleware(
@@ -72,6 +79,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Cabeceras propias que el frontend necesita leer (cursor de paginación, export del bingo)
+    expose_headers=["X-Next-Cursor", "X-Row-Count", "X-Elapsed-Ms"],
 )
 
 @app.get("/")
@@ -0,0 +1,25 @@
+import os
+import tempfile
+
+import pytest
+
+# Antes de importar la app: BD SQLite temporal y FastF1 sin red, leyendo solo las sesiones
+# grabadas en tests/fixtures/sessions (ver services/f1_ingest.py)
+_tmp_dir = tempfile.mkdtemp(prefix="porras-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/test.db"
+os.environ["F1_OFFLINE"] = "1"
+os.environ["F1_SESSIONS_DIR"] = os.path.join(os.path.dirname(__file__), "fixtures", "sessions")
+
+from app.db.session import Base, SessionLocal, engine # noqa: E402
+from app.db.models import _all # noqa: E402,F401  Registra todos los modelos
+
+@pytest.fixture
+def db():
+    """Sesión sobre una BD vacía (tablas creadas de cero en cada test)."""
+    Base.metadata.create_all(engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(engine)
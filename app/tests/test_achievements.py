@@ -0,0 +1,47 @@
+from datetime import datetime
+
+from app.db.models.achievement import Achievement, AchievementRarity, AchievementType, UserAchievement
+from app.db.models.grand_prix import GrandPrix
+from app.db.models.prediction import Prediction
+from app.db.models.prediction_event import PredictionEvent
+from app.db.models.race_event import RaceEvent
+from app.db.models.race_result import RaceResult
+from app.db.models.season import Season
+from app.db.models.user import User
+from app.db.models.user_stats import UserStats
+from app.services.achievements_service import evaluate_race_achievements
+
+def _unlocked(db, slug):
+    return {
+        uid for (uid,) in db.query(UserAchievement.user_id).join(Achievement, Achievement.id == UserAchievement.achievement_id)
+        .filter(Achievement.slug == slug).all()
+    }
+
+def test_david_goliath_uses_leader_before_the_gp(db):
+    season = Season(year=2025, name="2025", is_active=True)
+    db.add(season)
+    db.flush()
+    leader, chaser = (User(email=f"{n}@test.local", username=n, hashed_password="x") for n in ("leader", "chaser"))
+    gp = GrandPrix(name="GP", race_datetime=datetime(2025, 3, 1), season_id=season.id)
+    db.add_all([leader, chaser, gp])
+    db.add(Achievement(slug="event_david_goliath", name="David vs Goliath", description="x2 pts del Líder.", icon="TrendingUp",
+                       rarity=AchievementRarity.LEGENDARY, type=AchievementType.EVENT))
+    db.flush()
+    result = RaceResult(gp_id=gp.id, events=[RaceEvent(event_type="DNFS", value="2")])
+    # Con este GP el perseguidor pasa a liderar (110 vs 105): el líder de referencia es el previo
+    preds = [
+        Prediction(user_id=uid, gp_id=gp.id, points_base=points, multiplier=1.0, points=points,
+                   events=[PredictionEvent(event_type="DNFS", value="1")])
+        for uid, points in ((leader.id, 5), (chaser.id, 20))
+    ]
+    db.add_all([
+        result, *preds,
+        UserStats(user_id=leader.id, total_points=100, current_season_points=100),
+        UserStats(user_id=chaser.id, total_points=90, current_season_points=90),
+    ])
+    db.commit()
+
+    evaluate_race_achievements(db, gp.id, refresh_profiles=False)
+
+    assert _unlocked(db, "event_david_goliath") == {chaser.id}
+    assert db.get(UserStats, chaser.id).current_season_points == 110
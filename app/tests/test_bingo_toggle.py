@@ -0,0 +1,124 @@
+import random
+
+import pytest
+from sqlalchemy import select, func
+
+from app.db.models.bingo import BingoTile, BingoSelection, BingoTileStats, BingoUserCounter
+from app.db.models.season import Season
+from app.db.models.user import User
+from app.db.session import SessionLocal
+from app.services import bingo_stats
+from app.services.bingo_stats import (
+    MAX_SELECTIONS, SelectionLimitReached, add_tile_stats, rebuild_bingo_stats, toggle_tile
+)
+
+def _setup(db, n_tiles=MAX_SELECTIONS + 5, n_users=3):
+    season = Season(year=2025, name="2025", is_active=True)
+    db.add(season)
+    db.flush()
+    tiles = [BingoTile(season_id=season.id, description=f"Casilla {i}") for i in range(n_tiles)]
+    users = [User(email=f"u{i}@test.local", username=f"u{i}", hashed_password="x") for i in range(n_users)]
+    db.add_all(tiles + users)
+    db.flush()
+    add_tile_stats(db, tiles)
+    db.commit()
+    return season, tiles, users
+
+def _counter(db, season_id, user_id):
+    return db.scalar(
+        select(BingoUserCounter.selections)
+        .where(BingoUserCounter.season_id == season_id, BingoUserCounter.user_id == user_id)
+    )
+
+def _selected(db, user_id):
+    return db.scalar(select(func.count()).select_from(BingoSelection).where(BingoSelection.user_id == user_id))
+
+def _stats(db, season_id):
+    counters = dict(db.execute(
+        select(BingoUserCounter.user_id, BingoUserCounter.selections)
+        .where(BingoUserCounter.season_id == season_id, BingoUserCounter.selections > 0)
+    ).all())
+    tiles = {
+        tile_id: (count, value) for tile_id, count, value in db.execute(
+            select(BingoTileStats.tile_id, BingoTileStats.selection_count, BingoTileStats.current_value)
+            .where(BingoTileStats.season_id == season_id)
+        ).all()
+    }
+    return counters, tiles
+
+def test_selection_cap(db):
+    season, tiles, users = _setup(db)
+    user = users[0]
+
+    for i, tile in enumerate(tiles[:MAX_SELECTIONS], start=1):
+        result = toggle_tile(db, user.id, tile)
+        assert result["status"] == "added"
+        assert result["my_selections"] == i
+
+    extra = tiles[MAX_SELECTIONS]
+    with pytest.raises(SelectionLimitReached):
+        toggle_tile(db, user.id, extra)
+
+    # La reserva fallida no deja rastro: ni selección, ni contador de más, ni casilla contada
+    assert _counter(db, season.id, user.id) == MAX_SELECTIONS
+    assert _selected(db, user.id) == MAX_SELECTIONS
+    assert db.get(BingoTileStats, extra.id).selection_count == 0
+
+    # Desmarcar libera un hueco
+    assert toggle_tile(db, user.id, tiles[0])["status"] == "removed"
+    assert toggle_tile(db, user.id, extra)["my_selections"] == MAX_SELECTIONS
+
+def test_double_add_race_releases_reservation(db, monkeypatch):
+    season, tiles, users = _setup(db)
+    user, tile = users[0], tiles[0]
+    toggle_tile(db, user.id, tiles[1])
+
+    # Otra petición del mismo usuario marca la casilla (y hace commit, con su propia sesión)
+    # entre el DELETE de esta, que no encontró nada, y su INSERT. SQLite bloquea la BD desde el
+    # DELETE, así que se confirma antes esa transacción (vacía) para abrir el hueco, como en
+    # PostgreSQL cuando las dos peticiones no coinciden en el bloqueo del contador.
+    real_bump = bingo_stats._bump_counter
+    raced = []
+    def bump_after_concurrent_toggle(db, season_id, user_id, delta):
+        if not raced:
+            raced.append(True)
+            db.commit()
+            other = SessionLocal()
+            try:
+                assert toggle_tile(other, user_id, other.get(BingoTile, tile.id))["status"] == "added"
+            finally:
+                other.close()
+        return real_bump(db, season_id, user_id, delta)
+    monkeypatch.setattr(bingo_stats, "_bump_counter", bump_after_concurrent_toggle)
+
+    result = toggle_tile(db, user.id, tile)
+
+    assert raced
+    assert result["status"] == "added"
+    assert result["my_selections"] == 2
+    assert result["values_changed"] is False
+    db.expire_all()
+    # La selección de la otra petición sigue ahí, la reserva de esta se ha devuelto
+    assert db.get(BingoSelection, (user.id, tile.id)) is not None
+    assert _counter(db, season.id, user.id) == _selected(db, user.id) == 2
+    assert db.get(BingoTileStats, tile.id).selection_count == 1
+
+def test_counters_match_rebuild(db):
+    season, tiles, users = _setup(db, n_tiles=30, n_users=6)
+    rng = random.Random(7)
+    for _ in range(400):
+        try:
+            toggle_tile(db, rng.choice(users).id, rng.choice(tiles))
+        except SelectionLimitReached:
+            pass
+
+    incremental = _stats(db, season.id)
+    per_user = dict(db.execute(
+        select(BingoSelection.user_id, func.count()).group_by(BingoSelection.user_id)
+    ).all())
+    assert incremental[0] == per_user
+    assert max(per_user.values()) <= MAX_SELECTIONS
+
+    rebuild_bingo_stats(db, season.id)
+
+    assert _stats(db, season.id) == incremental
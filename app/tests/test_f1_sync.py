@@ -0,0 +1,72 @@
+import sys
+import types
+from datetime import datetime
+
+from app.db.models.grand_prix import GrandPrix
+from app.db.models.race_event import RaceEvent
+from app.db.models.race_position import RacePosition
+from app.db.models.race_result import RaceResult
+from app.db.models.season import Season
+from app.services import f1_ingest
+from app.services.f1_sync import sync_race_data_manual
+
+def _gp(db, name="Monaco Grand Prix", race_datetime=datetime(2025, 5, 25, 13, 0)):
+    season = Season(year=2025, name="2025", is_active=True)
+    db.add(season)
+    db.flush()
+    gp = GrandPrix(name=name, race_datetime=race_datetime, season_id=season.id)
+    db.add(gp)
+    db.commit()
+    return gp
+
+def test_offline_sync_reads_recorded_session(db):
+    assert f1_ingest.OFFLINE
+    gp = _gp(db)
+
+    success, logs = sync_race_data_manual(db, gp.id, publish=False)
+
+    assert success, logs
+    result = db.query(RaceResult).filter(RaceResult.gp_id == gp.id).one()
+    positions = {
+        p.driver_name: p.position
+        for p in db.query(RacePosition).filter(RacePosition.race_result_id == result.id)
+    }
+    assert len(positions) == 20
+    assert positions["NOR"] == 1 and positions["LEC"] == 2
+    assert positions["ALO"] == positions["GAS"] == 20 # DNF: fondo de parrilla
+
+    events = {
+        e.event_type: e.value
+        for e in db.query(RaceEvent).filter(RaceEvent.race_result_id == result.id)
+    }
+    assert events["FASTEST_LAP"] == "NOR"
+    assert events["SAFETY_CAR"] == "Yes"
+    assert events["DNFS"] == "2"
+    assert events["DNF_DRIVER"] == "ALO, GAS"
+    assert events["TRACK_INFO"] == "SC vuelta 1 | VSC: 37-38"
+
+def test_offline_sync_without_recorded_session_fails_cleanly(db):
+    gp = _gp(db, name="Dutch Grand Prix", race_datetime=datetime(2025, 8, 31, 13, 0))
+
+    success, logs = sync_race_data_manual(db, gp.id, publish=False)
+
+    assert not success
+    assert "F1_OFFLINE=1" in logs[-1]
+    assert db.query(RaceResult).count() == 0
+
+def test_session_without_results_is_not_stored(tmp_path, monkeypatch):
+    # FastF1 falso: la sesión carga pero todavía no tiene resultados publicados
+    session = types.SimpleNamespace(load=lambda **kwargs: None)
+    fastf1 = types.SimpleNamespace(
+        Cache=types.SimpleNamespace(enable_cache=lambda path: None),
+        get_session=lambda year, event, kind: session,
+    )
+    monkeypatch.setitem(sys.modules, "fastf1", fastf1)
+    monkeypatch.setattr(f1_ingest, "FASTF1_CACHE_DIR", str(tmp_path / "fastf1"))
+    monkeypatch.setattr(f1_ingest, "SESSIONS_DIR", str(tmp_path / "sessions"))
+    monkeypatch.setattr(f1_ingest, "parse_session", lambda s: {"format": f1_ingest.FORMAT_VERSION, "results": []})
+
+    data = f1_ingest._fetch_and_store(2025, "Netherlands", "R")
+
+    assert data["results"] == []
+    assert f1_ingest.read_stored(2025, "Netherlands", "R") is None
@@ -0,0 +1,147 @@
+import random
+from datetime import datetime, timedelta
+
+from app.db.models.grand_prix import GrandPrix
+from app.db.models.prediction import Prediction
+from app.db.models.race_result import RaceResult
+from app.db.models.ranking_snapshot import RankingSnapshot
+from app.db.models.season import Season
+from app.db.models.team import Team
+from app.db.models.team_member import TeamMember
+from app.db.models.user import User
+from app.services.ranking_snapshot import RANKING_MODES, refresh_season_ranking
+
+def _season(db, rng):
+    season = Season(year=2025, name="2025", is_active=True)
+    db.add(season)
+    db.flush()
+    users = [User(email=f"u{i}@test.local", username=f"u{i}", hashed_password="x") for i in range(12)]
+    # Orden de las fechas distinto del de los ids: la foto va por race_datetime
+    gps = [
+        GrandPrix(name=f"GP {i}", race_datetime=datetime(2025, 3, 1) + timedelta(days=7 * d), season_id=season.id)
+        for i, d in enumerate([2, 0, 3, 1, 5, 4])
+    ]
+    teams = [Team(name=f"Equipo {i}", season_id=season.id, join_code=f"CODE{i}") for i in range(4)]
+    db.add_all(users + gps + teams)
+    db.flush()
+
+    for i, user in enumerate(users[:10]): # Los dos últimos no están en ningún equipo
+        db.add(TeamMember(team_id=teams[i % 3].id, user_id=user.id, season_id=season.id)) # El 4º equipo, vacío
+
+    for gp in gps[:4]: # Los dos últimos GPs aún no tienen resultado
+        db.add(RaceResult(gp_id=gp.id))
+    for gp in gps:
+        for user in users[:-1]: # El último usuario nunca predice
+            if rng.random() < 0.75:
+                base = rng.randint(0, 12)
+                multiplier = rng.choice([1.0, 1.0, 1.25, 1.5, 2.0, 3.0])
+                db.add(Prediction(user_id=user.id, gp_id=gp.id, points_base=base, multiplier=multiplier, points=int(base * multiplier)))
+    db.commit()
+    return season
+
+def _old_ranking(db, season_id, entity_type, mode):
+    """Lo que calculaba /stats/ranking antes de la foto: recorrer GPs y entidades acumulando."""
+    gps = db.query(GrandPrix).filter(GrandPrix.season_id == season_id).order_by(GrandPrix.race_datetime).all()
+    completed = {gp_id for (gp_id,) in db.query(RaceResult.gp_id).all()}
+    if entity_type == "users":
+        entities = [(u.id, [u.id]) for u in db.query(User).all()]
+    else:
+        entities = [(t.id, [m.user_id for m in t.members]) for t in db.query(Team).filter(Team.season_id == season_id).all()]
+
+    acc = {e: 1.0 if mode == "multiplier" else 0 for e, _ in entities}
+    by_gp = {}
+    for gp in gps:
+        ranking = []
+        for e, member_ids in entities:
+            preds = db.query(Prediction).filter(Prediction.user_id.in_(member_ids), Prediction.gp_id == gp.id).all()
+            gp_points = 1.0 if mode == "multiplier" else 0
+            if preds and gp.id in completed:
+                if mode == "base":
+                    gp_points = sum(p.points_base for p in preds)
+                    acc[e] += gp_points
+                elif mode == "total":
+                    gp_points = sum(p.points for p in preds)
+                    acc[e] += gp_points
+                else:
+                    for p in preds:
+                        gp_points *= p.multiplier
+                    acc[e] *= gp_points
+            ranking.append((e, gp_points, round(acc[e], 4)))
+        ranking.sort(key=lambda x: x[2], reverse=True)
+        if gp.id in completed:
+            by_gp[gp.id] = ranking
+    return by_gp
+
+def test_snapshot_matches_old_ranking(db):
+    season = _season(db, random.Random(3))
+
+    refresh_season_ranking(db, season.id)
+
+    for entity_type in ("users", "teams"):
+        for mode in RANKING_MODES:
+            rows = (
+                db.query(RankingSnapshot)
+                .filter(RankingSnapshot.season_id == season.id, RankingSnapshot.entity_type == entity_type, RankingSnapshot.mode == mode)
+                .order_by(RankingSnapshot.rank)
+                .all()
+            )
+            snapshot = {}
+            for r in rows:
+                snapshot.setdefault(r.gp_id, []).append((r.entity_id, r.gp_points, round(r.accumulated, 4)))
+
+            old = _old_ranking(db, season.id, entity_type, mode)
+            assert snapshot == old, (entity_type, mode)
+
+def _team_points(db, season_id):
+    """Acumulado total de cada equipo en el último GP de la foto."""
+    last = (
+        db.query(RankingSnapshot.gp_id)
+        .join(GrandPrix, GrandPrix.id == RankingSnapshot.gp_id)
+        .filter(RankingSnapshot.season_id == season_id)
+        .order_by(GrandPrix.race_datetime.desc())
+        .first()
+    )
+    return {
+        r.entity_id: r.accumulated for r in db.query(RankingSnapshot).filter(
+            RankingSnapshot.season_id == season_id, RankingSnapshot.gp_id == last.gp_id,
+            RankingSnapshot.entity_type == "teams", RankingSnapshot.mode == "total",
+        )
+    }
+
+def test_roster_changes_refresh_team_ranking(db):
+    from app.api.admin import add_team_member, delete_user, remove_team_member
+
+    season = Season(year=2025, name="2025", is_active=True)
+    db.add(season)
+    db.flush()
+    a, b = User(email="a@test.local", username="a", hashed_password="x"), User(email="b@test.local", username="b", hashed_password="x")
+    gp = GrandPrix(name="GP", race_datetime=datetime(2025, 3, 1), season_id=season.id)
+    team = Team(name="T", season_id=season.id, join_code="T1")
+    db.add_all([a, b, gp, team])
+    db.flush()
+    db.add_all([
+        TeamMember(team_id=team.id, user_id=a.id, season_id=season.id),
+        RaceResult(gp_id=gp.id),
+        Prediction(user_id=a.id, gp_id=gp.id, points_base=10, points=10),
+        Prediction(user_id=b.id, gp_id=gp.id, points_base=7, points=7),
+    ])
+    db.commit()
+    refresh_season_ranking(db, season.id)
+    assert _team_points(db, season.id) == {team.id: 10}
+
+    add_team_member(team.id, b.id, current_user=None, db=db)
+    assert _team_points(db, season.id) == {team.id: 17}
+
+    remove_team_member(team.id, a.id, current_user=None, db=db)
+    assert _team_points(db, season.id) == {team.id: 7}
+
+    # Borrar un usuario lo saca de la foto de usuarios (sin huecos en los puestos).
+    # delete_user no borra en cascada: antes se quitan sus predicciones y su plantilla
+    db.query(Prediction).filter(Prediction.user_id == b.id).delete()
+    db.query(TeamMember).filter(TeamMember.user_id == b.id).delete()
+    db.commit()
+    delete_user(b.id, current_user=None, db=db)
+    users = db.query(RankingSnapshot.entity_id, RankingSnapshot.rank).filter(
+        RankingSnapshot.entity_type == "users", RankingSnapshot.mode == "total"
+    ).all()
+    assert users == [(a.id, 1)]
@@ -0,0 +1,54 @@
+import random
+
+import pytest
+
+from app.scripts.benchmark_scoring import MULTIPLIERS, MockObj, build_predictions, build_race
+from app.services.scoring import calculate_prediction_score, score_gp_batch
+
+def _positions(*drivers):
+    return [MockObj(position=i, driver_name=d) for i, d in enumerate(drivers, start=1)]
+
+def _events(**values):
+    return [MockObj(event_type=k, value=v) for k, v in values.items()]
+
+def _configs(pairs=MULTIPLIERS):
+    return [MockObj(event_type=t, multiplier=m) for t, m in pairs]
+
+def _assert_same(race, predictions, configs):
+    batch = score_gp_batch(race, predictions, configs)
+    assert len(batch) == len(predictions)
+    for prediction, got in zip(predictions, batch):
+        expected = calculate_prediction_score(prediction, race, configs)
+        assert (got["base_points"], got["multiplier"], got["final_points"]) == \
+               (expected["base_points"], expected["multiplier"], expected["final_points"])
+
+@pytest.mark.parametrize("seed", range(5))
+def test_batch_matches_per_prediction_on_random_gps(seed):
+    random.seed(seed)
+    race = build_race()
+    _assert_same(race, build_predictions(300, race), _configs())
+
+def test_batch_matches_per_prediction_on_edge_cases():
+    race = MockObj(
+        positions=_positions("VER", "NOR", "LEC", "PIA", "HAM"),
+        events=_events(FASTEST_LAP="NOR", SAFETY_CAR="Yes", DNFS="0", DNF_DRIVER=""),
+    )
+    predictions = [
+        MockObj(positions=[], events=[]), # Predicción vacía
+        MockObj(positions=_positions("VER", "NOR", "LEC"), events=_events(DNF_DRIVER="")), # Podio exacto, sin DNFs
+        MockObj(positions=_positions("LEC", "VER", "NOR"), events=_events(DNF_DRIVER=None)), # Podio desordenado
+        MockObj(positions=_positions("VER", "VER", "NOR"), events=[]), # Piloto repetido
+        MockObj(positions=_positions("VER", None, "LEC"), events=[]), # Hueco en el podio
+        MockObj(positions=_positions("BOT", "ZHO", "SAR"), events=_events(SAFETY_CAR="No", DNFS="0")), # Pilotos fuera del resultado
+        MockObj(positions=_positions("NOR", "VER"), events=_events(FASTEST_LAP="NOR", UNKNOWN="x")), # Evento sin multiplicador
+    ]
+    configs = _configs(MULTIPLIERS + [("SAFETY_CAR", 2.0)]) # Dos configuraciones para el mismo evento
+    _assert_same(race, predictions, configs)
+
+    # Resultado incompleto (sin P3) y sin evento DNF_DRIVER
+    short_race = MockObj(positions=_positions("VER", "NOR"), events=_events(SAFETY_CAR="No"))
+    _assert_same(short_race, predictions, configs)
+
+def test_batch_without_predictions():
+    random.seed(0)
+    assert score_gp_batch(build_race(), [], _configs()) == []
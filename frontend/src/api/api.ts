@@ -9,6 +9,12 @@ export const getAvatarFullUrl = (filename: string | null | undefined) => {
   return `${BASE_URL}/static/avatars/${filename}`.replace(/(^|[^:])\/\//g, "$1/");
 };
 
+// Miniatura (avatar_thumb de ranking/standings); si aún no existe, el original
+export const getAvatarThumbUrl = (thumb: string | null | undefined, filename: string | null | undefined) => {
+  if (thumb) return `${BASE_URL}${thumb}`;
+  return getAvatarFullUrl(filename);
+};
+
 // ✅ Configuración de AXIOS
 const client = axios.create({
   baseURL: BASE_URL,
@@ -243,6 +249,23 @@ export const deleteDriver = async (id: number) => {
 // ⚙️ ADMIN - RESULTADOS DE CARRERA
 // ==========================================
 
+// La publicación de un resultado (puntos, logros, clasificación...) va en segundo plano:
+// el backend devuelve un job y aquí esperamos a que termine consultando su estado.
+export const getPublication = async (jobId: number) => {
+  const res = await client.get(`/admin/publications/${jobId}`);
+  return res.data;
+};
+
+export const waitForPublication = async (jobId: number, intervalMs = 1000, timeoutMs = 300000) => {
+  const deadline = Date.now() + timeoutMs;
+  while (Date.now() < deadline) {
+    const job = await getPublication(jobId);
+    if (job.status === "done" || job.status === "failed") return job;
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+  throw new Error("La publicación sigue en curso. Revisa su estado más tarde.");
+};
+
 export const saveRaceResult = async (
   gpId: number,
   positions: Record<number, string>,
@@ -250,7 +273,9 @@ export const saveRaceResult = async (
 ) => {
   // Enviamos positions y events en el body
   const res = await client.post(`/admin/results/${gpId}`, { positions, events });
-  return res.data;
+  const job = await waitForPublication(res.data.job_id);
+  if (job.status === "failed") throw new Error(job.error || "Error publicando resultados");
+  return job;
 };
 
 export const getRaceResult = async (gpId: number) => {
@@ -260,7 +285,8 @@ export const getRaceResult = async (gpId: number) => {
 
 export const syncRaceData = async (gpId: number) => {
   const res = await client.post(`/admin/gps/${gpId}/sync`);
-  return res.data; // Devolverá { success: true, logs: [...] }
+  const job = await waitForPublication(res.data.job_id);
+  return { success: job.status === "done", logs: job.logs }; // { success: true, logs: [...] }
 };
 
 export const syncQualyData = async (gpId: number) => {
@@ -379,6 +405,29 @@ export const updateBingoTile = async (id: number, data: { description?: string;
   return res.data;
 };
 
+// Operaciones en bloque (admin): import/export JSON o CSV y marcado de varias casillas
+export const exportBingoTiles = async (season_id?: number, format: "json" | "csv" = "json") => {
+  const params = season_id ? { season_id, format } : { format };
+  const res = await client.get("/bingo/tiles/export", { params, responseType: format === "csv" ? "text" : "json" });
+  return res.data;
+};
+
+export const importBingoTiles = async (
+  tiles: { description: string; is_completed?: boolean }[] | string,
+  season_id?: number
+) => {
+  const params = season_id ? { season_id } : {};
+  // Un string se envía como CSV tal cual (p.ej. el contenido de un fichero exportado)
+  const headers = typeof tiles === "string" ? { "Content-Type": "text/csv" } : undefined;
+  const res = await client.post("/bingo/tiles/import", typeof tiles === "string" ? tiles : { tiles }, { params, headers });
+  return res.data;
+};
+
+export const completeBingoTiles = async (tile_ids: number[], is_completed = true, season_id?: number) => {
+  const res = await client.post("/bingo/tiles/complete", { tile_ids, is_completed, season_id });
+  return res.data;
+};
+
 export const deleteBingoTile = async (id: number) => {
   const res = await client.delete(`/bingo/tile/${id}`);
   return res.data;
@@ -407,6 +456,26 @@ export const getUserBingoBoard = async (userId: number) => {
   return res.data;
 };
 
+// ==========================================
+// 📡 EVENTOS EN VIVO (SSE)
+// ==========================================
+
+// Diffs de la temporada (results, bingo_tile, bingo_tiles, bingo_reload, resync).
+// EventSource no admite cabeceras: el token va en la query. Devuelve la función para cerrar.
+export const subscribeSeasonEvents = (seasonId: number, onEvent: (event: any) => void) => {
+  const token = localStorage.getItem("token") || "";
+  const source = new EventSource(`${BASE_URL}/events/season/${seasonId}?token=${encodeURIComponent(token)}`);
+  source.onmessage = (e) => {
+    try {
+      onEvent(JSON.parse(e.data));
+    } catch (err) {
+      console.error("Evento no válido", err);
+    }
+  };
+  // Si se corta, EventSource reconecta solo (retry que manda el servidor)
+  return () => source.close();
+};
+
 // ==========================================
 // 🖼️ AVATARES Y PERFIL
 // ==========================================
@@ -503,3 +572,8 @@ export const rebuildAllAchievements = async () => {
   const res = await client.post("/admin/panic/rebuild-achievements");
   return res.data;
 };
+
+export const getRebuildJob = async (jobId: number) => {
+  const res = await client.get(`/admin/panic/rebuild-achievements/${jobId}`);
+  return res.data;
+};
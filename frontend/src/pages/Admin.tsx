@@ -841,7 +841,7 @@ const GPsTab = ({ selectedSeasonId, setIsUpdating, toast, showConfirm, API }: an
                         toast("Resultados guardados y puntos calculados ✅", "success");
                         await loadGps();
                       } catch (err: any) {
-                        const msg = err.response?.data?.detail || "Error al guardar resultados";
+                        const msg = err.response?.data?.detail || err.message || "Error al guardar resultados";
                         toast(msg, "error");
                       } finally {
                         setIsUpdating(false);
@@ -1191,7 +1191,13 @@ const PanicTab = ({ setIsUpdating, toast, API }: any) => {
     setIsUpdating(true);
 
     try {
-      await (API as any).rebuildAllAchievements();
+      // La reconstrucción corre en segundo plano: consultamos el progreso hasta que termine
+      let job = await (API as any).rebuildAllAchievements();
+      while (job.status === "pending" || job.status === "running") {
+        await new Promise(resolve => setTimeout(resolve, 2000));
+        job = await (API as any).getRebuildJob(job.job_id);
+      }
+      if (job.status === "failed") throw new Error(job.error || "La reconstrucción ha fallado");
       const msg = "✅ Reconstrucción completada correctamente.";
       setFeedback({ type: "success", msg });
       toast(msg, "success");
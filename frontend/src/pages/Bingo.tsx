@@ -28,6 +28,7 @@ const Bingo: React.FC = () => {
     const [isOpen, setIsOpen] = useState(false);
     const [showHelp, setShowHelp] = useState(false);
     const [status, setStatus] = useState<"preseason" | "closed" | "admin_force_open">("closed");
+    const [seasonId, setSeasonId] = useState<number | null>(null);
 
     useEffect(() => {
         if (token) {
@@ -44,6 +45,25 @@ const Bingo: React.FC = () => {
         loadData();
     }, []);
 
+    // Cambios de otros usuarios y del admin en vivo, sin recargar el tablero entero
+    useEffect(() => {
+        if (!seasonId) return;
+        return API.subscribeSeasonEvents(seasonId, (event) => {
+            if (event.type === "bingo_tile" && !event.reload) {
+                setTiles(prev => prev.map(t => t.id === event.tile.id ? {
+                    ...t,
+                    selection_count: event.tile.selection_count,
+                    current_value: event.tile.current_value
+                } : t));
+            } else if (event.type === "bingo_tiles") {
+                const changed = new Map(event.tiles.map((t: any) => [t.id, t]));
+                setTiles(prev => prev.map(t => changed.has(t.id) ? { ...t, ...(changed.get(t.id) as any) } : t));
+            } else if (event.type === "bingo_tile" || event.type === "bingo_reload" || event.type === "resync") {
+                loadData();
+            }
+        });
+    }, [seasonId]);
+
     const loadData = async () => {
         try {
             const [boardResponse, standingsData] = await Promise.all([
@@ -53,6 +73,7 @@ const Bingo: React.FC = () => {
             setTiles(boardResponse.tiles);
             setIsOpen(boardResponse.is_open);
             setStatus(boardResponse.status);
+            setSeasonId(boardResponse.season_id ?? null);
             setStandings(standingsData);
         } catch (error) {
             console.error(error);
@@ -86,11 +107,22 @@ const Bingo: React.FC = () => {
         setTiles(newTiles);
 
         try {
-            await API.toggleBingoTile(tileId);
-            const boardResponse = await API.getBingoBoard();
-            setTiles(boardResponse.tiles);
-            setIsOpen(boardResponse.is_open);
-            setStatus(boardResponse.status);
+            const result = await API.toggleBingoTile(tileId);
+            if (result.values_changed) {
+                // Ha entrado o salido un participante: cambian los valores de todas las casillas
+                const boardResponse = await API.getBingoBoard();
+                setTiles(boardResponse.tiles);
+                setIsOpen(boardResponse.is_open);
+                setStatus(boardResponse.status);
+            } else {
+                // La respuesta trae el contador y el valor nuevos de la casilla
+                setTiles(prev => prev.map(t => t.id === tileId ? {
+                    ...t,
+                    is_selected_by_me: result.status === "added",
+                    selection_count: result.selection_count,
+                    current_value: result.current_value
+                } : t));
+            }
         } catch (error: any) {
             setTiles(originalTiles);
             toast(error.response?.data?.detail || "No se pudo cambiar la selección.", "error");
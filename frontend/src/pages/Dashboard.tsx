@@ -29,6 +29,7 @@ interface RankingRow {
     name: string;
     acronym: string;
     avatar?: string;
+    avatar_thumb?: string | null;
     gp_points: number;
     accumulated: number;
 }
@@ -489,7 +490,7 @@ const Dashboard: React.FC = () => {
                                                             {view === 'drivers' && (
                                                                 <div className="w-8 h-8 rounded-full overflow-hidden border border-gray-100 bg-gray-50 shadow-sm">
                                                                     <img 
-                                                                        src={API.getAvatarFullUrl(row.avatar || 'default.png')} 
+                                                                        src={API.getAvatarThumbUrl(row.avatar_thumb, row.avatar || 'default.png')} 
                                                                         alt={row.acronym} 
                                                                         className="w-full h-full object-cover"
                                                                     />
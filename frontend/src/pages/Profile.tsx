@@ -288,7 +288,7 @@ const UserSearch = ({ currentUser, onSelectUser, usersList }: any) => {
                                 className="w-full text-left px-4 py-2.5 hover:bg-white/5 flex items-center gap-3 transition-colors group border-b border-gray-800/50 last:border-0"
                             >
                                 <div className="w-8 h-8 rounded-full overflow-hidden bg-gray-800 border border-gray-700 group-hover:border-gray-500">
-                                    <img src={API.getAvatarFullUrl(u.avatar)} className="w-full h-full object-cover" alt={u.acronym} />
+                                    <img src={API.getAvatarThumbUrl(u.avatar_thumb, u.avatar)} className="w-full h-full object-cover" alt={u.acronym} />
                                 </div>
                                 <div>
                                     <div className="text-xs font-bold text-gray-200 group-hover:text-white">{u.username}</div>
@@ -347,7 +347,7 @@ const SettingsTab = ({ avatars, avatar, handleSelectAvatar, loadingAvatar, reloa
                             return (
                                 <button key={av.id} onClick={() => handleSelectAvatar(av.filename)} disabled={loadingAvatar} className={`relative rounded-full aspect-square transition-all duration-200 group ${isSelected ? "scale-110 z-10 ring-4 ring-green-100 bg-white" : "hover:scale-110 hover:z-20 opacity-80 hover:opacity-100"}`}>
                                     <div className={`absolute inset-0 rounded-full border-2 ${isSelected ? "border-green-500" : "border-transparent group-hover:border-purple-200"}`}></div>
-                                    <img src={av.url} alt={av.filename} className="w-full h-full rounded-full object-cover shadow-sm" />
+                                    <img src={av.thumb_url || av.url} alt={av.filename} className="w-full h-full rounded-full object-cover shadow-sm" />
                                     {isSelected && (<div className="absolute inset-0 bg-green-500/20 rounded-full flex items-center justify-center"><CheckCircle className="text-white drop-shadow-md w-1/2 h-1/2" /></div>)}
                                 </button>
                             );